@@ -1,52 +1,31 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, stream_with_context
 import os
-from inference.predictor import WasteClassifier
-from inference.yolo_detector import YOLOv8WasteDetector
-from inference.siamese_network import SiameseNetwork
+from inference.image_io import UploadLimitExceeded
+import services
 import logging
-import tempfile
+import json
 
 # Initialize Flask app
 app = Flask(__name__)
-app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
+app.config['MAX_CONTENT_LENGTH'] = int(os.environ.get('MAX_UPLOAD_MB', 16)) * 1024 * 1024  # 16MB max file size
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Initialize models
-try:
-    classifier = WasteClassifier()
-    logger.info("Waste classifier model loaded successfully")
-except Exception as e:
-    logger.error(f"Failed to load classifier: {str(e)}")
-    classifier = None
-
-try:
-    yolo_detector = YOLOv8WasteDetector()
-    logger.info("YOLOv8 detector loaded successfully")
-except Exception as e:
-    logger.error(f"Failed to load YOLOv8: {str(e)}")
-    yolo_detector = None
-
-try:
-    siamese_network = SiameseNetwork()
-    logger.info("Siamese Network loaded successfully")
-except Exception as e:
-    logger.error(f"Failed to load Siamese Network: {str(e)}")
-    siamese_network = None
+# Initialize models (loaded and warmed up in the background)
+services.start()
+
+@app.route('/ready', methods=['GET'])
+def readiness_check():
+    """Readiness endpoint: 200 only once every eager model is loaded and warmed up"""
+    payload, status_code = services.readiness()
+    return jsonify(payload), status_code
 
 @app.route('/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
-    return jsonify({
-        'status': 'healthy',
-        'models': {
-            'classifier': classifier is not None,
-            'yolo_detector': yolo_detector is not None,
-            'siamese_network': siamese_network is not None
-        }
-    }), 200
+    return jsonify(services.health()), 200
 
 @app.route('/api/classify', methods=['POST'])
 def classify_waste():
@@ -61,19 +40,9 @@ def classify_waste():
         if file.filename == '':
             return jsonify({'error': 'No image selected'}), 400
         
-        if classifier is None:
-            return jsonify({'error': 'Model not loaded'}), 500
-        
         # Get prediction
-        result = classifier.predict(file)
-        
-        return jsonify({
-            'success': True,
-            'predictions': result['predictions'],
-            'top_class': result['top_class'],
-            'confidence': result['confidence']
-        }), 200
-        
+        return jsonify(services.classify_image(services.decode_upload(file))), 200
+    
     except Exception as e:
         logger.error(f"Error during classification: {str(e)}")
         return jsonify({'error': str(e)}), 500
@@ -91,31 +60,9 @@ def detect_waste():
         if file.filename == '':
             return jsonify({'error': 'No image selected'}), 400
         
-        if yolo_detector is None:
-            return jsonify({'error': 'YOLOv8 model not loaded'}), 500
-        
-        # Save temp file
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.jpg') as temp_file:
-            file.save(temp_file.name)
-            temp_path = temp_file.name
-        
-        try:
-            # Detect waste objects
-            detections = yolo_detector.detect(temp_path)
-            # Analyze severity
-            severity_analysis = yolo_detector.analyze_severity(detections)
-            
-            return jsonify({
-                'success': True,
-                'detections': detections,
-                'count': len(detections),
-                'severity': severity_analysis
-            }), 200
-        finally:
-            # Clean up temp file
-            if os.path.exists(temp_path):
-                os.unlink(temp_path)
-        
+        # Decode once in memory
+        return jsonify(services.detect_image(services.decode_upload(file))), 200
+    
     except Exception as e:
         logger.error(f"Error during detection: {str(e)}")
         return jsonify({'error': str(e)}), 500
@@ -135,34 +82,12 @@ def verify_cleanup():
         if before_file.filename == '' or after_file.filename == '':
             return jsonify({'error': 'Image files cannot be empty'}), 400
         
-        if siamese_network is None:
-            return jsonify({'error': 'Siamese Network not loaded'}), 500
-        
-        # Save temp files
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.jpg') as before_temp:
-            before_file.save(before_temp.name)
-            before_path = before_temp.name
-        
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.jpg') as after_temp:
-            after_file.save(after_temp.name)
-            after_path = after_temp.name
-        
-        try:
-            # Verify cleanup
-            verification = siamese_network.verify_cleanup(before_path, after_path)
-            
-            return jsonify({
-                'success': True,
-                'verification': verification,
-                'message': f"Cleanup {verification['status']} - {verification['cleanup_quality']}% quality"
-            }), 200
-        finally:
-            # Clean up temp files
-            if os.path.exists(before_path):
-                os.unlink(before_path)
-            if os.path.exists(after_path):
-                os.unlink(after_path)
+        # Decode in memory
+        before_image = services.decode_upload(before_file)
+        after_image = services.decode_upload(after_file)
         
+        return jsonify(services.verify_images(before_image, after_image)), 200
+    
     except Exception as e:
         logger.error(f"Error during verification: {str(e)}")
         return jsonify({'error': str(e)}), 500
@@ -180,41 +105,137 @@ def analyze_full():
         if file.filename == '':
             return jsonify({'error': 'No image selected'}), 400
         
-        # Save temp file
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.jpg') as temp_file:
-            file.save(temp_file.name)
-            temp_path = temp_file.name
+        # Decode once and share the image across all models
+        return jsonify(services.analyze_image(services.decode_upload(file))), 200
+    
+    except Exception as e:
+        logger.error(f"Error during full analysis: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/detect-video', methods=['POST'])
+def detect_video():
+    """
+    Detect unique waste objects across a short video
+    """
+    try:
+        if 'video' not in request.files:
+            return jsonify({'error': 'No video provided'}), 400
+        
+        file = request.files['video']
+        if file.filename == '':
+            return jsonify({'error': 'No video selected'}), 400
+        
+        return jsonify(services.detect_video(file, file.filename)), 200
+    
+    except Exception as e:
+        logger.error(f"Error during video detection: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/similar', methods=['POST'])
+def find_similar():
+    """
+    Find near-duplicates of an image among previously seen images
+    """
+    try:
+        if 'image' not in request.files:
+            return jsonify({'error': 'No image provided'}), 400
+        
+        file = request.files['image']
+        if file.filename == '':
+            return jsonify({'error': 'No image selected'}), 400
         
         try:
-            results = {}
-            
-            # Classification
-            if classifier is not None:
-                # Predict needs a file-like object
-                classification = classifier.predict(file)
-                results['classification'] = classification
-            
-            # Detection and Severity
-            if yolo_detector is not None:
-                detections = yolo_detector.detect(temp_path)
-                severity = yolo_detector.analyze_severity(detections)
-                results['detection'] = {
-                    'detections': detections,
-                    'count': len(detections),
-                    'severity': severity
-                }
-            
-            return jsonify({
-                'success': True,
-                'analysis': results
-            }), 200
-        finally:
-            # Clean up temp file
-            if os.path.exists(temp_path):
-                os.unlink(temp_path)
+            options = services.parse_similar_options(request.form)
+        except ValueError as e:
+            return jsonify({'error': f"Invalid parameter: {str(e)}"}), 400
         
+        return jsonify(services.find_similar(services.decode_upload(file), **options)), 200
+    
     except Exception as e:
-        logger.error(f"Error during full analysis: {str(e)}")
+        logger.error(f"Error during similarity lookup: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+def _collect_batch_inputs():
+    """
+    Collect the images of a batch request, in upload order
+    
+    Accepts repeated 'images' files and/or a zip 'archive'.
+    Returns a list of (filename, read_fn) tuples.
+    
+    Raises:
+        UploadLimitExceeded: when the request exceeds the batch limits
+    """
+    uploads = []
+    
+    for file in request.files.getlist('images'):
+        if file.filename == '':
+            continue
+        uploads.append((file.filename, file.read))
+    
+    return services.collect_batch_items(uploads, request.files.get('archive'))
+
+def _wants_stream():
+    """NDJSON streaming is requested with ?stream=1 or an Accept header"""
+    if request.args.get('stream', '').lower() in ('1', 'true', 'yes'):
+        return True
+    return 'application/x-ndjson' in request.headers.get('Accept', '')
+
+def _batch_response(items, run_batch):
+    """Return batch results as one JSON document or as an NDJSON stream"""
+    if _wants_stream():
+        def generate():
+            try:
+                for entry in services.iter_batch_results(items, run_batch):
+                    yield json.dumps(entry) + '\n'
+            except Exception as e:
+                logger.error(f"Error during batch streaming: {str(e)}")
+                yield json.dumps({'error': str(e)}) + '\n'
+        
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+    
+    results = list(services.iter_batch_results(items, run_batch))
+    return jsonify({
+        'success': True,
+        'count': len(results),
+        'results': results
+    }), 200
+
+@app.route('/api/classify-batch', methods=['POST'])
+def classify_batch():
+    """
+    Classify many images in batched forward passes
+    """
+    try:
+        items = _collect_batch_inputs()
+        if not items:
+            return jsonify({'error': 'No images provided'}), 400
+        
+        return _batch_response(items, services.classify_batch_runner())
+    
+    except UploadLimitExceeded as e:
+        return jsonify({'error': str(e)}), 413
+    
+    except Exception as e:
+        logger.error(f"Error during batch classification: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/detect-batch', methods=['POST'])
+def detect_batch():
+    """
+    Detect waste objects in many images in batched forward passes
+    """
+    try:
+        items = _collect_batch_inputs()
+        if not items:
+            return jsonify({'error': 'No images provided'}), 400
+        
+        return _batch_response(items, services.detect_batch_runner())
+    
+    except UploadLimitExceeded as e:
+        return jsonify({'error': str(e)}), 413
+    
+    except Exception as e:
+        logger.error(f"Error during batch detection: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
 if __name__ == '__main__':
@@ -0,0 +1,275 @@
+"""
+ASGI (asyncio) server for the AI models API
+Same routes and responses as app.py; uploads are parsed on the event loop while
+decoding and inference run in a bounded thread pool, so slow clients never hold
+an inference thread and overload is answered with 429 + Retry-After.
+
+Run with:
+    uvicorn asgi_app:app --host 0.0.0.0 --port 8000
+"""
+
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+from inference.image_io import UploadLimitExceeded
+from inference.executor import InferenceExecutor, QueueFull
+import services
+import asyncio
+import logging
+import json
+import os
+
+# Setup logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+MAX_UPLOAD_BYTES = int(os.environ.get('MAX_UPLOAD_MB', 16)) * 1024 * 1024
+
+# Threads running decode + inference, and max requests admitted at once
+executor = InferenceExecutor(
+    max_workers=int(os.environ.get('ASGI_INFERENCE_WORKERS', 4)),
+    max_queue=int(os.environ.get('ASGI_MAX_QUEUE', 64))
+)
+
+async def run_blocking(fn, *args):
+    """Run a blocking call in the inference executor without blocking the event loop"""
+    return await asyncio.wrap_future(executor.submit(fn, *args))
+
+def _decode_and_run(handler, uploads, options):
+    """Decode uploads and call a services handler, all on an executor thread"""
+    images = [services.decode_upload(upload.file) for upload in uploads]
+    return handler(*images, **options)
+
+def _error(message, status_code):
+    return JSONResponse({'error': message}, status_code=status_code)
+
+def _too_large(request):
+    length = request.headers.get('content-length')
+    return length is not None and length.isdigit() and int(length) > MAX_UPLOAD_BYTES
+
+def _is_upload(value):
+    return hasattr(value, 'filename') and hasattr(value, 'file')
+
+async def _handle(request, handler, fields, missing_message, empty_message, action, parse_options=None):
+    """Shared body of the single-image routes"""
+    if _too_large(request):
+        return _error('Request too large', 413)
+
+    try:
+        async with request.form() as form:
+            uploads = [form.get(field) for field in fields]
+            if not all(_is_upload(upload) for upload in uploads):
+                return _error(missing_message, 400)
+            if any(upload.filename == '' for upload in uploads):
+                return _error(empty_message, 400)
+
+            try:
+                options = parse_options(form) if parse_options is not None else {}
+            except ValueError as e:
+                return _error(f"Invalid parameter: {str(e)}", 400)
+
+            return JSONResponse(await run_blocking(_decode_and_run, handler, uploads, options))
+
+    except QueueFull as e:
+        return JSONResponse(
+            {'error': 'Server busy, retry later'},
+            status_code=429,
+            headers={'Retry-After': str(e.retry_after)}
+        )
+    except Exception as e:
+        logger.error(f"Error during {action}: {str(e)}")
+        return _error(str(e), 500)
+
+async def readiness_check(request):
+    """Readiness endpoint: 200 only once every eager model is loaded and warmed up"""
+    payload, status_code = services.readiness()
+    return JSONResponse(payload, status_code=status_code)
+
+async def health_check(request):
+    """Health check endpoint"""
+    payload = services.health()
+    payload['executor'] = executor.stats()
+    return JSONResponse(payload)
+
+async def classify_waste(request):
+    """Classify waste from uploaded image"""
+    return await _handle(
+        request, services.classify_image, ['image'],
+        'No image provided', 'No image selected', 'classification'
+    )
+
+async def detect_waste(request):
+    """Detect waste objects in image using YOLOv8"""
+    return await _handle(
+        request, services.detect_image, ['image'],
+        'No image provided', 'No image selected', 'detection'
+    )
+
+async def verify_cleanup(request):
+    """Verify cleanup by comparing before and after images using Siamese Network"""
+    return await _handle(
+        request, services.verify_images, ['before_image', 'after_image'],
+        'Both before and after images required', 'Image files cannot be empty', 'verification'
+    )
+
+async def analyze_full(request):
+    """Full analysis: classification + detection + severity"""
+    return await _handle(
+        request, services.analyze_image, ['image'],
+        'No image provided', 'No image selected', 'full analysis'
+    )
+
+def _run_video(upload):
+    return services.detect_video(upload.file, upload.filename)
+
+async def detect_video(request):
+    """Detect unique waste objects across a short video"""
+    if _too_large(request):
+        return _error('Request too large', 413)
+
+    try:
+        async with request.form() as form:
+            upload = form.get('video')
+            if not _is_upload(upload):
+                return _error('No video provided', 400)
+            if upload.filename == '':
+                return _error('No video selected', 400)
+
+            return JSONResponse(await run_blocking(_run_video, upload))
+
+    except QueueFull as e:
+        return JSONResponse(
+            {'error': 'Server busy, retry later'},
+            status_code=429,
+            headers={'Retry-After': str(e.retry_after)}
+        )
+    except Exception as e:
+        logger.error(f"Error during video detection: {str(e)}")
+        return _error(str(e), 500)
+
+async def find_similar(request):
+    """Find near-duplicates of an image among previously seen images"""
+    return await _handle(
+        request, services.find_similar, ['image'],
+        'No image provided', 'No image selected', 'similarity lookup',
+        parse_options=services.parse_similar_options
+    )
+
+def _collect_batch_inputs(form):
+    """
+    Collect the images of a batch request, in upload order (runs on an executor thread)
+
+    Returns a list of (filename, read_fn) tuples.
+
+    Raises:
+        UploadLimitExceeded: when the request exceeds the batch limits
+    """
+    uploads = []
+
+    for upload in form.getlist('images'):
+        if not _is_upload(upload) or upload.filename == '':
+            continue
+        uploads.append((upload.filename, upload.file.read))
+
+    archive = form.get('archive')
+    return services.collect_batch_items(uploads, archive.file if _is_upload(archive) else None)
+
+def _wants_stream(request):
+    """NDJSON streaming is requested with ?stream=1 or an Accept header"""
+    if request.query_params.get('stream', '').lower() in ('1', 'true', 'yes'):
+        return True
+    return 'application/x-ndjson' in request.headers.get('accept', '')
+
+async def _run_chunk(chunk, start, run_batch):
+    """Run one batch chunk, waiting for a free executor slot instead of failing mid-stream"""
+    while True:
+        try:
+            return await run_blocking(services.run_batch_chunk, chunk, start, run_batch)
+        except QueueFull as e:
+            await asyncio.sleep(e.retry_after)
+
+async def _batch(request, runner, action):
+    """Shared body of the batch routes"""
+    if _too_large(request):
+        return _error('Request too large', 413)
+
+    form = None
+    try:
+        form = await request.form()
+        items = await run_blocking(_collect_batch_inputs, form)
+        if not items:
+            return _error('No images provided', 400)
+
+        run_batch = runner()
+
+        if _wants_stream(request):
+            async def generate(form):
+                try:
+                    for start, chunk in services.batch_chunks(items):
+                        for entry in await _run_chunk(chunk, start, run_batch):
+                            yield json.dumps(entry) + '\n'
+                except Exception as e:
+                    logger.error(f"Error during batch streaming: {str(e)}")
+                    yield json.dumps({'error': str(e)}) + '\n'
+                finally:
+                    await form.close()
+
+            streamed_form, form = form, None
+            return StreamingResponse(generate(streamed_form), media_type='application/x-ndjson')
+
+        results = []
+        for start, chunk in services.batch_chunks(items):
+            results.extend(await _run_chunk(chunk, start, run_batch))
+
+        return JSONResponse({
+            'success': True,
+            'count': len(results),
+            'results': results
+        })
+
+    except UploadLimitExceeded as e:
+        return _error(str(e), 413)
+    except QueueFull as e:
+        return JSONResponse(
+            {'error': 'Server busy, retry later'},
+            status_code=429,
+            headers={'Retry-After': str(e.retry_after)}
+        )
+    except Exception as e:
+        logger.error(f"Error during {action}: {str(e)}")
+        return _error(str(e), 500)
+    finally:
+        if form is not None:
+            await form.close()
+
+async def classify_batch(request):
+    """Classify many images in batched forward passes"""
+    return await _batch(request, services.classify_batch_runner, 'batch classification')
+
+async def detect_batch(request):
+    """Detect waste objects in many images in batched forward passes"""
+    return await _batch(request, services.detect_batch_runner, 'batch detection')
+
+app = Starlette(
+    routes=[
+        Route('/ready', readiness_check, methods=['GET']),
+        Route('/health', health_check, methods=['GET']),
+        Route('/api/classify', classify_waste, methods=['POST']),
+        Route('/api/detect', detect_waste, methods=['POST']),
+        Route('/api/verify-cleanup', verify_cleanup, methods=['POST']),
+        Route('/api/analyze-full', analyze_full, methods=['POST']),
+        Route('/api/detect-video', detect_video, methods=['POST']),
+        Route('/api/similar', find_similar, methods=['POST']),
+        Route('/api/classify-batch', classify_batch, methods=['POST']),
+        Route('/api/detect-batch', detect_batch, methods=['POST']),
+    ],
+    # Models load and warm up in the background; /ready flips once they are done
+    on_startup=[services.start],
+    on_shutdown=[lambda: executor.shutdown(wait=False)]
+)
+
+if __name__ == '__main__':
+    import uvicorn
+
+    port = int(os.environ.get('PORT', 8000))
+    uvicorn.run(app, host='0.0.0.0', port=port)
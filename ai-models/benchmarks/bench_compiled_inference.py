@@ -0,0 +1,94 @@
+"""
+Benchmark: Keras model.predict vs compiled tf.function inference
+Measures per-call latency of single-image requests on both paths
+
+Run from ai-models/:
+    python benchmarks/bench_compiled_inference.py --iterations 200
+"""
+
+import argparse
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from inference.predictor import WasteClassifier
+from inference.siamese_network import SiameseNetwork
+from inference.compiled_model import CompiledModel
+from training.model import WasteDetectionModel
+
+def time_calls(fn, iterations, warmup=5):
+    """Return per-call latencies in milliseconds"""
+    for _ in range(warmup):
+        fn()
+
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+
+    return np.array(samples)
+
+def report(name, predict_ms, compiled_ms):
+    """Print latency summary for both paths"""
+    print(f"\n{name}")
+    print(f"  {'path':<16}{'mean':>10}{'p50':>10}{'p95':>10}")
+    for label, samples in (('model.predict', predict_ms), ('tf.function', compiled_ms)):
+        print(f"  {label:<16}{samples.mean():>9.2f}ms{np.percentile(samples, 50):>8.2f}ms"
+              f"{np.percentile(samples, 95):>8.2f}ms")
+    print(f"  speedup (p50): {np.percentile(predict_ms, 50) / np.percentile(compiled_ms, 50):.2f}x")
+
+def bench_classifier(model_path, iterations):
+    classifier = WasteClassifier(model_path=model_path)
+
+    if classifier.model is None:
+        # No trained weights - latency only depends on the architecture
+        print("Classifier weights not found - timing an untrained CNN")
+        classifier.model = WasteDetectionModel().build_model()
+        classifier.infer = CompiledModel(classifier.model, [classifier.image_size + (3,)])
+        classifier.infer.warmup()
+
+    x = np.random.rand(1, *classifier.image_size, 3).astype(np.float32)
+
+    predict_ms = time_calls(lambda: classifier.model.predict(x, verbose=0), iterations)
+    compiled_ms = time_calls(lambda: classifier.infer(x), iterations)
+    report('WasteClassifier (batch 1)', predict_ms, compiled_ms)
+
+def bench_siamese(model_path, iterations):
+    siamese = SiameseNetwork(model_path=model_path)
+
+    shape = (1,) + tuple(siamese.input_shape)
+    before = np.random.rand(*shape).astype(np.float32)
+    after = np.random.rand(*shape).astype(np.float32)
+
+    predict_ms = time_calls(lambda: siamese.model.predict([before, after], verbose=0), iterations)
+    # Two-stage compiled path without the embedding cache
+    compiled_ms = time_calls(
+        lambda: siamese.compare_fn(siamese.extract_fn(before), siamese.extract_fn(after)),
+        iterations
+    )
+    report('SiameseNetwork (1 pair)', predict_ms, compiled_ms)
+
+    # Same before-image again: only the after-image runs the backbone
+    before_pixels = (before[0] * 255).astype(np.uint8)
+    siamese.get_embedding(before_pixels)
+    cached_ms = time_calls(
+        lambda: siamese.compare_embeddings(siamese.get_embedding(before_pixels), siamese.extract_fn(after)[0]),
+        iterations
+    )
+    print(f"  cached before-image p50: {np.percentile(cached_ms, 50):.2f}ms")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Compare model.predict and compiled inference latency')
+    parser.add_argument('--iterations', type=int, default=100)
+    parser.add_argument('--classifier-path', default='pretrained/waste_classifier.h5')
+    parser.add_argument('--siamese-path', default='pretrained/siamese_network.h5')
+    parser.add_argument('--skip-siamese', action='store_true', help='Skip the Siamese benchmark')
+    args = parser.parse_args()
+
+    bench_classifier(args.classifier_path, args.iterations)
+    if not args.skip_siamese:
+        bench_siamese(args.siamese_path, args.iterations)
@@ -0,0 +1,135 @@
+"""
+Benchmark: training throughput (images/sec) against worker count on CPU
+Trains on synthetic images so only compute and gradient sync are measured
+
+Each worker count runs as its own set of processes on this machine: one
+process per worker with MultiWorkerMirroredStrategy (the cores are split
+between workers), or one process with N mirrored CPU replicas.
+
+Run from ai-models/:
+    python benchmarks/bench_distributed_training.py --workers 1 2 4
+    python benchmarks/bench_distributed_training.py --mode mirrored --workers 1 2 4 --model transfer
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+from training.distributed import free_ports, worker_env
+
+def run_worker(args):
+    """Train on synthetic data under the strategy and write the chief's throughput"""
+    import tensorflow as tf
+    from training.distributed import make_strategy, is_chief
+    from training.model import WasteDetectionModel
+    from training.callbacks import ThroughputCallback
+
+    if args.mode == 'multi_worker':
+        strategy = make_strategy('multi_worker')
+    else:
+        strategy = make_strategy('mirrored', cpu_replicas=args.num_workers)
+
+    global_batch = args.batch_size * strategy.num_replicas_in_sync
+    images = tf.random.uniform((args.image_size, args.image_size, 3), seed=1)
+    labels = tf.one_hot(0, 5)
+    ds = tf.data.Dataset.from_tensors((images, labels)).repeat().batch(global_batch).prefetch(2)
+    # Every worker generates its own synthetic batches; nothing to shard
+    options = tf.data.Options()
+    options.experimental_distribute.auto_shard_policy = tf.data.experimental.AutoShardPolicy.OFF
+    ds = ds.with_options(options)
+
+    with strategy.scope():
+        wrapper = WasteDetectionModel(input_shape=(args.image_size, args.image_size, 3))
+        if args.model == 'transfer':
+            wrapper.get_transfer_learning_model('MobileNetV2')
+        else:
+            wrapper.build_model(augment=False)
+        wrapper.compile_model()
+
+    throughput = ThroughputCallback(global_batch)
+    history = wrapper.model.fit(ds, epochs=args.epochs, steps_per_epoch=args.steps, callbacks=[throughput], verbose=0)
+
+    if is_chief(strategy):
+        with open(args.result, 'w') as f:
+            json.dump({
+                'replicas': strategy.num_replicas_in_sync,
+                # First epoch includes graph tracing and is dropped
+                'images_per_sec': history.history['images_per_sec'][-1]
+            }, f)
+
+def measure(args, num_workers):
+    """Launch one run with num_workers workers / replicas and return its result"""
+    result = os.path.join(tempfile.mkdtemp(prefix='bench_dist_'), 'result.json')
+    command = [
+        sys.executable, os.path.abspath(__file__), '--run-worker', '--result', result,
+        '--num-workers', str(num_workers), '--mode', args.mode, '--model', args.model,
+        '--batch-size', str(args.batch_size), '--image-size', str(args.image_size),
+        '--steps', str(args.steps), '--epochs', str(args.epochs)
+    ]
+
+    if args.mode == 'multi_worker':
+        cluster = [f'localhost:{port}' for port in free_ports(num_workers)]
+        threads = max(1, (os.cpu_count() or 1) // num_workers)
+        processes = [
+            subprocess.Popen(command, env=worker_env(cluster, index, threads),
+                             stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            for index in range(num_workers)
+        ]
+        codes = [process.wait() for process in processes]
+    else:
+        codes = [subprocess.call(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)]
+
+    if any(codes) or not os.path.exists(result):
+        print(f"  {num_workers} workers: failed (exit codes {codes})")
+        return None
+    with open(result) as f:
+        return json.load(f)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Training throughput against worker count')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--mode', default='multi_worker', choices=['multi_worker', 'mirrored'])
+    parser.add_argument('--model', default='scratch', choices=['scratch', 'transfer'])
+    parser.add_argument('--batch-size', type=int, default=32, help='Per-replica batch size')
+    parser.add_argument('--image-size', type=int, default=224)
+    parser.add_argument('--steps', type=int, default=20, help='Steps per epoch')
+    parser.add_argument('--epochs', type=int, default=2, help='The last epoch is reported')
+    parser.add_argument('--output', help='Also write the results as JSON')
+    parser.add_argument('--run-worker', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--num-workers', type=int, default=1, help=argparse.SUPPRESS)
+    parser.add_argument('--result', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_worker:
+        run_worker(args)
+        sys.exit(0)
+
+    print(f"{args.mode}, {args.model} model, {args.batch_size} images per replica, {os.cpu_count()} CPUs")
+    results = []
+    for num_workers in args.workers:
+        result = measure(args, num_workers)
+        if result is not None:
+            results.append(dict(result, workers=num_workers))
+
+    if not results:
+        sys.exit(1)
+
+    baseline = results[0]
+    print(f"\n  {'workers':>8}{'images/sec':>14}{'speedup':>10}{'efficiency':>12}")
+    for result in results:
+        speedup = result['images_per_sec'] / baseline['images_per_sec']
+        efficiency = speedup * baseline['workers'] / result['workers']
+        result.update({'speedup': speedup, 'efficiency': efficiency})
+        print(f"  {result['workers']:>8}{result['images_per_sec']:>14.1f}{speedup:>9.2f}x{efficiency:>12.0%}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'mode': args.mode, 'model': args.model, 'batch_size': args.batch_size,
+                       'cpus': os.cpu_count(), 'results': results}, f, indent=2)
+        print(f"\nResults saved to {args.output}")
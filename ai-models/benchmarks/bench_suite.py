@@ -0,0 +1,482 @@
+"""
+Benchmark suite: latency, throughput and memory of every inference endpoint
+Runs offline on CPU with synthetic images at several resolutions and covers
+WasteClassifier.predict, YOLOv8WasteDetector.detect + analyze_severity,
+SiameseNetwork.verify_cleanup and each Flask route (through the test client).
+
+For every target, resolution and concurrency level it reports p50/p95/p99
+latency, requests/sec and the peak RSS of the process during the run, and
+writes the results as JSON keyed by the git commit so runs can be compared.
+Each target runs in its own Python process, so its RSS only covers the models
+it loads.
+
+Run from ai-models/:
+    python benchmarks/bench_suite.py
+    python benchmarks/bench_suite.py --targets classifier routes --concurrency 1 8 --requests 100
+    python benchmarks/bench_suite.py --compare benchmarks/results/<old-commit>.json
+"""
+
+import argparse
+import io
+import itertools
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from importlib import metadata
+
+import numpy as np
+from PIL import Image
+
+SCRIPT_PATH = os.path.abspath(__file__)
+BASE_DIR = os.path.dirname(os.path.dirname(SCRIPT_PATH))
+sys.path.insert(0, BASE_DIR)
+
+TARGETS = ('classifier', 'detector', 'siamese', 'routes')
+PACKAGES = ('tensorflow', 'ultralytics', 'onnxruntime', 'opencv-python', 'numpy', 'pillow', 'flask')
+BATCH_SIZE = 8
+
+def parse_resolution(value):
+    width, height = value.lower().split('x')
+    return int(width), int(height)
+
+def synthetic_jpeg(width, height, seed):
+    """A smooth background with a few solid blobs, encoded as JPEG"""
+    rng = np.random.default_rng(seed)
+    x = np.linspace(0, rng.uniform(4, 12), width, dtype=np.float32)
+    y = np.linspace(0, rng.uniform(4, 12), height, dtype=np.float32)
+    base = 110 + 50 * np.sin(x)[None, :] + 50 * np.cos(y)[:, None]
+    pixels = np.stack([base + rng.uniform(-30, 30) for _ in range(3)], axis=-1)
+    pixels += rng.normal(0, 8, pixels.shape).astype(np.float32)
+
+    for _ in range(rng.integers(3, 9)):
+        w, h = rng.integers(width // 20, width // 5), rng.integers(height // 20, height // 5)
+        left, top = rng.integers(0, width - w), rng.integers(0, height - h)
+        pixels[top:top + h, left:left + w] = rng.uniform(0, 255, 3)
+
+    buffer = io.BytesIO()
+    Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8)).save(buffer, format='JPEG', quality=90)
+    return buffer.getvalue()
+
+class ImagePool:
+    """
+    Distinct encoded images at one resolution
+
+    Every request gets unique bytes (a few base images plus a counter after
+    the JPEG end marker, which decoders ignore), so content-hash caches such
+    as the Siamese embedding cache never turn a request into a lookup.
+    """
+
+    def __init__(self, width, height, size=8, seed=0):
+        self.width = width
+        self.height = height
+        self.images = [synthetic_jpeg(width, height, seed + i) for i in range(size)]
+        self._counter = itertools.count()
+
+    def next(self):
+        index = next(self._counter)
+        return self.images[index % len(self.images)] + f'bench{index}'.encode()
+
+def synthetic_video(width, height, seconds=2, fps=10, seed=0):
+    """Encoded MP4 of a slowly panning synthetic scene, or None without an encoder"""
+    import cv2
+    import tempfile
+
+    scene = cv2.imdecode(np.frombuffer(synthetic_jpeg(width * 2, height, seed), np.uint8), cv2.IMREAD_COLOR)
+    handle, path = tempfile.mkstemp(suffix='.mp4')
+    os.close(handle)
+    try:
+        writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), fps, (width, height))
+        if not writer.isOpened():
+            return None
+        frames = seconds * fps
+        for i in range(frames):
+            left = int(i * width / frames)
+            writer.write(np.ascontiguousarray(scene[:, left:left + width]))
+        writer.release()
+        with open(path, 'rb') as f:
+            data = f.read()
+        return data or None
+    finally:
+        os.remove(path)
+
+class PeakRss:
+    """Highest resident set size seen by a sampling thread while active"""
+
+    def __init__(self, interval=0.005):
+        from inference.registry import current_rss_bytes
+        self._read = current_rss_bytes
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        while True:
+            rss = self._read()
+            if rss is not None:
+                self.peak = max(self.peak, rss)
+            if self._stop.wait(self.interval):
+                return
+
+    def __enter__(self):
+        self.peak = 0
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._sample, name='rss-sampler', daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+def run_load(call, inputs, concurrency):
+    """
+    Run call over inputs from concurrency threads
+
+    Returns:
+        (latencies in ms, errors, wall-clock seconds)
+    """
+    latencies = [None] * len(inputs)
+    errors = []
+    counter = itertools.count()
+
+    def worker():
+        while True:
+            i = next(counter)
+            if i >= len(inputs):
+                return
+            start = time.perf_counter()
+            try:
+                call(inputs[i])
+            except Exception as e:
+                errors.append(str(e))
+            latencies[i] = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for _ in range(concurrency):
+            pool.submit(worker)
+    wall = time.perf_counter() - start
+
+    return np.array(latencies), errors, wall
+
+def summarize(target, resolution, concurrency, latencies, errors, wall, peak_rss, mock=False):
+    result = {
+        'target': target,
+        'resolution': resolution,
+        'concurrency': concurrency,
+        'requests': len(latencies),
+        'errors': len(errors),
+        'mean_ms': round(float(latencies.mean()), 3),
+        'p50_ms': round(float(np.percentile(latencies, 50)), 3),
+        'p95_ms': round(float(np.percentile(latencies, 95)), 3),
+        'p99_ms': round(float(np.percentile(latencies, 99)), 3),
+        'throughput_rps': round(len(latencies) / wall, 3),
+        'peak_rss_mb': round(peak_rss / 2**20, 1),
+        'mock': mock
+    }
+    if errors:
+        result['first_error'] = errors[0]
+    return result
+
+def print_row(result):
+    print(f"  {result['target']:<28}{result['resolution']:>11}{result['concurrency']:>4}"
+          f"{result['p50_ms']:>10.2f}{result['p95_ms']:>10.2f}{result['p99_ms']:>10.2f}"
+          f"{result['throughput_rps']:>10.1f}{result['peak_rss_mb']:>10.1f}"
+          f"{'  mock' if result['mock'] else ''}{'  errors: ' + str(result['errors']) if result['errors'] else ''}")
+
+def bench_target(target, call, make_input, resolution, args, mock=False):
+    """Warm up, then run every concurrency level; returns one result per level"""
+    for _ in range(args.warmup):
+        call(make_input())
+
+    results = []
+    for concurrency in args.concurrency:
+        inputs = [make_input() for _ in range(args.requests)]
+        with PeakRss() as rss:
+            latencies, errors, wall = run_load(call, inputs, concurrency)
+        result = summarize(target, resolution, concurrency, latencies, errors, wall, rss.peak, mock)
+        print_row(result)
+        results.append(result)
+        del inputs
+    return results
+
+def bench_models(targets, pools, args):
+    """In-process model calls on images decoded the way the API decodes uploads"""
+    from inference.image_io import DecodedImage
+
+    results = []
+
+    def decoded(pool):
+        return DecodedImage.from_bytes(pool.next(), max_side=args.decode_max_side or None)
+
+    if 'classifier' in targets:
+        from inference.predictor import WasteClassifier
+        classifier = WasteClassifier(model_path=args.classifier_model)
+        # model_version is None while the models return placeholder results
+        for name, pool in pools.items():
+            results += bench_target('classifier.predict', classifier.predict,
+                                    lambda: decoded(pool), name, args, classifier.model_version is None)
+
+    if 'detector' in targets:
+        from inference.yolo_detector import YOLOv8WasteDetector
+        detector = YOLOv8WasteDetector(model_path=args.detector_model, backend=args.detector_backend)
+
+        def detect(image):
+            return detector.analyze_severity(detector.detect(image))
+
+        for name, pool in pools.items():
+            results += bench_target('detector.detect+severity', detect,
+                                    lambda: decoded(pool), name, args, detector.model_version is None)
+
+    if 'siamese' in targets:
+        from inference.siamese_network import SiameseNetwork
+        siamese = SiameseNetwork(model_path=args.siamese_model)
+        for name, pool in pools.items():
+            results += bench_target('siamese.verify_cleanup', lambda pair: siamese.verify_cleanup(*pair),
+                                    lambda: (decoded(pool), decoded(pool)), name, args)
+
+    return results
+
+def wait_until_ready(services, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        payload, status = services.readiness()
+        if status == 200:
+            return payload
+        time.sleep(0.5)
+    print(f"Models not ready after {timeout:.0f}s - benchmarking anyway")
+    return None
+
+def bench_routes(pools, args):
+    """Every Flask route through the test client, one client per thread"""
+    import services
+    from app import app
+
+    wait_until_ready(services, args.ready_timeout)
+    local = threading.local()
+
+    def client():
+        if not hasattr(local, 'client'):
+            local.client = app.test_client()
+        return local.client
+
+    def get(path):
+        def call(_):
+            response = client().get(path)
+            if response.status_code != 200:
+                raise RuntimeError(f"{path}: HTTP {response.status_code}")
+        return call
+
+    def post(path):
+        def call(fields):
+            # fields: name -> (bytes, extension) or a list of them for repeated files
+            form = {}
+            for key, files in fields.items():
+                if isinstance(files, list):
+                    form[key] = [(io.BytesIO(data), f'bench{i}.{ext}') for i, (data, ext) in enumerate(files)]
+                else:
+                    form[key] = (io.BytesIO(files[0]), f'bench.{files[1]}')
+            response = client().post(path, data=form, content_type='multipart/form-data')
+            response.get_data()
+            if response.status_code != 200:
+                raise RuntimeError(f"{path}: HTTP {response.status_code} {response.get_data(as_text=True)[:200]}")
+        return call
+
+    results = []
+    for path in ('/health', '/ready'):
+        results += bench_target(f'GET {path}', get(path), lambda: None, '-', args)
+
+    for name, pool in pools.items():
+        def image():
+            return (pool.next(), 'jpg')
+
+        routes = (
+            ('/api/classify', lambda: {'image': image()}),
+            ('/api/detect', lambda: {'image': image()}),
+            ('/api/verify-cleanup', lambda: {'before_image': image(), 'after_image': image()}),
+            ('/api/analyze-full', lambda: {'image': image()}),
+            ('/api/similar', lambda: {'image': image()}),
+            ('/api/classify-batch', lambda: {'images': [image() for _ in range(BATCH_SIZE)]}),
+            ('/api/detect-batch', lambda: {'images': [image() for _ in range(BATCH_SIZE)]})
+        )
+        for path, make_fields in routes:
+            results += bench_target(f'POST {path}', post(path), make_fields, name, args)
+
+        video = synthetic_video(pool.width, pool.height) if not args.skip_video else None
+        if video is not None:
+            results += bench_target('POST /api/detect-video', post('/api/detect-video'),
+                                    lambda: {'video': (video, 'mp4')}, name, args)
+        elif not args.skip_video:
+            print("  (no MP4 encoder in OpenCV - skipping /api/detect-video)")
+
+    return results
+
+def run_targets(targets, args):
+    """Benchmark targets in this process (one target per process from main)"""
+    pools = {}
+    for value in args.resolutions:
+        width, height = parse_resolution(value)
+        pools[f'{width}x{height}'] = ImagePool(width, height)
+
+    results = bench_models(targets, pools, args)
+    if 'routes' in targets:
+        results += bench_routes(pools, args)
+    return results
+
+def run_isolated(target):
+    """
+    Benchmark one target in a fresh interpreter with the same arguments
+
+    Returns:
+        The child's results, or [] if it failed
+    """
+    handle, path = tempfile.mkstemp(suffix='.json')
+    os.close(handle)
+    try:
+        # A repeated --targets overrides the one given on the command line
+        command = [sys.executable, SCRIPT_PATH] + sys.argv[1:] + ['--targets', target, '--results-file', path]
+        if subprocess.run(command).returncode != 0:
+            print(f"  ({target} benchmark failed - see output above)")
+            return []
+        with open(path) as f:
+            return json.load(f)
+    finally:
+        os.remove(path)
+
+def environment():
+    """Commit, machine and library versions the results belong to"""
+    def git(*command):
+        try:
+            return subprocess.run(['git', *command], cwd=BASE_DIR, capture_output=True,
+                                  text=True, check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    versions = {}
+    for package in PACKAGES:
+        try:
+            versions[package] = metadata.version(package)
+        except metadata.PackageNotFoundError:
+            versions[package] = None
+
+    return {
+        'commit': git('rev-parse', 'HEAD'),
+        'dirty': bool(git('status', '--porcelain', '--untracked-files=no')),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'processor': platform.processor(),
+        'cpu_count': os.cpu_count(),
+        'packages': versions
+    }
+
+def compare(results, baseline_path, threshold):
+    """
+    Print p50/p95/throughput changes against an earlier results file
+
+    Returns:
+        Number of entries that regressed by more than threshold percent
+    """
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    previous = {(r['target'], r['resolution'], r['concurrency']): r for r in baseline['results']}
+
+    print(f"\nCompared with {baseline['environment'].get('commit') or baseline_path}")
+    print(f"  {'target':<28}{'res':>11}{'c':>4}{'p50':>10}{'p95':>10}{'req/s':>10}")
+
+    regressions = 0
+    for result in results:
+        old = previous.get((result['target'], result['resolution'], result['concurrency']))
+        if old is None:
+            continue
+        changes = [
+            (result[key] - old[key]) / old[key] * 100 if old[key] else 0.0
+            for key in ('p50_ms', 'p95_ms', 'throughput_rps')
+        ]
+        # Slower latency or lower throughput is a regression
+        regressed = changes[0] > threshold or changes[1] > threshold or -changes[2] > threshold
+        regressions += regressed
+        print(f"  {result['target']:<28}{result['resolution']:>11}{result['concurrency']:>4}"
+              + ''.join(f"{change:>+9.1f}%" for change in changes)
+              + ('  REGRESSION' if regressed else ''))
+
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description='Latency/throughput benchmark of every inference endpoint')
+    parser.add_argument('--targets', nargs='+', choices=TARGETS, default=list(TARGETS))
+    parser.add_argument('--resolutions', nargs='+', default=['640x480', '1280x720', '1920x1080'],
+                        help='Synthetic image sizes as WIDTHxHEIGHT')
+    parser.add_argument('--concurrency', nargs='+', type=int, default=[1, 4, 8])
+    parser.add_argument('--requests', type=int, default=50, help='Requests per concurrency level')
+    parser.add_argument('--warmup', type=int, default=3)
+    parser.add_argument('--decode-max-side', type=int, default=int(os.environ.get('DECODE_MAX_SIDE', 640)),
+                        help='Decode size of the model-level targets, as the API does (0 = full size)')
+    parser.add_argument('--classifier-model', default='pretrained/waste_classifier.h5')
+    parser.add_argument('--detector-model', default='pretrained/yolov8_waste.pt')
+    parser.add_argument('--detector-backend', default='ultralytics', choices=['ultralytics', 'onnx'])
+    parser.add_argument('--siamese-model', default='pretrained/siamese_network.h5')
+    parser.add_argument('--ready-timeout', type=float, default=300.0)
+    parser.add_argument('--skip-video', action='store_true')
+    parser.add_argument('--allow-gpu', action='store_true', help='Do not hide GPUs (results are CPU-only by default)')
+    parser.add_argument('--keep-result-cache', action='store_true',
+                        help='Keep the API result cache enabled (disabled by default so every request runs the models)')
+    parser.add_argument('--output', help='Results JSON (default benchmarks/results/<commit>.json)')
+    parser.add_argument('--compare', help='Earlier results JSON to compare against')
+    parser.add_argument('--regression-threshold', type=float, default=10.0,
+                        help='Percent change counted as a regression in --compare')
+    # Set by run_isolated: benchmark --targets here and write the results to this file
+    parser.add_argument('--results-file', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    # Must be set before TensorFlow and services are imported
+    if not args.allow_gpu:
+        os.environ['CUDA_VISIBLE_DEVICES'] = '-1'
+    if not args.keep_result_cache:
+        os.environ['RESULT_CACHE_SIZE'] = '0'
+    os.chdir(BASE_DIR)
+
+    if args.results_file:
+        results = run_targets(args.targets, args)
+        with open(args.results_file, 'w') as f:
+            json.dump(results, f)
+        return
+
+    env = environment()
+    print(f"Commit {env['commit']}{' (dirty)' if env['dirty'] else ''}, {env['cpu_count']} CPUs, "
+          f"Python {env['python']}")
+
+    print(f"\n  {'target':<28}{'res':>11}{'c':>4}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+          f"{'req/s':>10}{'rss MB':>10}", flush=True)
+    results = []
+    for target in args.targets:
+        results += run_isolated(target)
+
+    # Largest target process
+    env['max_rss_mb'] = round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024, 1)
+    output = args.output or os.path.join('benchmarks', 'results', f"{(env['commit'] or 'unknown')[:12]}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump({
+            'environment': env,
+            'settings': {key: value for key, value in vars(args).items() if key not in ('output', 'compare', 'results_file')},
+            'results': results
+        }, f, indent=2)
+    print(f"\nResults written to {output}")
+
+    if args.compare:
+        regressions = compare(results, args.compare, args.regression_threshold)
+        if regressions:
+            print(f"{regressions} regression(s) above {args.regression_threshold:.0f}%")
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
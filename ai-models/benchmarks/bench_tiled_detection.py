@@ -0,0 +1,123 @@
+"""
+Benchmark: single-pass vs tiled YOLOv8 detection on high-resolution photos
+Reports recall (overall and for objects under 32px at 640 input) and latency
+
+Ground truth is read from YOLO-format labels (images/x.jpg -> labels/x.txt);
+without labels only detection counts and latency are reported.
+
+Run from ai-models/:
+    python benchmarks/bench_tiled_detection.py --images datasets/dump_sites/images --tile-size 640
+"""
+
+import argparse
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from inference.yolo_detector import YOLOv8WasteDetector
+from inference.image_io import DecodedImage
+from compare_detector_backends import list_images, match_detections
+
+def label_path(image_path):
+    """ultralytics convention: .../images/name.jpg -> .../labels/name.txt"""
+    parts = image_path.split(os.sep)
+    if 'images' in parts:
+        parts[len(parts) - 1 - parts[::-1].index('images')] = 'labels'
+    return os.path.splitext(os.sep.join(parts))[0] + '.txt'
+
+def load_labels(path, width, height):
+    """YOLO-format label file as detection dicts in pixels, or None if missing"""
+    if not os.path.exists(path):
+        return None
+
+    labels = []
+    with open(path) as f:
+        for line in f:
+            values = line.split()
+            if len(values) < 5:
+                continue
+            class_id = int(values[0])
+            cx, cy, w, h = (float(v) for v in values[1:5])
+            labels.append({
+                'bbox': [(cx - w / 2) * width, (cy - h / 2) * height, (cx + w / 2) * width, (cy + h / 2) * height],
+                'class_id': class_id,
+                'confidence': 1.0
+            })
+    return labels
+
+def is_small(box, image_long_side, input_size=640, min_pixels=32):
+    """True if the box would be under min_pixels after shrinking the photo to input_size"""
+    return max(box[2] - box[0], box[3] - box[1]) * input_size / image_long_side < min_pixels
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Compare single-pass and tiled YOLOv8 detection')
+    parser.add_argument('--images', default='datasets/dump_sites/images')
+    parser.add_argument('--limit', type=int, default=50)
+    parser.add_argument('--backend', default='ultralytics', choices=['ultralytics', 'onnx'])
+    parser.add_argument('--tile-size', type=int, default=640)
+    parser.add_argument('--overlap', type=float, default=0.2)
+    parser.add_argument('--min-std', type=float, default=6.0, help='Skip tiles flatter than this (0 keeps all)')
+    parser.add_argument('--conf', type=float, default=0.25)
+    parser.add_argument('--iou', type=float, default=0.5, help='Min IoU for a detection to match a label')
+    args = parser.parse_args()
+
+    paths = list_images(args.images, args.limit)
+    if not paths:
+        print(f"No images found under {args.images}")
+        sys.exit(1)
+
+    single = YOLOv8WasteDetector(backend=args.backend)
+    tiled = YOLOv8WasteDetector(
+        backend=args.backend,
+        tile_size=args.tile_size,
+        tile_overlap=args.overlap,
+        tile_min_std=args.min_std
+    )
+    single.warmup()
+    tiled.warmup()
+
+    modes = {'single-pass': single, 'tiled': tiled}
+    latencies = {name: [] for name in modes}
+    found = {name: 0 for name in modes}
+    matched = {name: 0 for name in modes}
+    matched_small = {name: 0 for name in modes}
+    total_labels = total_small = 0
+    labelled_images = 0
+
+    for path in paths:
+        image = DecodedImage.from_path(path)
+        long_side = max(image.width, image.height)
+        labels = load_labels(label_path(path), image.width, image.height)
+        if labels is not None:
+            labelled_images += 1
+            total_labels += len(labels)
+            small_labels = [label for label in labels if is_small(label['bbox'], long_side)]
+            total_small += len(small_labels)
+
+        for name, detector in modes.items():
+            start = time.perf_counter()
+            if name == 'tiled':
+                detections = detector.detect_tiled(image, args.conf).to_list()
+            else:
+                detections = detector.detect(image, args.conf).to_list()
+            latencies[name].append((time.perf_counter() - start) * 1000)
+            found[name] += len(detections)
+
+            if labels is not None:
+                matched[name] += len(match_detections(labels, detections, args.iou)[0])
+                matched_small[name] += len(match_detections(small_labels, detections, args.iou)[0])
+
+    print(f"\nImages: {len(paths)} ({labelled_images} labelled), tile {args.tile_size}px, overlap {args.overlap:.0%}")
+    print(f"  {'mode':<14}{'detections':>12}{'recall':>10}{'small':>10}{'p50':>10}{'p95':>10}")
+    for name in modes:
+        recall = f"{matched[name] / total_labels:.2%}" if total_labels else 'n/a'
+        recall_small = f"{matched_small[name] / total_small:.2%}" if total_small else 'n/a'
+        samples = latencies[name]
+        print(f"  {name:<14}{found[name]:>12}{recall:>10}{recall_small:>10}"
+              f"{np.percentile(samples, 50):>8.1f}ms{np.percentile(samples, 95):>8.1f}ms")
+
+    if not total_labels:
+        print("\nNo label files found - recall not measured")
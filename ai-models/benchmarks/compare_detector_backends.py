@@ -0,0 +1,116 @@
+"""
+Compare YOLOv8WasteDetector backends: ultralytics (PyTorch) vs ONNX Runtime
+Checks that detections and severity match within tolerance and reports latency
+
+Run from ai-models/:
+    python benchmarks/compare_detector_backends.py --images datasets/waste_images --limit 100
+"""
+
+import argparse
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from inference.yolo_detector import YOLOv8WasteDetector
+from inference.image_io import DecodedImage, IMAGE_EXTENSIONS
+
+def list_images(root, limit):
+    paths = []
+    for dirpath, _, filenames in sorted(os.walk(root)):
+        for filename in sorted(filenames):
+            if filename.lower().endswith(IMAGE_EXTENSIONS):
+                paths.append(os.path.join(dirpath, filename))
+    return paths[:limit]
+
+def box_iou(a, b):
+    inter_w = max(0.0, min(a[2], b[2]) - max(a[0], b[0]))
+    inter_h = max(0.0, min(a[3], b[3]) - max(a[1], b[1]))
+    inter = inter_w * inter_h
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+def match_detections(reference, candidate, iou_threshold):
+    """Greedy same-class matching; returns (matched pairs, unmatched reference count)"""
+    used = set()
+    pairs = []
+    for ref in sorted(reference, key=lambda d: -d['confidence']):
+        best, best_iou = None, iou_threshold
+        for j, cand in enumerate(candidate):
+            if j in used or cand['class_id'] != ref['class_id']:
+                continue
+            iou = box_iou(ref['bbox'], cand['bbox'])
+            if iou >= best_iou:
+                best, best_iou = j, iou
+        if best is not None:
+            used.add(best)
+            pairs.append((ref, candidate[best], best_iou))
+    return pairs, len(reference) - len(pairs)
+
+def timed_detect(detector, image):
+    start = time.perf_counter()
+    detections = detector.detect(image)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    return detections.to_list(), elapsed_ms
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Compare ultralytics and ONNX Runtime detector backends')
+    parser.add_argument('--images', default='datasets/waste_images')
+    parser.add_argument('--limit', type=int, default=100)
+    parser.add_argument('--num-threads', type=int, default=None)
+    parser.add_argument('--iou', type=float, default=0.9, help='Min IoU for two boxes to count as the same detection')
+    parser.add_argument('--min-match', type=float, default=0.95, help='Min fraction of PyTorch boxes matched')
+    args = parser.parse_args()
+
+    paths = list_images(args.images, args.limit)
+    if not paths:
+        print(f"No images found under {args.images}")
+        sys.exit(1)
+
+    reference = YOLOv8WasteDetector(backend='ultralytics', num_threads=args.num_threads)
+    candidate = YOLOv8WasteDetector(backend='onnx', num_threads=args.num_threads)
+    reference.warmup()
+    candidate.warmup()
+
+    total_ref = total_matched = 0
+    conf_diffs, ious = [], []
+    severity_agree = 0
+    ref_ms, cand_ms = [], []
+
+    for path in paths:
+        image = DecodedImage.from_path(path)
+
+        ref_dets, ms = timed_detect(reference, image)
+        ref_ms.append(ms)
+        cand_dets, ms = timed_detect(candidate, image)
+        cand_ms.append(ms)
+
+        pairs, _ = match_detections(ref_dets, cand_dets, args.iou)
+        total_ref += len(ref_dets)
+        total_matched += len(pairs)
+        conf_diffs.extend(abs(a['confidence'] - b['confidence']) for a, b, _ in pairs)
+        ious.extend(iou for _, _, iou in pairs)
+
+        ref_sev = reference.analyze_severity(ref_dets)
+        cand_sev = candidate.analyze_severity(cand_dets)
+        severity_agree += ref_sev['level'] == cand_sev['level'] and ref_sev['priority'] == cand_sev['priority']
+
+    match_rate = total_matched / total_ref if total_ref else 1.0
+
+    print(f"\nImages: {len(paths)}, reference detections: {total_ref}")
+    print(f"  matched boxes: {match_rate:.2%} (IoU >= {args.iou}, same class)")
+    if ious:
+        print(f"  mean IoU of matches: {np.mean(ious):.4f}")
+        print(f"  mean |conf diff|: {np.mean(conf_diffs):.4f}, max: {np.max(conf_diffs):.4f}")
+    print(f"  severity level+priority agreement: {severity_agree / len(paths):.2%}")
+    print(f"\n  {'backend':<14}{'p50':>10}{'p95':>10}{'weights':>12}")
+    for name, detector, samples in (('ultralytics', reference, ref_ms), ('onnxruntime', candidate, cand_ms)):
+        print(f"  {name:<14}{np.percentile(samples, 50):>8.1f}ms{np.percentile(samples, 95):>8.1f}ms"
+              f"{detector.memory_bytes() / 2**20:>10.1f}MB")
+
+    if match_rate < args.min_match:
+        print(f"\nFAIL: match rate below {args.min_match:.0%}")
+        sys.exit(1)
+    print("\nOK: backends match within tolerance")
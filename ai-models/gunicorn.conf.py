@@ -0,0 +1,49 @@
+"""
+Gunicorn config for the preload-then-fork serving mode
+
+    gunicorn -c gunicorn.conf.py app:app
+    gunicorn -c gunicorn.conf.py -k uvicorn.workers.UvicornWorker asgi_app:app
+
+The master loads the fork-safe models once and forks the workers from it, so
+their weights (and the imported libraries) are shared copy-on-write. Models
+whose runtimes cannot survive fork() are loaded by each worker after forking.
+Every worker caps its intra-op threads so N workers do not oversubscribe the CPUs.
+"""
+
+import gc
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 8000)}"
+workers = int(os.environ.get('WEB_CONCURRENCY', 2))
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 8))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 120))
+preload_app = os.environ.get('PRELOAD_MODELS', '1') == '1'
+
+# Intra-op threads per runtime in each worker
+worker_threads = int(os.environ.get('WORKER_THREADS', 0)) or max(1, (os.cpu_count() or 1) // workers)
+
+if preload_app:
+    # services.start() loads the fork-safe models in the master instead of a background thread
+    os.environ['MODEL_PRELOAD'] = '1'
+    # No collections while loading, so freed objects do not leave holes in shared pages
+    gc.disable()
+
+def when_ready(server):
+    if not preload_app:
+        return
+
+    import services
+    services.start()
+
+    # Move everything loaded so far out of the GC's reach; collections in the
+    # workers would otherwise write to every object header and un-share the pages
+    gc.collect()
+    gc.freeze()
+    server.log.info(f"Models preloaded, forking {workers} workers with {worker_threads} threads each")
+
+def post_fork(server, worker):
+    gc.enable()
+
+    import services
+    services.start_worker(worker_threads)
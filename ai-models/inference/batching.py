@@ -0,0 +1,132 @@
+"""
+Dynamic micro-batching for model inference
+Groups concurrent single-image requests into one batched forward pass
+"""
+
+from concurrent.futures import Future
+import threading
+import queue
+import time
+import numpy as np
+
+class BatcherClosed(RuntimeError):
+    """Raised for inputs submitted to, or still queued in, a closed batcher"""
+
+    def __init__(self):
+        super().__init__("Batcher has been closed")
+
+class MicroBatcher:
+    """
+    Collects inputs from concurrent callers and runs them as one batch
+
+    A batch is dispatched as soon as it holds max_batch_size items or the
+    oldest item has waited max_wait_ms, whichever comes first.
+    """
+
+    def __init__(self, predict_fn, max_batch_size=8, max_wait_ms=5.0, name='micro-batcher',
+                 result_timeout=60.0):
+        """
+        Args:
+            predict_fn: Batched inference function (N, ...) -> (N, ...)
+            max_batch_size: Max inputs per forward pass
+            max_wait_ms: Max time the oldest input waits for a fuller batch
+            name: Worker thread name
+            result_timeout: Default seconds predict() waits for its output
+        """
+        self.predict_fn = predict_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self.result_timeout = result_timeout
+        self._queue = queue.Queue()
+        self._stopped = False
+        # Orders submits against close, so nothing is queued behind the stop marker
+        self._lock = threading.Lock()
+
+        self._worker = threading.Thread(target=self._run, name=name, daemon=True)
+        self._worker.start()
+
+    def submit(self, item):
+        """
+        Queue a single input (without batch dimension)
+
+        Returns:
+            Future resolving to the matching row of the batched output
+
+        Raises:
+            BatcherClosed: after close()
+        """
+        future = Future()
+        with self._lock:
+            if self._stopped:
+                raise BatcherClosed()
+            self._queue.put((item, future))
+        return future
+
+    def predict(self, item, timeout=None):
+        """
+        Blocking helper: submit one input and wait for its output
+
+        Raises:
+            BatcherClosed: when the batcher is closed before serving the input
+            concurrent.futures.TimeoutError: after timeout (default result_timeout) seconds
+        """
+        return self.submit(item).result(timeout=self.result_timeout if timeout is None else timeout)
+
+    def close(self):
+        """Stop the worker after pending batches are served (idempotent)"""
+        with self._lock:
+            if not self._stopped:
+                self._stopped = True
+                self._queue.put(None)
+        self._worker.join()
+
+        # Nothing should be left, but never leave a caller waiting forever
+        while True:
+            try:
+                entry = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if entry is not None:
+                entry[1].set_exception(BatcherClosed())
+
+    def _collect_batch(self, first):
+        """Gather up to max_batch_size items, waiting at most max_wait"""
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                entry = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if entry is None:
+                # Re-queue the stop marker so the main loop sees it
+                self._queue.put(None)
+                break
+            batch.append(entry)
+
+        return batch
+
+    def _run(self):
+        """Worker loop: one predict_fn call per collected batch"""
+        while True:
+            first = self._queue.get()
+            if first is None:
+                break
+
+            batch = self._collect_batch(first)
+            futures = [future for _, future in batch]
+
+            try:
+                inputs = np.stack([item for item, _ in batch])
+                outputs = self.predict_fn(inputs)
+            except Exception as e:
+                for future in futures:
+                    future.set_exception(e)
+                continue
+
+            for i, future in enumerate(futures):
+                future.set_result(outputs[i])
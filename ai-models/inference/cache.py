@@ -0,0 +1,134 @@
+"""
+Bounded in-memory LRU cache with optional TTL and on-disk tier
+Shared by the embedding and inference result caches
+"""
+
+from collections import OrderedDict
+import threading
+import hashlib
+import pickle
+import time
+import os
+
+def file_version(path):
+    """Identify a weights file by path, size and modification time (for cache keys)"""
+    stat = os.stat(path)
+    key = f"{os.path.abspath(path)}:{stat.st_size}:{stat.st_mtime_ns}"
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()[:16]
+
+class LRUCache:
+    """
+    Thread-safe LRU cache
+
+    Entries beyond max_entries are evicted least-recently-used first and
+    entries older than ttl_seconds are treated as misses. When persist_dir is
+    set, values are also written to disk and memory misses fall back to it.
+    """
+
+    def __init__(self, max_entries=1024, ttl_seconds=None, persist_dir=None):
+        self.max_entries = max(1, int(max_entries))
+        self.ttl_seconds = ttl_seconds
+        self.persist_dir = persist_dir
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        if self.persist_dir:
+            os.makedirs(self.persist_dir, exist_ok=True)
+
+    def get(self, key, default=None):
+        """Return the cached value for key, or default"""
+        now = time.time()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                stored_at, value = entry
+                if not self._expired(stored_at, now):
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+
+        value = self._read_disk(key, now)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return default
+            self.disk_hits += 1
+            self._store(key, value, now)
+        return value
+
+    def set(self, key, value):
+        """Insert or refresh a value"""
+        now = time.time()
+        with self._lock:
+            self._store(key, value, now)
+        self._write_disk(key, value)
+
+    def clear(self):
+        """Drop all in-memory entries (the disk tier is left in place)"""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        """Counters for health reporting"""
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'hit_rate': round((self.hits + self.disk_hits) / lookups, 4) if lookups else 0.0
+            }
+
+    def _expired(self, stored_at, now):
+        return self.ttl_seconds is not None and now - stored_at > self.ttl_seconds
+
+    def _store(self, key, value, now):
+        """Insert under the lock and evict down to max_entries"""
+        self._entries[key] = (now, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _disk_path(self, key):
+        digest = hashlib.sha1(str(key).encode('utf-8')).hexdigest()
+        return os.path.join(self.persist_dir, digest[:2], digest + '.pkl')
+
+    def _read_disk(self, key, now):
+        if not self.persist_dir:
+            return None
+
+        path = self._disk_path(key)
+        try:
+            if self._expired(os.path.getmtime(path), now):
+                os.unlink(path)
+                return None
+            with open(path, 'rb') as f:
+                return pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return None
+
+    def _write_disk(self, key, value):
+        if not self.persist_dir:
+            return
+
+        path = self._disk_path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write then rename so readers never see a partial file
+            temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(temp_path, 'wb') as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_path, path)
+        except OSError as e:
+            print(f"Cache write error: {str(e)}")
@@ -0,0 +1,92 @@
+"""
+Columnar detection results
+Boxes, confidences and class ids are kept as NumPy arrays until the response is built
+"""
+
+import numpy as np
+
+class Detections:
+    """
+    Detections of one image as parallel arrays
+
+    xyxy: float32 (N, 4) boxes in image pixels
+    conf: float32 (N,) confidences
+    cls: int64 (N,) class ids
+    mock: True for placeholder results returned when the model is unavailable
+    """
+
+    def __init__(self, xyxy, conf, cls, class_names, mock=False):
+        self.xyxy = np.asarray(xyxy, dtype=np.float32).reshape(-1, 4)
+        self.conf = np.asarray(conf, dtype=np.float32).reshape(-1)
+        self.cls = np.asarray(cls, dtype=np.int64).reshape(-1)
+        self.class_names = class_names
+        self.mock = mock
+
+    @classmethod
+    def empty(cls, class_names):
+        return cls(np.zeros((0, 4)), np.zeros(0), np.zeros(0), class_names)
+
+    @classmethod
+    def from_list(cls, detections, class_names):
+        """Build from the list-of-dicts format returned by the API"""
+        if not detections:
+            return cls.empty(class_names)
+        return cls(
+            [det['bbox'] for det in detections],
+            [det['confidence'] for det in detections],
+            [det['class_id'] for det in detections],
+            class_names
+        )
+
+    def __len__(self):
+        return len(self.conf)
+
+    def names(self):
+        """Class name per detection, as an object array"""
+        lookup = np.array(
+            [self.class_names.get(class_id, 'unknown') for class_id in range(max(self.class_names) + 1)] + ['unknown'],
+            dtype=object
+        )
+        ids = np.where((self.cls >= 0) & (self.cls < len(lookup) - 1), self.cls, len(lookup) - 1)
+        return lookup[ids]
+
+    def areas(self):
+        """Box areas in pixels"""
+        return (self.xyxy[:, 2] - self.xyxy[:, 0]) * (self.xyxy[:, 3] - self.xyxy[:, 1])
+
+    def counts(self):
+        """
+        Detections per class name, ordered by first appearance
+
+        Returns:
+            dict of class name -> count
+        """
+        if len(self) == 0:
+            return {}
+        names, first_index, counts = np.unique(self.names(), return_index=True, return_counts=True)
+        order = np.argsort(first_index)
+        return {str(names[i]): int(counts[i]) for i in order}
+
+    def select(self, mask):
+        """Subset of detections by boolean mask or index array"""
+        return Detections(self.xyxy[mask], self.conf[mask], self.cls[mask], self.class_names, self.mock)
+
+    def scaled(self, scale):
+        """Detections with boxes scaled by (x, y) factors, e.g. back to original image pixels"""
+        factors = np.array([scale[0], scale[1], scale[0], scale[1]], dtype=np.float32)
+        return Detections(self.xyxy * factors, self.conf, self.cls, self.class_names, self.mock)
+
+    def to_list(self):
+        """JSON-ready list of detection dicts (the API response format)"""
+        names = self.names().tolist()
+        return [
+            {
+                'bbox': box,  # [x1, y1, x2, y2]
+                'confidence': score,
+                'class_id': class_id,
+                'class_name': name
+            }
+            for box, score, class_id, name in zip(
+                self.xyxy.tolist(), self.conf.tolist(), self.cls.tolist(), names
+            )
+        ]
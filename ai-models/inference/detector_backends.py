@@ -0,0 +1,194 @@
+"""
+Inference backends for YOLOv8WasteDetector
+Every backend returns raw per-image arrays: xyxy boxes, confidences and class ids
+"""
+
+import numpy as np
+import cv2
+import os
+
+class UltralyticsBackend:
+    """PyTorch weights served through ultralytics.YOLO"""
+
+    name = 'ultralytics'
+
+    def __init__(self, model_path, num_threads=None):
+        from ultralytics import YOLO
+
+        if num_threads:
+            import torch
+            torch.set_num_threads(num_threads)
+
+        self.model_path = model_path
+        self.model = YOLO(model_path)
+
+    def predict(self, sources, conf_threshold=0.25, imgsz=640):
+        """
+        Args:
+            sources: list of BGR arrays or image paths
+
+        Returns:
+            list of (xyxy (N, 4), conf (N,), cls (N,)) numpy tuples, one per source
+        """
+        results = self.model(sources, conf=conf_threshold, imgsz=imgsz, verbose=False)
+
+        outputs = []
+        for result in results:
+            boxes = result.boxes
+            outputs.append((
+                boxes.xyxy.cpu().numpy().astype(np.float32),
+                boxes.conf.cpu().numpy().astype(np.float32),
+                boxes.cls.cpu().numpy().astype(np.int64)
+            ))
+        return outputs
+
+    def memory_bytes(self):
+        module = self.model.model
+        tensors = list(module.parameters()) + list(module.buffers())
+        return int(sum(t.numel() * t.element_size() for t in tensors))
+
+class OnnxRuntimeBackend:
+    """
+    ONNX export of the YOLOv8 weights served with onnxruntime on CPU
+
+    Pre- and post-processing mirror ultralytics: letterbox to imgsz with
+    gray padding, confidence filter on the best class score, class-aware NMS.
+    """
+
+    name = 'onnx'
+
+    def __init__(self, onnx_path, num_threads=None, imgsz=640, iou_threshold=0.7, max_det=300):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+            options.inter_op_num_threads = 1
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+
+        self.onnx_path = onnx_path
+        self.session = ort.InferenceSession(onnx_path, options, providers=['CPUExecutionProvider'])
+        self.input_name = self.session.get_inputs()[0].name
+        self.imgsz = imgsz
+        self.iou_threshold = iou_threshold
+        self.max_det = max_det
+
+    def predict(self, sources, conf_threshold=0.25, imgsz=None):
+        """Same contract as UltralyticsBackend.predict"""
+        size = imgsz or self.imgsz
+
+        images = [cv2.imread(source) if isinstance(source, str) else source for source in sources]
+        letterboxed = [self._letterbox(image, size) for image in images]
+
+        batch = np.stack([tensor for tensor, _, _ in letterboxed])
+        predictions = self.session.run(None, {self.input_name: batch})[0]
+
+        outputs = []
+        for i, (_, ratio, padding) in enumerate(letterboxed):
+            outputs.append(self._postprocess(predictions[i], conf_threshold, ratio, padding, images[i].shape))
+        return outputs
+
+    def memory_bytes(self):
+        return os.path.getsize(self.onnx_path)
+
+    def _letterbox(self, image, size):
+        """Resize keeping aspect ratio, pad to size x size, return CHW float32 RGB"""
+        height, width = image.shape[:2]
+        ratio = min(size / height, size / width)
+        new_width, new_height = int(round(width * ratio)), int(round(height * ratio))
+
+        pad_x = (size - new_width) / 2
+        pad_y = (size - new_height) / 2
+
+        if (width, height) != (new_width, new_height):
+            image = cv2.resize(image, (new_width, new_height), interpolation=cv2.INTER_LINEAR)
+
+        top, bottom = int(round(pad_y - 0.1)), int(round(pad_y + 0.1))
+        left, right = int(round(pad_x - 0.1)), int(round(pad_x + 0.1))
+        image = cv2.copyMakeBorder(image, top, bottom, left, right, cv2.BORDER_CONSTANT, value=(114, 114, 114))
+
+        tensor = image[:, :, ::-1].transpose(2, 0, 1).astype(np.float32) / 255.0
+        return np.ascontiguousarray(tensor), ratio, (left, top)
+
+    def _postprocess(self, prediction, conf_threshold, ratio, padding, image_shape):
+        """Decode one (4 + num_classes, anchors) output into boxes in image pixels"""
+        prediction = prediction.T
+        scores = prediction[:, 4:]
+        cls = scores.argmax(axis=1)
+        conf = scores[np.arange(len(scores)), cls]
+
+        keep = conf > conf_threshold
+        boxes, conf, cls = prediction[keep, :4], conf[keep], cls[keep]
+        if len(conf) == 0:
+            return (np.zeros((0, 4), np.float32), np.zeros(0, np.float32), np.zeros(0, np.int64))
+
+        # xywh (center) -> xyxy
+        xyxy = np.empty_like(boxes)
+        xyxy[:, 0] = boxes[:, 0] - boxes[:, 2] / 2
+        xyxy[:, 1] = boxes[:, 1] - boxes[:, 3] / 2
+        xyxy[:, 2] = boxes[:, 0] + boxes[:, 2] / 2
+        xyxy[:, 3] = boxes[:, 1] + boxes[:, 3] / 2
+
+        keep = nms(xyxy, conf, cls, self.iou_threshold)[:self.max_det]
+        xyxy, conf, cls = xyxy[keep], conf[keep], cls[keep]
+
+        # Undo letterbox
+        xyxy[:, [0, 2]] = (xyxy[:, [0, 2]] - padding[0]) / ratio
+        xyxy[:, [1, 3]] = (xyxy[:, [1, 3]] - padding[1]) / ratio
+        xyxy[:, [0, 2]] = xyxy[:, [0, 2]].clip(0, image_shape[1])
+        xyxy[:, [1, 3]] = xyxy[:, [1, 3]].clip(0, image_shape[0])
+
+        return xyxy.astype(np.float32), conf.astype(np.float32), cls.astype(np.int64)
+
+def nms(xyxy, conf, cls, iou_threshold, metric='iou'):
+    """
+    Class-aware non-maximum suppression
+
+    Args:
+        metric: 'iou', or 'ios' (intersection over the smaller box) to also
+            suppress fragments contained in a larger box, e.g. when merging tiles
+
+    Returns:
+        Indices of kept boxes, highest confidence first
+    """
+    if len(xyxy) == 0:
+        return np.zeros(0, dtype=np.int64)
+
+    # Offset boxes per class by more than the coordinate span so different
+    # classes never overlap, whatever the image size (float64 keeps precision)
+    xyxy = xyxy.astype(np.float64)
+    span = xyxy.max() - xyxy.min() + 1.0
+    offset = xyxy + (cls.astype(np.float64) * span)[:, None]
+    order = conf.argsort()[::-1]
+
+    x1, y1, x2, y2 = offset[:, 0], offset[:, 1], offset[:, 2], offset[:, 3]
+    areas = (x2 - x1) * (y2 - y1)
+
+    keep = []
+    while len(order):
+        i = order[0]
+        keep.append(i)
+        rest = order[1:]
+
+        inter_w = np.maximum(0, np.minimum(x2[i], x2[rest]) - np.maximum(x1[i], x1[rest]))
+        inter_h = np.maximum(0, np.minimum(y2[i], y2[rest]) - np.maximum(y1[i], y1[rest]))
+        inter = inter_w * inter_h
+        if metric == 'ios':
+            iou = inter / np.maximum(np.minimum(areas[i], areas[rest]), 1e-9)
+        else:
+            iou = inter / np.maximum(areas[i] + areas[rest] - inter, 1e-9)
+
+        order = rest[iou <= iou_threshold]
+
+    return np.array(keep, dtype=np.int64)
+
+def export_onnx(model_path, imgsz=640):
+    """
+    Export PyTorch YOLOv8 weights to ONNX with a dynamic batch dimension
+
+    Returns:
+        Path of the exported .onnx file (next to the weights)
+    """
+    from ultralytics import YOLO
+
+    return YOLO(model_path).export(format='onnx', imgsz=imgsz, dynamic=True, simplify=True)
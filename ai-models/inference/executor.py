@@ -0,0 +1,104 @@
+"""
+Bounded thread pool for running blocking decode and inference off the event loop
+Rejects work instead of queueing without limit, with a Retry-After estimate
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
+
+class QueueFull(Exception):
+    """Raised when the executor already holds max_queue pending or running jobs"""
+
+    def __init__(self, retry_after):
+        super().__init__(f"Inference queue full, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+class InferenceExecutor:
+    """
+    ThreadPoolExecutor with admission control
+
+    TensorFlow, PyTorch and onnxruntime release the GIL inside their kernels,
+    so a few threads keep the cores busy while the event loop stays free.
+    """
+
+    def __init__(self, max_workers=4, max_queue=64, name='inference'):
+        """
+        Args:
+            max_workers: Threads running jobs concurrently
+            max_queue: Max jobs admitted at once (running + waiting)
+            name: Thread name prefix
+        """
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._slots = threading.BoundedSemaphore(max_queue)
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._rejected = 0
+        self._completed = 0
+        self._avg_seconds = None
+
+    def submit(self, fn, *args):
+        """
+        Submit a blocking job
+
+        Returns:
+            concurrent.futures.Future
+
+        Raises:
+            QueueFull: if max_queue jobs are already admitted
+        """
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._rejected += 1
+            raise QueueFull(self.retry_after())
+
+        with self._lock:
+            self._in_flight += 1
+
+        try:
+            return self._pool.submit(self._run, fn, args)
+        except Exception:
+            self._release(None)
+            raise
+
+    def _run(self, fn, args):
+        start = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            self._release(time.perf_counter() - start)
+
+    def _release(self, elapsed):
+        with self._lock:
+            self._in_flight -= 1
+            if elapsed is not None:
+                self._completed += 1
+                # Exponentially weighted job latency for the Retry-After estimate
+                if self._avg_seconds is None:
+                    self._avg_seconds = elapsed
+                else:
+                    self._avg_seconds = 0.9 * self._avg_seconds + 0.1 * elapsed
+        self._slots.release()
+
+    def retry_after(self):
+        """Seconds until a slot is likely to free up (at least 1)"""
+        with self._lock:
+            avg = self._avg_seconds or 1.0
+            waves = self._in_flight / max(self.max_workers, 1)
+        return max(1, int(round(avg * waves)))
+
+    def stats(self):
+        with self._lock:
+            return {
+                'max_workers': self.max_workers,
+                'max_queue': self.max_queue,
+                'in_flight': self._in_flight,
+                'completed': self._completed,
+                'rejected': self._rejected,
+                'avg_job_ms': round(self._avg_seconds * 1000, 2) if self._avg_seconds is not None else None
+            }
+
+    def shutdown(self, wait=True):
+        self._pool.shutdown(wait=wait)
@@ -0,0 +1,212 @@
+"""
+In-memory image decoding
+Decodes an uploaded image once so every model in a request can share it
+"""
+
+import numpy as np
+from PIL import Image
+import zipfile
+import hashlib
+import io
+import os
+
+# Image types accepted everywhere: serving, batch archives and training
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.gif', '.webp')
+
+# Uploads are hashed in chunks of this size instead of being read into one buffer
+HASH_CHUNK_BYTES = 1024 * 1024
+
+class UploadLimitExceeded(ValueError):
+    """Raised when a request carries too many images or too much decompressed data"""
+
+class DecodedImage:
+    """
+    A single decoded RGB image with cached derived views
+    """
+
+    def __init__(self, image, data=None, content_hash=None, original_size=None):
+        # Convert to RGB if necessary
+        if image.mode != 'RGB':
+            image = image.convert('RGB')
+
+        self.image = image
+        self.data = data
+        self._rgb_array = None
+        self._bgr_array = None
+        self._resized = {}
+        self._content_hash = content_hash
+        # (width, height) of the encoded image, before any reduced-size decoding
+        self.original_size = tuple(original_size) if original_size else image.size
+
+    @classmethod
+    def _decode(cls, stream, max_side, content_hash):
+        """
+        Decode from a seekable stream, optionally at reduced size
+
+        With max_side set, JPEGs are decoded by libjpeg at 1/2, 1/4 or 1/8
+        scale straight from the DCT coefficients (PIL draft mode), so the full
+        resolution bitmap is never allocated; the result is then bounded to
+        max_side on its longest edge.
+        """
+        image = Image.open(stream)
+        original_size = image.size
+
+        if max_side and max(original_size) > max_side:
+            scale = max_side / max(original_size)
+            image.draft('RGB', (int(original_size[0] * scale) + 1, int(original_size[1] * scale) + 1))
+            image.load()
+            if max(image.size) > max_side:
+                image.thumbnail((max_side, max_side))
+        else:
+            image.load()
+
+        return cls(image, content_hash=content_hash, original_size=original_size)
+
+    @classmethod
+    def from_bytes(cls, data, max_side=None):
+        """
+        Decode raw encoded image bytes
+
+        Args:
+            data: Encoded image bytes
+            max_side: Optional longest edge to decode at (see _decode)
+        """
+        return cls._decode(io.BytesIO(data), max_side, hashlib.sha256(data).hexdigest())
+
+    @classmethod
+    def from_file(cls, image_file, max_side=None):
+        """
+        Decode a file-like object such as Flask request.files entry
+
+        Seekable uploads (spooled to a temporary file by the multipart parser)
+        are hashed in chunks and decoded from the stream, without reading the
+        whole file into memory.
+        """
+        stream = getattr(image_file, 'stream', image_file)
+        seekable = stream.seekable() if hasattr(stream, 'seekable') else hasattr(stream, 'seek')
+        if not seekable:
+            return cls.from_bytes(stream.read(), max_side)
+
+        start = stream.tell()
+        digest = hashlib.sha256()
+        for chunk in iter(lambda: stream.read(HASH_CHUNK_BYTES), b''):
+            digest.update(chunk)
+        stream.seek(start)
+
+        return cls._decode(stream, max_side, digest.hexdigest())
+
+    @classmethod
+    def from_path(cls, image_path, max_side=None):
+        """Decode an image file on disk"""
+        with open(image_path, 'rb') as f:
+            return cls.from_file(f, max_side)
+
+    @property
+    def width(self):
+        return self.image.width
+
+    @property
+    def height(self):
+        return self.image.height
+
+    @property
+    def area(self):
+        return self.image.width * self.image.height
+
+    @property
+    def scale(self):
+        """(x, y) factors mapping decoded pixel coordinates to the original image"""
+        return (self.original_size[0] / self.image.width, self.original_size[1] / self.image.height)
+
+    @property
+    def content_hash(self):
+        """SHA-256 of the encoded bytes (of the pixels if built from an image)"""
+        if self._content_hash is None:
+            if self.data is not None:
+                digest = hashlib.sha256(self.data)
+            else:
+                digest = hashlib.sha256(self.rgb_array().tobytes())
+            self._content_hash = digest.hexdigest()
+        return self._content_hash
+
+    def rgb_array(self):
+        """HxWx3 uint8 RGB array"""
+        if self._rgb_array is None:
+            self._rgb_array = np.asarray(self.image)
+        return self._rgb_array
+
+    def bgr_array(self):
+        """HxWx3 uint8 BGR array, the layout OpenCV and ultralytics expect"""
+        if self._bgr_array is None:
+            self._bgr_array = np.ascontiguousarray(self.rgb_array()[:, :, ::-1])
+        return self._bgr_array
+
+    def resized(self, size):
+        """Resized PIL image, cached per (width, height)"""
+        size = tuple(size)
+        if size not in self._resized:
+            self._resized[size] = self.image.resize(size)
+        return self._resized[size]
+
+    def normalized(self, size):
+        """Resized float32 array scaled to [0, 1], without batch dimension"""
+        return np.asarray(self.resized(size), dtype=np.float32) / 255.0
+
+
+def list_archive_images(archive_file, max_entries=None, max_images=None, max_entry_bytes=None,
+                        max_total_bytes=None):
+    """
+    List images inside a zip archive, in archive order
+
+    Limits are checked against the sizes recorded in the archive before
+    anything is decompressed; zipfile never inflates an entry past its
+    recorded size, and read_fn checks the size again.
+
+    Args:
+        archive_file: File-like object holding a zip archive
+        max_entries: Max entries of any kind in the archive
+        max_images: Max image entries
+        max_entry_bytes: Max decompressed size of one image
+        max_total_bytes: Max decompressed size of all images together
+
+    Returns:
+        list of (filename, read_fn) tuples; read_fn() returns the image bytes
+
+    Raises:
+        UploadLimitExceeded: when the archive exceeds a limit
+    """
+    archive = zipfile.ZipFile(archive_file)
+    infos = archive.infolist()
+    if max_entries is not None and len(infos) > max_entries:
+        raise UploadLimitExceeded(f"Archive has {len(infos)} entries (limit {max_entries})")
+
+    def read(info):
+        with archive.open(info) as f:
+            data = f.read(max_entry_bytes + 1) if max_entry_bytes is not None else f.read()
+        if max_entry_bytes is not None and len(data) > max_entry_bytes:
+            raise UploadLimitExceeded(f"{info.filename} exceeds {max_entry_bytes} bytes")
+        return data
+
+    entries = []
+    total_bytes = 0
+    for info in infos:
+        if info.is_dir():
+            continue
+        if not info.filename.lower().endswith(IMAGE_EXTENSIONS):
+            continue
+        # Skip macOS resource forks
+        if os.path.basename(info.filename).startswith('._'):
+            continue
+
+        if max_entry_bytes is not None and info.file_size > max_entry_bytes:
+            raise UploadLimitExceeded(f"{info.filename} is {info.file_size} bytes uncompressed "
+                                      f"(limit {max_entry_bytes})")
+        total_bytes += info.file_size
+        if max_total_bytes is not None and total_bytes > max_total_bytes:
+            raise UploadLimitExceeded(f"Archive images exceed {max_total_bytes} bytes uncompressed")
+        if max_images is not None and len(entries) >= max_images:
+            raise UploadLimitExceeded(f"Too many images (limit {max_images})")
+
+        entries.append((info.filename, lambda info=info: read(info)))
+
+    return entries
@@ -5,24 +5,62 @@ import cv2
 from PIL import Image
 import io
 import os
+import time
+from inference.image_io import DecodedImage
+from inference.batching import MicroBatcher, BatcherClosed
+from inference.compiled_model import CompiledModel
+from inference.tflite_model import TFLiteModel, bucket_sizes
+from inference.cache import file_version
 
 class WasteClassifier:
     """Waste classification inference"""
     
-    def __init__(self, model_path='pretrained/waste_classifier.h5'):
+    def __init__(self, model_path='pretrained/waste_classifier.h5', max_batch_size=1, max_wait_ms=5.0,
+                 compiled=True, backend='keras', tflite_path='pretrained/waste_classifier_int8.tflite',
+                 num_threads=None):
         self.model_path = model_path
         self.model = None
         self.class_names = ['plastic', 'organic', 'electronic', 'hazardous', 'other']
         self.image_size = (224, 224)
+        self.batcher = None
+        self.infer = None
+        self.backend = backend
+        # Identifies the loaded weights in result cache keys; None for dummy predictions
+        self.model_version = None
         
-        # Load model
-        self.load_model()
+        if backend == 'tflite' and os.path.exists(tflite_path):
+            # Quantized artifact replaces the Keras model entirely
+            # One allocated interpreter per micro-batch size bucket
+            self.infer = TFLiteModel(tflite_path, num_threads=num_threads, batch_sizes=bucket_sizes(max_batch_size))
+            self.model_version = file_version(tflite_path)
+            print(f"Quantized classifier loaded from {tflite_path}")
+        else:
+            if backend == 'tflite':
+                print(f"TFLite model not found at {tflite_path} - falling back to Keras")
+                self.backend = 'keras'
+            
+            # Load model
+            self.load_model()
+            
+            # Traced inference function, bypassing model.predict overhead
+            if self.model is not None and compiled:
+                self.infer = CompiledModel(self.model, [self.image_size + (3,)])
+        
+        # Group concurrent requests into one forward pass
+        if (self.model is not None or self.infer is not None) and max_batch_size > 1:
+            self.batcher = MicroBatcher(
+                self.predict_batch,
+                max_batch_size=max_batch_size,
+                max_wait_ms=max_wait_ms,
+                name='classifier-batcher'
+            )
     
     def load_model(self):
         """Load trained model"""
         if os.path.exists(self.model_path):
             try:
                 self.model = keras.models.load_model(self.model_path)
+                self.model_version = file_version(self.model_path)
                 print(f"Model loaded from {self.model_path}")
             except Exception as e:
                 print(f"Failed to load model: {str(e)}")
@@ -33,33 +71,96 @@ class WasteClassifier:
             print("Using dummy predictions")
             self.model = None
     
-    def preprocess_image(self, image_file):
-        """Preprocess image for prediction"""
-        # Read image
-        image_bytes = image_file.read()
-        image = Image.open(io.BytesIO(image_bytes))
+    def warmup(self, batch_sizes=(1,)):
+        """
+        Run synthetic inputs through the full predict path for each batch size
         
-        # Convert to RGB if necessary
-        if image.mode != 'RGB':
-            image = image.convert('RGB')
+        Returns:
+            Elapsed warm-up time in seconds
+        """
+        start = time.perf_counter()
         
-        # Resize
-        image = image.resize(self.image_size)
+        # Real request path: decode, resize, single-image inference
+        image = DecodedImage(Image.new('RGB', (640, 480)))
+        self.predict(image)
         
-        # Convert to array and normalize
-        img_array = np.array(image) / 255.0
+        # Batched shapes used by the micro-batcher and batch endpoints
+        for batch_size in batch_sizes:
+            img_batch = np.zeros((batch_size,) + self.image_size + (3,), dtype=np.float32)
+            self.predict_batch(img_batch)
+        
+        return time.perf_counter() - start
+    
+    def memory_bytes(self):
+        """Bytes held by the model weights"""
+        if self.backend == 'tflite':
+            return self.infer.memory_bytes()
+        if self.model is None:
+            return 0
+        return int(sum(w.nbytes for w in self.model.get_weights()))
+    
+    def close(self):
+        """Stop the micro-batching worker so the model can be released"""
+        # Clear first so new requests take the direct path while it drains
+        batcher, self.batcher = self.batcher, None
+        if batcher is not None:
+            batcher.close()
+    
+    def preprocess_image(self, image_file):
+        """Preprocess image for prediction"""
+        # Decode unless the caller already shares a decoded image
+        if isinstance(image_file, DecodedImage):
+            image = image_file
+        else:
+            image = DecodedImage.from_file(image_file)
+        
+        # Resize, convert to array and normalize
+        img_array = image.normalized(self.image_size)
         
         # Add batch dimension
         img_array = np.expand_dims(img_array, axis=0)
         
         return img_array
     
+    def predict_batch(self, img_batch):
+        """
+        Run one forward pass over a batch of preprocessed images
+        
+        Args:
+            img_batch: float32 array of shape (N, height, width, 3)
+        
+        Returns:
+            numpy array of shape (N, num_classes) with class probabilities
+        """
+        if self.infer is not None:
+            return self.infer(img_batch)
+        
+        if self.model is None:
+            predictions = np.random.rand(len(img_batch), len(self.class_names))
+            return predictions / predictions.sum(axis=1, keepdims=True)
+        
+        return np.asarray(self.model(img_batch, training=False))
+    
+    def _predict_single(self, img_array):
+        """Class probabilities of one preprocessed image, without the micro-batcher"""
+        if self.infer is not None:
+            return self.infer(img_array)[0]
+        
+        if self.model is not None:
+            # Make prediction
+            predictions = self.model.predict(img_array, verbose=0)
+            return predictions[0]  # Remove batch dimension
+        
+        # Dummy predictions for testing
+        predictions = np.random.rand(len(self.class_names))
+        return predictions / predictions.sum()  # Normalize
+    
     def predict(self, image_file):
         """
         Predict waste category from image
         
         Args:
-            image_file: File object from Flask request.files
+            image_file: File object from Flask request.files or a DecodedImage
         
         Returns:
             dict with predictions, top_class, and confidence
@@ -68,41 +169,66 @@ class WasteClassifier:
             # Preprocess image
             img_array = self.preprocess_image(image_file)
             
-            if self.model is not None:
-                # Make prediction
-                predictions = self.model.predict(img_array, verbose=0)
-                predictions = predictions[0]  # Remove batch dimension
+            # Read once: an idle unload may close and clear it concurrently
+            batcher = self.batcher
+            if batcher is None:
+                predictions = self._predict_single(img_array)
             else:
-                # Dummy predictions for testing
-                predictions = np.random.rand(len(self.class_names))
-                predictions = predictions / predictions.sum()  # Normalize
-            
-            # Get top prediction
-            top_idx = np.argmax(predictions)
-            top_class = self.class_names[top_idx]
-            confidence = float(predictions[top_idx])
-            
-            # Format all predictions
-            all_predictions = [
-                {
-                    'class': self.class_names[i],
-                    'confidence': float(predictions[i])
-                }
-                for i in range(len(self.class_names))
-            ]
-            
-            # Sort by confidence
-            all_predictions.sort(key=lambda x: x['confidence'], reverse=True)
-            
-            return {
-                'predictions': all_predictions,
-                'top_class': top_class,
-                'confidence': confidence
-            }
+                try:
+                    # Shared forward pass with other in-flight requests
+                    predictions = batcher.predict(img_array[0])
+                except BatcherClosed:
+                    # Closed while this request was in flight - run it directly
+                    predictions = self._predict_single(img_array)
             
+            return self._format_predictions(predictions)
+        
         except Exception as e:
             raise Exception(f"Prediction error: {str(e)}")
     
+    def predict_many(self, images):
+        """
+        Classify several images with a single batched forward pass
+        
+        Args:
+            images: list of DecodedImage or file objects
+        
+        Returns:
+            list of prediction dicts, in input order
+        """
+        if not images:
+            return []
+        
+        img_batch = np.concatenate([self.preprocess_image(image) for image in images])
+        predictions = self.predict_batch(img_batch)
+        
+        return [self._format_predictions(row) for row in predictions]
+    
+    def _format_predictions(self, predictions):
+        """Build the API response dict from one row of class probabilities"""
+        # Get top prediction
+        top_idx = np.argmax(predictions)
+        top_class = self.class_names[top_idx]
+        confidence = float(predictions[top_idx])
+        
+        # Format all predictions
+        all_predictions = [
+            {
+                'class': self.class_names[i],
+                'confidence': float(predictions[i])
+            }
+            for i in range(len(self.class_names))
+        ]
+        
+        # Sort by confidence
+        all_predictions.sort(key=lambda x: x['confidence'], reverse=True)
+        
+        return {
+            'predictions': all_predictions,
+            'top_class': top_class,
+            'confidence': confidence
+        }
+    
     def predict_from_path(self, image_path):
         """Predict from image file path"""
         img = keras.preprocessing.image.load_img(
@@ -113,7 +239,9 @@ class WasteClassifier:
         img_array = img_array / 255.0
         img_array = np.expand_dims(img_array, axis=0)
         
-        if self.model is not None:
+        if self.infer is not None:
+            predictions = self.infer(img_array)[0]
+        elif self.model is not None:
             predictions = self.model.predict(img_array, verbose=0)
             predictions = predictions[0]
         else:
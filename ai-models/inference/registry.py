@@ -0,0 +1,261 @@
+"""
+Model registry with eager/lazy loading, idle unloading and memory accounting
+Lets a worker pool load only the models its routes actually use
+"""
+
+import threading
+import time
+import gc
+import os
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+def current_rss_bytes():
+    """Resident set size of this process, or None when unavailable"""
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+class ModelEntry:
+    """Registration and runtime state of one model"""
+
+    def __init__(self, name, factory, mode='eager', idle_ttl=None, warmup=None, fork_safe=False):
+        self.name = name
+        self.factory = factory
+        self.mode = mode
+        self.idle_ttl = idle_ttl
+        self.warmup = warmup
+        self.fork_safe = fork_safe
+
+        self.model = None
+        self.lock = threading.Lock()
+        self.last_used = None
+        self.load_seconds = None
+        self.warmup_seconds = None
+        self.rss_delta_bytes = None
+        self.error = None
+        self.load_count = 0
+        self.preloaded = False
+
+class ModelRegistry:
+    """
+    Loads models on first use (or at startup when eager) and unloads idle ones
+
+    mode is one of 'eager', 'lazy' or 'disabled'. Models idle for longer than
+    idle_ttl seconds are released by a background reaper thread and reloaded
+    transparently on the next request.
+
+    Models registered as fork_safe can be preloaded in a pre-fork server
+    master so every worker shares their weight pages copy-on-write.
+    """
+
+    def __init__(self):
+        self._entries = {}
+        self._reaper = None
+
+    def register(self, name, factory, mode='eager', idle_ttl=None, warmup=None, fork_safe=False):
+        """
+        Register a model
+
+        Args:
+            name: Model name used by get()
+            factory: Callable returning a loaded model instance
+            mode: 'eager', 'lazy' or 'disabled'
+            idle_ttl: Seconds of inactivity before unloading (None keeps it resident)
+            warmup: Optional callable(model) returning warm-up seconds
+            fork_safe: True if the loaded model keeps working in a forked child
+                (no runtime thread pools started while loading)
+        """
+        if mode not in ('eager', 'lazy', 'disabled'):
+            raise ValueError(f"Unknown load mode for {name}: {mode}")
+        self._entries[name] = ModelEntry(name, factory, mode, idle_ttl, warmup, fork_safe)
+
+    def names(self, mode=None):
+        """Registered model names, optionally filtered by mode"""
+        return [name for name, entry in self._entries.items() if mode is None or entry.mode == mode]
+
+    def get(self, name):
+        """Return the loaded model, loading it on demand; None if unavailable"""
+        entry = self._entries[name]
+        if entry.mode == 'disabled':
+            return None
+
+        model = entry.model
+        if model is None:
+            model = self.load(name)
+
+        entry.last_used = time.monotonic()
+        return model
+
+    def is_loaded(self, name):
+        return self._entries[name].model is not None
+
+    def load(self, name, warmup=True):
+        """Load (and warm up) a model if it is not resident yet"""
+        entry = self._entries[name]
+
+        with entry.lock:
+            if entry.model is not None:
+                return entry.model
+
+            entry.error = None
+            rss_before = current_rss_bytes()
+            start = time.perf_counter()
+            try:
+                model = entry.factory()
+            except Exception as e:
+                entry.error = str(e)
+                print(f"Failed to load {name}: {str(e)}")
+                return None
+            entry.load_seconds = time.perf_counter() - start
+
+            if warmup:
+                self._warm(entry, model)
+
+            rss_after = current_rss_bytes()
+            if rss_before is not None and rss_after is not None:
+                entry.rss_delta_bytes = rss_after - rss_before
+
+            entry.model = model
+            entry.last_used = time.monotonic()
+            entry.load_count += 1
+            print(f"Loaded {name} in {entry.load_seconds:.2f}s")
+            return model
+
+    def _warm(self, entry, model):
+        if entry.warmup is None:
+            return
+        try:
+            entry.warmup_seconds = entry.warmup(model)
+        except Exception as e:
+            print(f"Warm-up failed for {entry.name}: {str(e)}")
+            entry.error = f"Warm-up failed: {str(e)}"
+
+    def warm(self, name):
+        """Run the warm-up of an already loaded model again (e.g. in a forked worker)"""
+        entry = self._entries[name]
+        model = entry.model
+        if model is not None:
+            self._warm(entry, model)
+
+    def preload(self, before_warmup=None):
+        """
+        Load the eager fork-safe models before the server forks its workers
+
+        Args:
+            before_warmup: Optional callable run between loading and warming up,
+                e.g. to pin runtimes to one thread so no pool exists at fork time
+
+        Returns:
+            Names of the preloaded models
+        """
+        names = [name for name in self.names(mode='eager') if self._entries[name].fork_safe]
+        for name in names:
+            self.load(name, warmup=False)
+
+        if before_warmup is not None:
+            before_warmup()
+        for name in names:
+            entry = self._entries[name]
+            self.warm(name)
+            entry.preloaded = entry.model is not None
+
+        return [name for name in names if self._entries[name].preloaded]
+
+    def preloaded(self):
+        """Names of models inherited from the pre-fork master"""
+        return [name for name, entry in self._entries.items() if entry.preloaded and entry.model is not None]
+
+    def unload(self, name):
+        """Release a model; in-flight requests keep their own reference"""
+        entry = self._entries[name]
+
+        with entry.lock:
+            model = entry.model
+            if model is None:
+                return
+            entry.model = None
+            entry.preloaded = False
+
+        close = getattr(model, 'close', None)
+        if close is not None:
+            close()
+        del model
+        gc.collect()
+        print(f"Unloaded idle model {name}")
+
+    def load_eager(self):
+        """Load every eager model; returns once all have been attempted"""
+        for name in self.names(mode='eager'):
+            self.load(name)
+
+    def is_ready(self):
+        """True once every eager model has finished loading (or failed)"""
+        return all(
+            entry.model is not None or entry.error is not None
+            for entry in self._entries.values()
+            if entry.mode == 'eager'
+        )
+
+    def start_reaper(self, interval=30):
+        """Start the background thread that unloads idle models"""
+        if self._reaper is not None:
+            return
+
+        def reap():
+            while True:
+                time.sleep(interval)
+                self.unload_idle()
+
+        self._reaper = threading.Thread(target=reap, name='model-reaper', daemon=True)
+        self._reaper.start()
+
+    def unload_idle(self):
+        """Unload models whose idle time exceeds their TTL"""
+        now = time.monotonic()
+        for name, entry in self._entries.items():
+            if entry.model is None or not entry.idle_ttl or entry.last_used is None:
+                continue
+            if now - entry.last_used > entry.idle_ttl:
+                self.unload(name)
+
+    def status(self):
+        """Per-model load state and memory usage for health reporting"""
+        now = time.monotonic()
+        report = {}
+
+        for name, entry in self._entries.items():
+            model = entry.model
+            memory_bytes = None
+            if model is not None and hasattr(model, 'memory_bytes'):
+                try:
+                    memory_bytes = model.memory_bytes()
+                except Exception:
+                    memory_bytes = None
+
+            report[name] = {
+                'loaded': model is not None,
+                'mode': entry.mode,
+                'preloaded': entry.preloaded,
+                'idle_ttl': entry.idle_ttl,
+                'idle_seconds': round(now - entry.last_used, 1) if entry.last_used else None,
+                'load_count': entry.load_count,
+                'load_seconds': round(entry.load_seconds, 3) if entry.load_seconds else None,
+                'warmup_seconds': round(entry.warmup_seconds, 3) if entry.warmup_seconds else None,
+                'weights_mb': round(memory_bytes / 2**20, 1) if memory_bytes is not None else None,
+                'rss_delta_mb': round(entry.rss_delta_bytes / 2**20, 1) if entry.rss_delta_bytes is not None else None,
+                'error': entry.error
+            }
+
+        return report
+
+    def process_rss_mb(self):
+        rss = current_rss_bytes()
+        return round(rss / 2**20, 1) if rss is not None else None
@@ -10,19 +10,124 @@ import numpy as np
 import cv2
 from PIL import Image
 import os
+import time
+import hashlib
+from inference.compiled_model import CompiledModel
+from inference.tflite_model import TFLiteModel
+from inference.image_io import DecodedImage
+from inference.cache import LRUCache, file_version
+
+def head_weights_path(tflite_path):
+    """Comparison head weights written next to a quantized feature extractor"""
+    return os.path.splitext(tflite_path)[0] + '_head.weights.h5'
 
 class SiameseNetwork:
     """
     Siamese Network for comparing before and after waste cleanup images
+    
+    Inference runs in two stages: the feature extractor embeds each image and
+    the comparison head scores a pair of embeddings. Embeddings are cached by
+    image content hash, so re-verifying against the same before-image only
+    runs the backbone on the new after-image.
     """
     
-    def __init__(self, model_path='pretrained/siamese_network.h5', input_shape=(224, 224, 3)):
+    def __init__(self, model_path='pretrained/siamese_network.h5', input_shape=(224, 224, 3), compiled=True,
+                 embedding_cache_size=1024, embedding_cache_dir=None, backend='keras',
+                 tflite_path='pretrained/siamese_feature_extractor_int8.tflite', num_threads=None):
         self.model_path = model_path
         self.input_shape = input_shape
         self.model = None
         self.feature_extractor = None
+        self.comparison_head = None
+        self.model_version = None
+        self.extract_fn = None
+        self.compare_fn = None
+        self.backend = backend
+        
+        if backend == 'tflite' and os.path.exists(tflite_path):
+            self._load_tflite(tflite_path, num_threads)
+        else:
+            if backend == 'tflite':
+                print(f"TFLite model not found at {tflite_path} - falling back to Keras")
+                self.backend = 'keras'
+            self.load_model()
+            self._split_model()
+            self.embedding_dim = self.feature_extractor.output_shape[-1]
+        
+        # Embeddings of an untrained model are random per build, never persist them
+        if self.model_version is None:
+            embedding_cache_dir = None
+        self.embedding_cache = LRUCache(
+            max_entries=embedding_cache_size,
+            persist_dir=embedding_cache_dir
+        )
         
-        self.load_model()
+        # Traced inference functions, bypassing model.predict overhead
+        if compiled:
+            if self.extract_fn is None:
+                self.extract_fn = CompiledModel(self.feature_extractor, [self.input_shape])
+            self.compare_fn = CompiledModel(self.comparison_head, [(self.embedding_dim,), (self.embedding_dim,)])
+    
+    def _load_tflite(self, tflite_path, num_threads):
+        """
+        Quantized feature extractor plus the small Keras comparison head
+        
+        The full Keras model (and MobileNetV2) is only loaded for artifacts
+        exported without head weights, to take the head from it.
+        """
+        self.extract_fn = TFLiteModel(tflite_path, num_threads=num_threads)
+        self.embedding_dim = int(self.extract_fn.output_details[0]['shape'][-1])
+        
+        head_path = head_weights_path(tflite_path)
+        if os.path.exists(head_path):
+            self.comparison_head = self.build_comparison_head(self.embedding_dim)
+            self.comparison_head.load_weights(head_path)
+        elif os.path.exists(self.model_path):
+            print(f"No head weights at {head_path} - taking the head from {self.model_path} "
+                  f"(re-run export_quantized.py to skip this)")
+            self.load_model()
+            self._split_model()
+            self.model = None
+            self.feature_extractor = None
+        else:
+            print(f"No head weights at {head_path} - using an untrained comparison head")
+            self.comparison_head = self.build_comparison_head(self.embedding_dim)
+        
+        self.model_version = self._file_version(tflite_path)
+        print(f"Quantized Siamese feature extractor loaded from {tflite_path}")
+    
+    def warmup(self):
+        """
+        Run a synthetic before/after pair through both inference stages
+        
+        Returns:
+            Elapsed warm-up time in seconds
+        """
+        start = time.perf_counter()
+        
+        img_batch = np.zeros((1,) + tuple(self.input_shape), dtype=np.float32)
+        embeddings = np.zeros((1, self.embedding_dim), dtype=np.float32)
+        
+        # Bypass the embedding cache so warm-up inputs are never stored
+        if self.extract_fn is not None:
+            self.extract_fn(img_batch)
+        else:
+            self.feature_extractor.predict(img_batch, verbose=0)
+        
+        if self.compare_fn is not None:
+            self.compare_fn(embeddings, embeddings)
+        else:
+            self.comparison_head.predict([embeddings, embeddings], verbose=0)
+        
+        return time.perf_counter() - start
+    
+    def memory_bytes(self):
+        """Bytes held by the model weights and cached embeddings"""
+        if self.backend == 'tflite':
+            weights = self.extract_fn.memory_bytes() + sum(w.nbytes for w in self.comparison_head.get_weights())
+        else:
+            weights = sum(w.nbytes for w in self.model.get_weights())
+        return int(weights + len(self.embedding_cache) * self.embedding_dim * 4)
     
     def build_base_network(self):
         """Build the base feature extraction network"""
@@ -44,23 +149,15 @@ class SiameseNetwork:
         
         return Model(inputs, x, name='feature_extractor')
     
-    def build_siamese_model(self):
-        """Build the Siamese network"""
-        # Create base network
-        base_network = self.build_base_network()
-        
-        # Define inputs for two images
-        input_before = keras.Input(shape=self.input_shape, name='before_image')
-        input_after = keras.Input(shape=self.input_shape, name='after_image')
-        
-        # Extract features from both images
-        features_before = base_network(input_before)
-        features_after = base_network(input_after)
+    def build_comparison_head(self, embedding_dim):
+        """Build the head that scores a pair of embeddings"""
+        embedding_before = keras.Input(shape=(embedding_dim,), name='before_embedding')
+        embedding_after = keras.Input(shape=(embedding_dim,), name='after_embedding')
         
         # Calculate L1 distance
         distance = layers.Lambda(
             lambda tensors: tf.abs(tensors[0] - tensors[1])
-        )([features_before, features_after])
+        )([embedding_before, embedding_after])
         
         # Classification layers
         x = layers.Dense(64, activation='relu')(distance)
@@ -70,6 +167,24 @@ class SiameseNetwork:
         # Output: similarity score (0 = different/cleaned, 1 = same/not cleaned)
         output = layers.Dense(1, activation='sigmoid', name='similarity')(x)
         
+        return Model([embedding_before, embedding_after], output, name='comparison_head')
+    
+    def build_siamese_model(self):
+        """Build the Siamese network"""
+        # Create base network and comparison head
+        base_network = self.build_base_network()
+        comparison_head = self.build_comparison_head(base_network.output_shape[-1])
+        
+        # Define inputs for two images
+        input_before = keras.Input(shape=self.input_shape, name='before_image')
+        input_after = keras.Input(shape=self.input_shape, name='after_image')
+        
+        # Extract features from both images
+        features_before = base_network(input_before)
+        features_after = base_network(input_after)
+        
+        output = comparison_head([features_before, features_after])
+        
         model = Model(inputs=[input_before, input_after], outputs=output)
         
         return model, base_network
@@ -79,6 +194,7 @@ class SiameseNetwork:
         try:
             if os.path.exists(self.model_path):
                 self.model = keras.models.load_model(self.model_path)
+                self.model_version = self._file_version(self.model_path)
                 print(f"Siamese model loaded from {self.model_path}")
             else:
                 print("Building new Siamese model...")
@@ -89,8 +205,37 @@ class SiameseNetwork:
             print(f"Error loading model: {str(e)}")
             print("Building new model...")
             self.model, self.feature_extractor = self.build_siamese_model()
+            self.model_version = None
             self.compile_model()
     
+    def _split_model(self):
+        """Expose the feature extractor and comparison head as separate models"""
+        self.feature_extractor = self.model.get_layer('feature_extractor')
+        
+        try:
+            self.comparison_head = self.model.get_layer('comparison_head')
+        except ValueError:
+            # Models saved before the split apply the head layers inline
+            self.comparison_head = self._head_from_layers()
+    
+    def _head_from_layers(self):
+        """Rebuild the comparison head from the layers following the feature extractor"""
+        embedding_dim = self.feature_extractor.output_shape[-1]
+        embedding_before = keras.Input(shape=(embedding_dim,), name='before_embedding')
+        embedding_after = keras.Input(shape=(embedding_dim,), name='after_embedding')
+        
+        x = [embedding_before, embedding_after]
+        for layer in self.model.layers:
+            if isinstance(layer, layers.InputLayer) or layer is self.feature_extractor:
+                continue
+            x = layer(x)
+        
+        return Model([embedding_before, embedding_after], x, name='comparison_head')
+    
+    def _file_version(self, path):
+        """Identify a weights file by path, size and modification time"""
+        return file_version(path)
+    
     def compile_model(self):
         """Compile the model"""
         self.model.compile(
@@ -101,6 +246,9 @@ class SiameseNetwork:
     
     def preprocess_image(self, image_path_or_array):
         """Preprocess image for the network"""
+        if isinstance(image_path_or_array, DecodedImage):
+            return image_path_or_array.normalized(self.input_shape[:2])
+        
         if isinstance(image_path_or_array, str):
             img = keras.preprocessing.image.load_img(
                 image_path_or_array,
@@ -117,28 +265,72 @@ class SiameseNetwork:
         
         return img_array
     
+    def _content_hash(self, image):
+        """Content hash of a path, array or DecodedImage"""
+        if isinstance(image, DecodedImage):
+            return image.content_hash
+        
+        if isinstance(image, str):
+            digest = hashlib.sha256()
+            with open(image, 'rb') as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                    digest.update(chunk)
+            return digest.hexdigest()
+        
+        return hashlib.sha256(np.ascontiguousarray(image).tobytes()).hexdigest()
+    
+    def get_embedding(self, image):
+        """
+        Feature-extractor embedding of one image, served from cache when possible
+        
+        Args:
+            image: Path, array or DecodedImage
+        
+        Returns:
+            1-D embedding array
+        """
+        key = f"{self.model_version or 'untrained'}:{self._content_hash(image)}"
+        
+        embedding = self.embedding_cache.get(key)
+        if embedding is not None:
+            return embedding
+        
+        img_array = np.expand_dims(self.preprocess_image(image), axis=0)
+        if self.extract_fn is not None:
+            embedding = self.extract_fn(img_array)[0]
+        else:
+            embedding = self.feature_extractor.predict(img_array, verbose=0)[0]
+        
+        self.embedding_cache.set(key, embedding)
+        return embedding
+    
+    def compare_embeddings(self, before_embedding, after_embedding):
+        """Similarity score (0 = different/cleaned, 1 = same) for two embeddings"""
+        before = np.expand_dims(before_embedding, axis=0)
+        after = np.expand_dims(after_embedding, axis=0)
+        
+        if self.compare_fn is not None:
+            return float(self.compare_fn(before, after)[0][0])
+        return float(self.comparison_head.predict([before, after], verbose=0)[0][0])
+    
     def verify_cleanup(self, before_image, after_image):
         """
         Verify if cleanup was done by comparing before and after images
         
         Args:
-            before_image: Path or array of before image
-            after_image: Path or array of after image
-            
+            before_image: Path, array or DecodedImage of before image
+            after_image: Path, array or DecodedImage of after image
+        
         Returns:
             Verification results with score and status
         """
         try:
-            # Preprocess images
-            before = self.preprocess_image(before_image)
-            after = self.preprocess_image(after_image)
-            
-            # Add batch dimension
-            before = np.expand_dims(before, axis=0)
-            after = np.expand_dims(after, axis=0)
+            # Embed both images (the before-image is usually cached)
+            before_embedding = self.get_embedding(before_image)
+            after_embedding = self.get_embedding(after_image)
             
             # Predict similarity (0 = cleaned, 1 = same/not cleaned)
-            similarity_score = self.model.predict([before, after], verbose=0)[0][0]
+            similarity_score = self.compare_embeddings(before_embedding, after_embedding)
             
             # Lower score means more different (cleaned)
             # Higher score means more similar (not cleaned)
@@ -160,7 +352,7 @@ class SiameseNetwork:
                 'status': self._get_status(difference_score),
                 'reward_multiplier': self._get_reward_multiplier(cleanup_quality)
             }
-            
+        
         except Exception as e:
             print(f"Verification error: {str(e)}")
             return self._mock_verification()
@@ -221,7 +413,7 @@ class SiameseNetwork:
             before_image: Path to before image
             after_image: Path to after image
             output_path: Output path for comparison image
-            
+        
         Returns:
             Comparison image array
         """
@@ -0,0 +1,176 @@
+"""
+Perceptual-hash index for near-duplicate image lookup
+64-bit DCT hashes compared by Hamming distance, vectorized over the whole index
+"""
+
+import numpy as np
+import cv2
+from PIL import Image
+import threading
+import pickle
+import time
+import os
+
+# Set bits per byte value, for vectorized popcount
+_POPCOUNT = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+HASH_BITS = 64
+
+def perceptual_hash(image):
+    """
+    64-bit DCT perceptual hash (pHash) of an image
+
+    Robust to re-encoding, resizing and small colour or exposure changes.
+
+    Args:
+        image: DecodedImage
+
+    Returns:
+        int hash
+    """
+    gray = image.image.convert('L').resize((32, 32), Image.LANCZOS)
+    dct = cv2.dct(np.asarray(gray, dtype=np.float32))
+
+    # Lowest 8x8 frequencies, thresholded at their median
+    low = dct[:8, :8]
+    bits = (low > np.median(low)).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+class PerceptualHashIndex:
+    """
+    Thread-safe fixed-size index of (id, hash, payload) entries
+
+    When full, the oldest entry is replaced. Adding an existing id updates it.
+    With persist_path set the index is loaded at startup and saved at most
+    every save_interval seconds after a change.
+    """
+
+    def __init__(self, max_entries=10000, persist_path=None, save_interval=30.0):
+        self.max_entries = max(1, int(max_entries))
+        self.persist_path = persist_path
+        self.save_interval = save_interval
+
+        self._hashes = np.zeros(self.max_entries, dtype=np.uint64)
+        self._ids = [None] * self.max_entries
+        self._payloads = [None] * self.max_entries
+        self._slots = {}
+        self._next = 0
+        self._count = 0
+
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._last_save = time.monotonic()
+        self.lookups = 0
+        self.matches = 0
+
+        if self.persist_path:
+            self._load()
+
+    def __len__(self):
+        return self._count
+
+    def add(self, item_id, hash_value, payload=None):
+        """Insert or update an entry"""
+        with self._lock:
+            slot = self._slots.get(item_id)
+            if slot is None:
+                slot = self._next
+                evicted = self._ids[slot]
+                if evicted is not None:
+                    del self._slots[evicted]
+                self._next = (self._next + 1) % self.max_entries
+                self._count = min(self._count + 1, self.max_entries)
+
+            self._hashes[slot] = np.uint64(hash_value)
+            self._ids[slot] = item_id
+            self._payloads[slot] = payload
+            self._slots[item_id] = slot
+            self._dirty = True
+
+        self._maybe_save()
+
+    def query(self, hash_value, max_distance=6, limit=10):
+        """
+        Find entries within a Hamming distance of hash_value
+
+        Args:
+            hash_value: int hash from perceptual_hash
+            max_distance: Max differing bits (out of 64)
+            limit: Max matches returned
+
+        Returns:
+            list of (item_id, distance, payload), closest first
+        """
+        with self._lock:
+            self.lookups += 1
+            if self._count == 0:
+                return []
+
+            xor = self._hashes[:self._count] ^ np.uint64(hash_value)
+            distances = _POPCOUNT[xor.view(np.uint8)].reshape(-1, 8).sum(axis=1)
+
+            candidates = np.flatnonzero(distances <= max_distance)
+            order = candidates[np.argsort(distances[candidates], kind='stable')][:limit]
+            results = [(self._ids[i], int(distances[i]), self._payloads[i]) for i in order]
+
+            if results:
+                self.matches += 1
+            return results
+
+    def stats(self):
+        """Counters for health reporting"""
+        with self._lock:
+            return {
+                'entries': self._count,
+                'max_entries': self.max_entries,
+                'lookups': self.lookups,
+                'lookups_with_match': self.matches
+            }
+
+    def save(self):
+        """Write the index to persist_path atomically"""
+        if not self.persist_path:
+            return
+
+        with self._lock:
+            state = {
+                'hashes': self._hashes[:self._count].copy(),
+                'ids': self._ids[:self._count],
+                'payloads': self._payloads[:self._count],
+                'next': self._next
+            }
+            self._dirty = False
+            self._last_save = time.monotonic()
+
+        try:
+            directory = os.path.dirname(os.path.abspath(self.persist_path))
+            os.makedirs(directory, exist_ok=True)
+            # Write then rename so a crash never leaves a partial index
+            temp_path = f"{self.persist_path}.{os.getpid()}.tmp"
+            with open(temp_path, 'wb') as f:
+                pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_path, self.persist_path)
+        except OSError as e:
+            print(f"Similarity index save error: {str(e)}")
+
+    def _maybe_save(self):
+        if self.persist_path and self._dirty and time.monotonic() - self._last_save >= self.save_interval:
+            self.save()
+
+    def _load(self):
+        try:
+            with open(self.persist_path, 'rb') as f:
+                state = pickle.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, pickle.UnpicklingError, EOFError) as e:
+            print(f"Similarity index load error: {str(e)}")
+            return
+
+        # Keep the newest entries if the index was saved with a larger size
+        count = len(state['ids'])
+        order = list(range(state['next'], count)) + list(range(state['next']))
+        for i in order[-self.max_entries:]:
+            self.add(state['ids'][i], int(state['hashes'][i]), state['payloads'][i])
+        self._dirty = False
+        print(f"Similarity index loaded with {self._count} entries from {self.persist_path}")
@@ -0,0 +1,123 @@
+"""
+TFLite inference runtime
+Serves quantized (INT8 / FP16) models exported by training/export_quantized.py
+"""
+
+import tensorflow as tf
+import numpy as np
+import threading
+import time
+import os
+
+def bucket_sizes(max_batch_size):
+    """Powers of two up to max_batch_size, plus max_batch_size itself"""
+    sizes = {1, max(1, int(max_batch_size))}
+    size = 2
+    while size < max_batch_size:
+        sizes.add(size)
+        size *= 2
+    return tuple(sorted(sizes))
+
+class TFLiteModel:
+    """
+    TFLite interpreter with the same call interface as CompiledModel
+
+    Quantized inputs and outputs are (de)quantized transparently, so callers
+    always pass and receive float32 arrays. One interpreter is allocated per
+    batch size in batch_sizes; a batch is zero-padded to the next size up (or
+    split into chunks of the largest), so tensors are never reallocated while
+    serving. Interpreters are not thread-safe, so calls are serialized.
+    """
+
+    def __init__(self, model_path, num_threads=None, batch_sizes=(1,)):
+        """
+        Args:
+            model_path: .tflite file
+            num_threads: Interpreter threads (None: TFLite default)
+            batch_sizes: Batch sizes to allocate interpreters for
+                (e.g. bucket_sizes(max_batch_size) behind a micro-batcher)
+        """
+        self.model_path = model_path
+        self.num_threads = num_threads
+        self.batch_sizes = tuple(sorted(set(batch_sizes) | {1}))
+
+        interpreter = tf.lite.Interpreter(model_path=model_path, num_threads=num_threads)
+        interpreter.allocate_tensors()
+        self.input_details = interpreter.get_input_details()
+        self.output_details = interpreter.get_output_details()
+        self.input_shapes = [tuple(detail['shape'][1:]) for detail in self.input_details]
+
+        self.interpreters = {1: interpreter}
+        for batch_size in self.batch_sizes[1:]:
+            self.interpreters[batch_size] = self._allocate(batch_size)
+
+        self._lock = threading.Lock()
+
+    def _allocate(self, batch_size):
+        """Interpreter with its inputs resized to batch_size"""
+        interpreter = tf.lite.Interpreter(model_path=self.model_path, num_threads=self.num_threads)
+        for detail, shape in zip(self.input_details, self.input_shapes):
+            interpreter.resize_tensor_input(detail['index'], (batch_size,) + shape)
+        interpreter.allocate_tensors()
+        return interpreter
+
+    def __call__(self, *inputs):
+        """Run inference on batched float inputs and return a float32 array"""
+        total = len(inputs[0])
+        largest = self.batch_sizes[-1]
+        if total > largest:
+            return np.concatenate([
+                self(*(x[start:start + largest] for x in inputs))
+                for start in range(0, total, largest)
+            ])
+
+        batch_size = next(size for size in self.batch_sizes if size >= total)
+        interpreter = self.interpreters[batch_size]
+
+        with self._lock:
+            for detail, x in zip(self.input_details, inputs):
+                x = self._quantize(x, detail)
+                if total < batch_size:
+                    x = np.concatenate([x, np.zeros((batch_size - total,) + x.shape[1:], dtype=x.dtype)])
+                interpreter.set_tensor(detail['index'], x)
+
+            interpreter.invoke()
+
+            output_detail = self.output_details[0]
+            output = interpreter.get_tensor(output_detail['index'])[:total]
+            return self._dequantize(output, output_detail)
+
+    def warmup(self, batch_sizes=(1,)):
+        """
+        Run once per batch size (sizes without their own interpreter are
+        padded or chunked, see __call__)
+
+        Returns:
+            Elapsed warm-up time in seconds
+        """
+        start = time.perf_counter()
+        for batch_size in batch_sizes:
+            inputs = [np.zeros((batch_size,) + shape, dtype=np.float32) for shape in self.input_shapes]
+            self(*inputs)
+        return time.perf_counter() - start
+
+    def memory_bytes(self):
+        """Size of the flatbuffer, which holds the (quantized) weights"""
+        return os.path.getsize(self.model_path)
+
+    def _quantize(self, x, detail):
+        dtype = detail['dtype']
+        if dtype == np.float32:
+            return np.asarray(x, dtype=np.float32)
+
+        scale, zero_point = detail['quantization']
+        info = np.iinfo(dtype)
+        quantized = np.round(np.asarray(x, dtype=np.float32) / scale + zero_point)
+        return np.clip(quantized, info.min, info.max).astype(dtype)
+
+    def _dequantize(self, output, detail):
+        if detail['dtype'] == np.float32:
+            return output
+
+        scale, zero_point = detail['quantization']
+        return (output.astype(np.float32) - zero_point) * scale
@@ -0,0 +1,38 @@
+"""
+Per-process thread limits for the inference runtimes
+Keeps N forked server workers from each starting one compute thread per core
+"""
+
+import os
+import sys
+
+def limit_threads(num_threads):
+    """
+    Cap intra-op threads of torch, TensorFlow and OpenCV in this process
+
+    Only runtimes that are already imported are touched. TensorFlow accepts the
+    limit only before its runtime starts, i.e. before the first model is built.
+
+    Args:
+        num_threads: Intra-op threads per runtime
+    """
+    # Picked up by runtimes imported later (and by subprocesses)
+    os.environ['OMP_NUM_THREADS'] = str(num_threads)
+    os.environ['MKL_NUM_THREADS'] = str(num_threads)
+    os.environ['OPENBLAS_NUM_THREADS'] = str(num_threads)
+
+    if 'torch' in sys.modules:
+        import torch
+        torch.set_num_threads(num_threads)
+
+    if 'tensorflow' in sys.modules:
+        import tensorflow as tf
+        try:
+            tf.config.threading.set_intra_op_parallelism_threads(num_threads)
+            tf.config.threading.set_inter_op_parallelism_threads(1)
+        except RuntimeError as e:
+            print(f"TensorFlow thread limit not applied: {str(e)}")
+
+    if 'cv2' in sys.modules:
+        import cv2
+        cv2.setNumThreads(num_threads)
@@ -0,0 +1,78 @@
+"""
+Tiling helpers for sliced detection on high-resolution photos
+Small litter survives when the detector sees native-resolution tiles instead of
+the whole photo shrunk to its input size
+"""
+
+import numpy as np
+import cv2
+
+def tile_grid(width, height, tile_size=640, overlap=0.2):
+    """
+    Overlapping tiles covering an image; the last row and column are aligned
+    to the image edge so no tile is padded
+
+    Returns:
+        list of (x1, y1, x2, y2) tiles in pixels
+    """
+    stride = max(1, int(tile_size * (1 - overlap)))
+
+    def starts(length):
+        if length <= tile_size:
+            return [0]
+        positions = list(range(0, length - tile_size, stride))
+        positions.append(length - tile_size)
+        return positions
+
+    return [
+        (x, y, min(x + tile_size, width), min(y + tile_size, height))
+        for y in starts(height)
+        for x in starts(width)
+    ]
+
+def textured_tiles(image, tiles, min_std, scale=0.25):
+    """
+    Mask of tiles with visible texture
+
+    Tiles of flat sky, wall or empty ground (grayscale std-dev below min_std)
+    cannot contain litter and are skipped. Measured on a downscaled copy.
+
+    Args:
+        image: HxWx3 uint8 BGR array
+        tiles: list of (x1, y1, x2, y2)
+        min_std: Min grayscale standard deviation (0-255) of a kept tile
+        scale: Downscale factor for the measurement
+
+    Returns:
+        bool array, one entry per tile
+    """
+    if min_std <= 0:
+        return np.ones(len(tiles), dtype=bool)
+
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    small = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+
+    mask = np.zeros(len(tiles), dtype=bool)
+    for i, (x1, y1, x2, y2) in enumerate(tiles):
+        region = small[int(y1 * scale):max(int(y2 * scale), int(y1 * scale) + 1),
+                       int(x1 * scale):max(int(x2 * scale), int(x1 * scale) + 1)]
+        mask[i] = region.std() >= min_std
+    return mask
+
+def shift_boxes(outputs, offsets):
+    """
+    Concatenate per-tile backend outputs in image coordinates
+
+    Args:
+        outputs: list of (xyxy, conf, cls) per tile
+        offsets: list of (x, y) tile origins
+
+    Returns:
+        (xyxy, conf, cls) arrays over all tiles
+    """
+    xyxy = [boxes + np.array([dx, dy, dx, dy], dtype=np.float32) for (boxes, _, _), (dx, dy) in zip(outputs, offsets)]
+    return (
+        np.concatenate(xyxy) if xyxy else np.zeros((0, 4), np.float32),
+        np.concatenate([conf for _, conf, _ in outputs]) if outputs else np.zeros(0, np.float32),
+        np.concatenate([cls for _, _, cls in outputs]) if outputs else np.zeros(0, np.int64)
+    )
@@ -0,0 +1,201 @@
+"""
+Streaming video analysis helpers
+Frames are decoded one at a time, sampled by content change and tracked across
+samples so every physical object is counted once
+"""
+
+import numpy as np
+import cv2
+from inference.detections import Detections
+
+class FrameSampler:
+    """
+    Iterate over the frames of a video worth running detection on
+
+    Only every check_interval-th frame is decoded into pixels; a checked frame
+    is kept when its thumbnail differs from the last kept frame by at least
+    min_change (mean absolute difference, 0-1) or max_gap_seconds have passed.
+    At most one frame is held in memory at a time. Sampling stops after
+    max_frames samples; truncated then tells whether frames were left unread.
+    """
+
+    def __init__(self, video_path, min_change=0.04, max_gap_seconds=2.0, checks_per_second=5,
+                 max_frames=120, max_side=640):
+        self.video_path = video_path
+        self.min_change = min_change
+        self.max_gap_seconds = max_gap_seconds
+        self.checks_per_second = checks_per_second
+        self.max_frames = max_frames
+        self.max_side = max_side
+
+        self.fps = None
+        self.frame_count = None
+        self.frame_size = None
+        self.frames_read = 0
+        self.frames_sampled = 0
+        self.truncated = False
+
+    def __iter__(self):
+        """Yield (frame_index, timestamp_seconds, BGR frame) tuples"""
+        capture = cv2.VideoCapture(self.video_path)
+        if not capture.isOpened():
+            raise ValueError("Could not open video")
+
+        self.fps = capture.get(cv2.CAP_PROP_FPS) or 30.0
+        # Container metadata; 0 or negative when the stream does not record it
+        self.frame_count = max(0, int(capture.get(cv2.CAP_PROP_FRAME_COUNT))) or None
+        check_interval = max(1, int(round(self.fps / self.checks_per_second)))
+        last_thumbnail = None
+        last_time = None
+
+        try:
+            index = -1
+            while self.frames_sampled < self.max_frames:
+                # grab() demuxes and decodes without converting to a BGR array
+                if not capture.grab():
+                    break
+                index += 1
+                self.frames_read += 1
+                if index % check_interval:
+                    continue
+
+                ok, frame = capture.retrieve()
+                if not ok:
+                    break
+                timestamp = index / self.fps
+
+                gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+                thumbnail = cv2.resize(gray, (64, 36), interpolation=cv2.INTER_AREA).astype(np.float32)
+
+                if last_thumbnail is not None and timestamp - last_time < self.max_gap_seconds:
+                    change = np.abs(thumbnail - last_thumbnail).mean() / 255.0
+                    if change < self.min_change:
+                        continue
+
+                last_thumbnail = thumbnail
+                last_time = timestamp
+                self.frames_sampled += 1
+                yield index, timestamp, self._downscale(frame)
+
+            # Stopped by max_frames rather than the end of the clip
+            self.truncated = self.frames_sampled >= self.max_frames and capture.grab()
+        finally:
+            capture.release()
+
+    @property
+    def duration_seconds(self):
+        """Length of the whole clip, including any part left unread after truncation"""
+        if not self.fps:
+            return None
+        return max(self.frame_count or 0, self.frames_read) / self.fps
+
+    @property
+    def scale(self):
+        """(x, y) factors mapping sampled-frame pixels back to the original frame size"""
+        if self.frame_size is None or not self.max_side or max(self.frame_size) <= self.max_side:
+            return (1.0, 1.0)
+        width, height = self.frame_size
+        factor = self.max_side / max(width, height)
+        return (width / int(width * factor), height / int(height * factor))
+
+    def _downscale(self, frame):
+        height, width = frame.shape[:2]
+        self.frame_size = (width, height)
+        if not self.max_side or max(height, width) <= self.max_side:
+            return frame
+        scale = self.max_side / max(height, width)
+        return cv2.resize(frame, (int(width * scale), int(height * scale)), interpolation=cv2.INTER_AREA)
+
+class ObjectTracker:
+    """
+    Greedy IoU tracking of detections across sampled frames
+
+    A detection continues the best-overlapping track of the same class seen in
+    the last max_age_seconds, otherwise it starts a new track. Each track is
+    one physical object; it keeps its highest-confidence box.
+    """
+
+    def __init__(self, iou_threshold=0.3, max_age_seconds=3.0):
+        self.iou_threshold = iou_threshold
+        self.max_age_seconds = max_age_seconds
+
+        self.boxes = np.zeros((0, 4), dtype=np.float32)
+        self.best_boxes = np.zeros((0, 4), dtype=np.float32)
+        self.conf = np.zeros(0, dtype=np.float32)
+        self.cls = np.zeros(0, dtype=np.int64)
+        self.first_seen = np.zeros(0, dtype=np.float64)
+        self.last_seen = np.zeros(0, dtype=np.float64)
+        self.hits = np.zeros(0, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.cls)
+
+    def update(self, detections, timestamp):
+        """Assign the Detections of one frame to tracks"""
+        matched = np.zeros(len(self), dtype=bool)
+        new_tracks = []
+
+        for i in np.argsort(-detections.conf):
+            box, conf, cls = detections.xyxy[i], detections.conf[i], detections.cls[i]
+
+            candidates = (
+                (self.cls == cls)
+                & ~matched
+                & (timestamp - self.last_seen <= self.max_age_seconds)
+            )
+            best = None
+            if candidates.any():
+                ious = _box_iou(box, self.boxes)
+                ious[~candidates] = 0.0
+                if ious.max() >= self.iou_threshold:
+                    best = int(ious.argmax())
+
+            if best is None:
+                new_tracks.append((box, conf, cls))
+                continue
+
+            matched[best] = True
+            self.boxes[best] = box
+            self.last_seen[best] = timestamp
+            self.hits[best] += 1
+            if conf > self.conf[best]:
+                self.conf[best] = conf
+                self.best_boxes[best] = box
+
+        if new_tracks:
+            boxes = np.array([box for box, _, _ in new_tracks], dtype=np.float32)
+            self.boxes = np.concatenate([self.boxes, boxes])
+            self.best_boxes = np.concatenate([self.best_boxes, boxes])
+            self.conf = np.concatenate([self.conf, np.array([conf for _, conf, _ in new_tracks], dtype=np.float32)])
+            self.cls = np.concatenate([self.cls, np.array([cls for _, _, cls in new_tracks], dtype=np.int64)])
+            self.first_seen = np.concatenate([self.first_seen, np.full(len(new_tracks), timestamp)])
+            self.last_seen = np.concatenate([self.last_seen, np.full(len(new_tracks), timestamp)])
+            self.hits = np.concatenate([self.hits, np.ones(len(new_tracks), dtype=np.int64)])
+
+    def objects(self, class_names, min_hits=1):
+        """
+        Unique objects as Detections (best box per track) plus per-track timing
+
+        Args:
+            class_names: dict of class id -> name
+            min_hits: Drop tracks seen in fewer sampled frames (flicker)
+
+        Returns:
+            (Detections, list of dicts with first_seen, last_seen and frames)
+        """
+        keep = self.hits >= min_hits
+        detections = Detections(self.best_boxes[keep], self.conf[keep], self.cls[keep], class_names)
+        timing = [
+            {'first_seen': round(float(first), 2), 'last_seen': round(float(last), 2), 'frames': int(hits)}
+            for first, last, hits in zip(self.first_seen[keep], self.last_seen[keep], self.hits[keep])
+        ]
+        return detections, timing
+
+def _box_iou(box, boxes):
+    """IoU of one xyxy box against an (N, 4) array"""
+    inter_w = np.maximum(0, np.minimum(box[2], boxes[:, 2]) - np.maximum(box[0], boxes[:, 0]))
+    inter_h = np.maximum(0, np.minimum(box[3], boxes[:, 3]) - np.maximum(box[1], boxes[:, 1]))
+    inter = inter_w * inter_h
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    box_area = (box[2] - box[0]) * (box[3] - box[1])
+    return inter / np.maximum(box_area + areas - inter, 1e-9)
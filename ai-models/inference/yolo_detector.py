@@ -3,21 +3,41 @@ YOLOv8 Waste Detection Model
 Detects waste objects and classifies waste type and severity
 """
 
-from ultralytics import YOLO
 import cv2
 import numpy as np
 from PIL import Image
 import os
+import time
+from inference.image_io import DecodedImage
+from inference.detections import Detections
+from inference.detector_backends import UltralyticsBackend, OnnxRuntimeBackend, export_onnx, nms
+from inference.tiling import tile_grid, textured_tiles, shift_boxes
+from inference.cache import file_version
 
 class YOLOv8WasteDetector:
     """
     YOLOv8 model for waste detection, type classification, and severity analysis
     """
     
-    def __init__(self, model_path='pretrained/yolov8_waste.pt'):
+    def __init__(self, model_path='pretrained/yolov8_waste.pt', backend='ultralytics',
+                 onnx_path='pretrained/yolov8_waste.onnx', num_threads=None,
+                 tile_size=None, tile_overlap=0.2, tile_min_std=6.0, tile_merge_threshold=0.6,
+                 tile_batch_size=16):
         self.model_path = model_path
+        self.onnx_path = onnx_path
+        self.backend = backend
+        self.num_threads = num_threads
         self.model = None
         
+        # Sliced inference for photos larger than twice the tile size (None = off)
+        self.tile_size = tile_size
+        self.tile_overlap = tile_overlap
+        self.tile_min_std = tile_min_std
+        self.tile_merge_threshold = tile_merge_threshold
+        self.tile_batch_size = tile_batch_size
+        # Identifies the loaded weights in result cache keys; None for mock detections
+        self.model_version = None
+        
         # Waste categories
         self.waste_types = {
             0: 'plastic',
@@ -42,67 +62,208 @@ class YOLOv8WasteDetector:
         self.load_model()
     
     def load_model(self):
-        """Load YOLOv8 model"""
+        """Load YOLOv8 model through the configured backend"""
+        # Use pretrained YOLO model and fine-tune later
+        weights = self.model_path if os.path.exists(self.model_path) else 'yolov8n.pt'  # Nano model
+        
         try:
-            if os.path.exists(self.model_path):
-                self.model = YOLO(self.model_path)
-                print(f"YOLOv8 model loaded from {self.model_path}")
+            if self.backend == 'onnx':
+                if not os.path.exists(self.onnx_path):
+                    print(f"ONNX model not found at {self.onnx_path} - exporting from {weights}")
+                    self.onnx_path = export_onnx(weights)
+                self.model = OnnxRuntimeBackend(self.onnx_path, num_threads=self.num_threads)
+                self.model_version = file_version(self.onnx_path)
+                print(f"YOLOv8 ONNX model loaded from {self.onnx_path}")
             else:
-                # Use pretrained YOLO model and fine-tune later
-                self.model = YOLO('yolov8n.pt')  # Nano model
-                print("Using pretrained YOLOv8n - Fine-tune with waste dataset")
+                self.model = UltralyticsBackend(weights, num_threads=self.num_threads)
+                if os.path.exists(weights):
+                    self.model_version = file_version(weights)
+                if weights == self.model_path:
+                    print(f"YOLOv8 model loaded from {self.model_path}")
+                else:
+                    print("Using pretrained YOLOv8n - Fine-tune with waste dataset")
         except Exception as e:
             print(f"Error loading YOLO model: {str(e)}")
             self.model = None
+            self.model_version = None
+    
+    def warmup(self, image_sizes=((480, 640), (1080, 1920)), batch_size=1):
+        """
+        Run synthetic images through the model to trigger fusing and autotuning
+        
+        Args:
+            image_sizes: (height, width) shapes of typical uploads
+            batch_size: Also warm a batch of this size when greater than 1
+            
+        Returns:
+            Elapsed warm-up time in seconds
+        """
+        start = time.perf_counter()
+        
+        if self.model is None:
+            return 0.0
+        
+        for height, width in image_sizes:
+            image = np.zeros((height, width, 3), dtype=np.uint8)
+            self.model.predict([image])
+            if batch_size > 1:
+                self.model.predict([image] * batch_size)
+        
+        return time.perf_counter() - start
+    
+    def memory_bytes(self):
+        """Bytes held by the model weights"""
+        if self.model is None:
+            return 0
+        return self.model.memory_bytes()
     
     def detect(self, image_path, conf_threshold=0.25):
         """
         Detect waste objects in image
         
         Args:
-            image_path: Path to image file
+            image_path: Path to image file or a DecodedImage
             conf_threshold: Confidence threshold for detections
             
         Returns:
-            Detection results with bounding boxes, classes, and confidences
+            Detections with bounding boxes, classes, and confidences
+            (call to_list() for the JSON response format)
         """
         if self.model is None:
             return self._mock_detection()
         
+        if self._should_tile(image_path):
+            return self.detect_tiled(image_path, conf_threshold)
+        
         try:
-            # Run inference
-            results = self.model(image_path, conf=conf_threshold)
+            # Already decoded images are passed as BGR arrays, no disk round trip
+            source = image_path
+            if isinstance(image_path, DecodedImage):
+                source = image_path.bgr_array()
             
-            detections = []
-            for result in results:
-                boxes = result.boxes
-                for box in boxes:
-                    detection = {
-                        'bbox': box.xyxy[0].tolist(),  # [x1, y1, x2, y2]
-                        'confidence': float(box.conf[0]),
-                        'class_id': int(box.cls[0]),
-                        'class_name': self.waste_types.get(int(box.cls[0]), 'unknown')
-                    }
-                    detections.append(detection)
+            # Run inference
+            xyxy, conf, cls = self.model.predict([source], conf_threshold)[0]
             
-            return detections
+            return self._to_original(Detections(xyxy, conf, cls, self.waste_types), image_path)
             
         except Exception as e:
             print(f"Detection error: {str(e)}")
             return self._mock_detection()
     
+    def detect_batch(self, images, conf_threshold=0.25):
+        """
+        Detect waste objects in several images with one batched forward pass
+        
+        Args:
+            images: list of DecodedImage objects or image paths
+            conf_threshold: Confidence threshold for detections
+            
+        Returns:
+            list of Detections, in input order
+        """
+        if not images:
+            return []
+        
+        if self.model is None:
+            return [self._mock_detection() for _ in images]
+        
+        # High-resolution photos are already a batch of tiles each
+        tiled = [self._should_tile(image) for image in images]
+        if any(tiled):
+            results = [self.detect_tiled(image, conf_threshold) if tile else None for image, tile in zip(images, tiled)]
+            rest = self.detect_batch([image for image, tile in zip(images, tiled) if not tile], conf_threshold)
+            rest = iter(rest)
+            return [result if result is not None else next(rest) for result in results]
+        
+        try:
+            sources = [
+                image.bgr_array() if isinstance(image, DecodedImage) else image
+                for image in images
+            ]
+            
+            # A list source is run by the backend as one batch
+            outputs = self.model.predict(sources, conf_threshold)
+            
+            return [
+                self._to_original(Detections(xyxy, conf, cls, self.waste_types), image)
+                for (xyxy, conf, cls), image in zip(outputs, images)
+            ]
+            
+        except Exception as e:
+            print(f"Batch detection error: {str(e)}")
+            return [self._mock_detection() for _ in images]
+    
+    def _to_original(self, detections, image):
+        """Map boxes of a reduced-size decode back to original image pixels"""
+        if isinstance(image, DecodedImage) and image.scale != (1.0, 1.0):
+            return detections.scaled(image.scale)
+        return detections
+    
+    def _should_tile(self, image):
+        if not self.tile_size or not isinstance(image, DecodedImage):
+            return False
+        return max(image.width, image.height) >= 2 * self.tile_size
+    
+    def detect_tiled(self, image, conf_threshold=0.25):
+        """
+        Sliced detection for high-resolution photos
+        
+        The downscaled full image and every textured, overlapping tile at native
+        resolution run as batches; tile boxes are shifted back to image
+        coordinates and merged across tiles with class-aware NMS on
+        intersection-over-smaller, which also drops fragments cut by tile edges.
+        
+        Args:
+            image: DecodedImage or image path
+            conf_threshold: Confidence threshold for detections
+            
+        Returns:
+            Detections in image pixels
+        """
+        if self.model is None:
+            return self._mock_detection()
+        
+        if not isinstance(image, DecodedImage):
+            image = DecodedImage.from_path(image)
+        
+        try:
+            bgr = image.bgr_array()
+            tile_size = self.tile_size or 640
+            tiles = tile_grid(image.width, image.height, tile_size, self.tile_overlap)
+            tiles = [tile for tile, keep in zip(tiles, textured_tiles(bgr, tiles, self.tile_min_std)) if keep]
+            
+            # The full-image pass keeps objects larger than a tile
+            sources = [bgr] + [np.ascontiguousarray(bgr[y1:y2, x1:x2]) for x1, y1, x2, y2 in tiles]
+            offsets = [(0, 0)] + [(x1, y1) for x1, y1, _, _ in tiles]
+            
+            outputs = []
+            for start in range(0, len(sources), self.tile_batch_size):
+                outputs.extend(self.model.predict(sources[start:start + self.tile_batch_size], conf_threshold))
+            
+            xyxy, conf, cls = shift_boxes(outputs, offsets)
+            keep = nms(xyxy, conf, cls, self.tile_merge_threshold, metric='ios')
+            
+            return self._to_original(Detections(xyxy[keep], conf[keep], cls[keep], self.waste_types), image)
+            
+        except Exception as e:
+            print(f"Tiled detection error: {str(e)}")
+            return self._mock_detection()
+    
     def analyze_severity(self, detections, image_area=None):
         """
         Analyze waste severity based on detections
         
         Args:
-            detections: List of detected objects
+            detections: Detections or list of detected objects
             image_area: Total image area (optional)
             
         Returns:
             Severity analysis with level, score, and details
         """
-        if not detections:
+        if not isinstance(detections, Detections):
+            detections = Detections.from_list(detections, self.waste_types)
+        
+        if len(detections) == 0:
             return {
                 'level': 'none',
                 'score': 0,
@@ -111,18 +272,9 @@ class YOLOv8WasteDetector:
                 'dominant_type': None
             }
         
-        # Count waste by type
-        waste_counts = {}
-        total_area = 0
-        
-        for det in detections:
-            waste_type = det['class_name']
-            waste_counts[waste_type] = waste_counts.get(waste_type, 0) + 1
-            
-            # Calculate detected object area
-            bbox = det['bbox']
-            area = (bbox[2] - bbox[0]) * (bbox[3] - bbox[1])
-            total_area += area
+        # Count waste by type and sum detected object areas
+        waste_counts = detections.counts()
+        total_area = float(detections.areas().sum())
         
         # Determine dominant waste type
         dominant_type = max(waste_counts.items(), key=lambda x: x[1])[0]
@@ -214,20 +366,13 @@ class YOLOv8WasteDetector:
     
     def _mock_detection(self):
         """Mock detections for testing"""
-        return [
-            {
-                'bbox': [100, 100, 300, 300],
-                'confidence': 0.85,
-                'class_id': 0,
-                'class_name': 'plastic'
-            },
-            {
-                'bbox': [350, 150, 500, 400],
-                'confidence': 0.72,
-                'class_id': 1,
-                'class_name': 'organic'
-            }
-        ]
+        return Detections(
+            [[100, 100, 300, 300], [350, 150, 500, 400]],
+            [0.85, 0.72],
+            [0, 1],
+            self.waste_types,
+            mock=True
+        )
     
     def visualize_detections(self, image_path, detections, output_path=None):
         """
@@ -243,6 +388,9 @@ class YOLOv8WasteDetector:
         """
         image = cv2.imread(image_path)
         
+        if isinstance(detections, Detections):
+            detections = detections.to_list()
+        
         for det in detections:
             bbox = det['bbox']
             class_name = det['class_name']
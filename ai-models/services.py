@@ -0,0 +1,617 @@
+"""
+Model setup and request handling shared by the Flask (app.py) and ASGI (asgi_app.py) servers
+Handlers take decoded images and return JSON-ready dicts; HTTP parsing stays in the servers
+"""
+
+import os
+from inference.predictor import WasteClassifier
+from inference.yolo_detector import YOLOv8WasteDetector
+from inference.siamese_network import SiameseNetwork
+from inference.image_io import DecodedImage, UploadLimitExceeded, list_archive_images
+from inference.registry import ModelRegistry
+from inference.cache import LRUCache
+from inference.video import FrameSampler, ObjectTracker
+from inference.similarity_index import PerceptualHashIndex, perceptual_hash, HASH_BITS
+from inference.threads import limit_threads
+import logging
+import threading
+import tempfile
+import shutil
+
+logger = logging.getLogger(__name__)
+
+# Images per forward pass for the batch endpoints
+BATCH_INFERENCE_SIZE = int(os.environ.get('BATCH_INFERENCE_SIZE', 16))
+
+# Per-request limits of the batch endpoints (uploaded files plus archive images);
+# MAX_UPLOAD_MB only bounds the compressed request body
+BATCH_MAX_IMAGES = int(os.environ.get('BATCH_MAX_IMAGES', 256))
+ARCHIVE_MAX_ENTRIES = int(os.environ.get('ARCHIVE_MAX_ENTRIES', 1024))
+ARCHIVE_MAX_IMAGE_BYTES = int(float(os.environ.get('ARCHIVE_MAX_IMAGE_MB', 32)) * 1024 * 1024)
+ARCHIVE_MAX_TOTAL_BYTES = int(float(os.environ.get('ARCHIVE_MAX_TOTAL_MB', 256)) * 1024 * 1024)
+
+# Concurrent classify requests share one forward pass (set CLASSIFIER_MAX_BATCH=1 to disable)
+CLASSIFIER_MAX_BATCH = int(os.environ.get('CLASSIFIER_MAX_BATCH', 8))
+
+def _parse_model_settings(env_name):
+    """Parse 'name=value,name=value' model settings from the environment"""
+    settings = {}
+    for pair in os.environ.get(env_name, '').split(','):
+        if '=' in pair:
+            name, value = pair.split('=', 1)
+            settings[name.strip()] = value.strip()
+    return settings
+
+# Per-model load mode (eager / lazy / disabled) and idle unload TTL in seconds
+MODEL_LOAD_MODES = _parse_model_settings('MODEL_LOAD_MODES')
+MODEL_IDLE_TTLS = _parse_model_settings('MODEL_IDLE_TTLS')
+DEFAULT_IDLE_TTL = float(os.environ.get('MODEL_IDLE_TTL', 0)) or None
+WARMUP_ON_STARTUP = os.environ.get('WARMUP_ON_STARTUP', '1') == '1'
+
+# Longest edge uploads are decoded at (JPEG DCT scaling); 0 decodes at full resolution.
+# The detector letterboxes to 640 anyway; tiled detection needs the full resolution.
+DECODE_MAX_SIDE = int(os.environ.get('DECODE_MAX_SIDE', 0 if os.environ.get('YOLO_TILE_SIZE', '0') != '0' else 640))
+
+# Video analysis: max sampled frames per clip and min thumbnail change (0-1) for a new sample
+VIDEO_MAX_FRAMES = int(os.environ.get('VIDEO_MAX_FRAMES', 120))
+VIDEO_MIN_CHANGE = float(os.environ.get('VIDEO_MIN_CHANGE', 0.04))
+
+# Content-addressed cache of per-image model results (RESULT_CACHE_SIZE=0 disables it)
+RESULT_CACHE_SIZE = int(os.environ.get('RESULT_CACHE_SIZE', 2048))
+result_cache = LRUCache(
+    max_entries=RESULT_CACHE_SIZE,
+    ttl_seconds=float(os.environ.get('RESULT_CACHE_TTL', 3600)) or None,
+    persist_dir=os.environ.get('RESULT_CACHE_DIR') or None
+) if RESULT_CACHE_SIZE > 0 else None
+
+DETECTION_CONF_THRESHOLD = 0.25
+
+# Perceptual-hash index of analysed images for near-duplicate lookup (SIMILAR_INDEX_SIZE=0 disables it)
+SIMILAR_INDEX_SIZE = int(os.environ.get('SIMILAR_INDEX_SIZE', 10000))
+similar_index = PerceptualHashIndex(
+    max_entries=SIMILAR_INDEX_SIZE,
+    persist_path=os.environ.get('SIMILAR_INDEX_PATH') or None
+) if SIMILAR_INDEX_SIZE > 0 else None
+SIMILAR_MAX_DISTANCE = int(os.environ.get('SIMILAR_MAX_DISTANCE', 6))
+
+# analyze-full reuses the analysis of a near-duplicate within this many bits (-1 disables)
+ANALYZE_REUSE_DISTANCE = int(os.environ.get('ANALYZE_REUSE_DISTANCE', -1))
+
+# Set by gunicorn.conf.py: load fork-safe models in the master, the rest in each worker
+PRELOAD = os.environ.get('MODEL_PRELOAD') == '1'
+
+# Intra-op threads per runtime in this worker (set by start_worker, None = runtime default)
+WORKER_THREADS = None
+
+def _num_threads(env_name):
+    """Thread count from the environment, else the per-worker limit"""
+    if os.environ.get(env_name):
+        return int(os.environ[env_name])
+    return WORKER_THREADS
+
+class ModelUnavailable(Exception):
+    """Raised when a route's model is disabled or failed to load"""
+
+def _register_model(name, factory, warmup, fork_safe=False):
+    idle_ttl = float(MODEL_IDLE_TTLS[name]) if name in MODEL_IDLE_TTLS else DEFAULT_IDLE_TTL
+    registry.register(
+        name,
+        factory,
+        mode=MODEL_LOAD_MODES.get(name, 'eager'),
+        idle_ttl=idle_ttl or None,
+        warmup=warmup if WARMUP_ON_STARTUP else None,
+        fork_safe=fork_safe
+    )
+
+# Initialize models
+registry = ModelRegistry()
+
+_register_model(
+    'classifier',
+    lambda: WasteClassifier(
+        max_batch_size=CLASSIFIER_MAX_BATCH,
+        max_wait_ms=float(os.environ.get('CLASSIFIER_MAX_WAIT_MS', 5)),
+        backend=os.environ.get('CLASSIFIER_BACKEND', 'keras'),
+        tflite_path=os.environ.get('CLASSIFIER_TFLITE_PATH', 'pretrained/waste_classifier_int8.tflite'),
+        num_threads=_num_threads('TFLITE_NUM_THREADS')
+    ),
+    lambda model: model.warmup(batch_sizes=sorted({1, CLASSIFIER_MAX_BATCH, BATCH_INFERENCE_SIZE}))
+)
+
+# TensorFlow, onnxruntime and TFLite start thread pools while loading, which do not
+# survive fork(); torch weights do, as long as nothing ran multi-threaded before forking
+_register_model(
+    'yolo_detector',
+    lambda: YOLOv8WasteDetector(
+        backend=os.environ.get('YOLO_BACKEND', 'ultralytics'),
+        onnx_path=os.environ.get('YOLO_ONNX_PATH', 'pretrained/yolov8_waste.onnx'),
+        num_threads=_num_threads('YOLO_NUM_THREADS'),
+        tile_size=int(os.environ.get('YOLO_TILE_SIZE', 0)) or None,
+        tile_overlap=float(os.environ.get('YOLO_TILE_OVERLAP', 0.2)),
+        tile_min_std=float(os.environ.get('YOLO_TILE_MIN_STD', 6.0))
+    ),
+    lambda model: model.warmup(batch_size=BATCH_INFERENCE_SIZE),
+    fork_safe=os.environ.get('YOLO_BACKEND', 'ultralytics') == 'ultralytics'
+)
+
+_register_model(
+    'siamese_network',
+    lambda: SiameseNetwork(
+        embedding_cache_size=int(os.environ.get('SIAMESE_EMBEDDING_CACHE_SIZE', 1024)),
+        embedding_cache_dir=os.environ.get('SIAMESE_EMBEDDING_CACHE_DIR') or None,
+        backend=os.environ.get('SIAMESE_BACKEND', 'keras'),
+        tflite_path=os.environ.get('SIAMESE_TFLITE_PATH', 'pretrained/siamese_feature_extractor_int8.tflite'),
+        num_threads=_num_threads('TFLITE_NUM_THREADS')
+    ),
+    lambda model: model.warmup()
+)
+
+def load_models():
+    """Load and warm up eager models; lazy ones load on their first request"""
+    # Models inherited from the master were warmed single-threaded; warm them with this worker's threads
+    for name in registry.preloaded():
+        registry.warm(name)
+
+    registry.load_eager()
+    for name, status in registry.status().items():
+        if status['loaded']:
+            logger.info(f"{name} loaded ({status['mode']})")
+        elif status['error']:
+            logger.error(f"Failed to load {name}: {status['error']}")
+    logger.info("Eager models loaded, service ready")
+
+_started = False
+_preloaded = False
+
+def preload():
+    """
+    Load fork-safe models in the gunicorn master (preload_app) before workers fork
+
+    Runtimes are pinned to one thread while warming up so no thread pool exists
+    at fork time; each worker raises its own limit in start_worker().
+    """
+    names = registry.preload(before_warmup=lambda: limit_threads(1))
+    logger.info(f"Preloaded for copy-on-write sharing: {', '.join(names) or 'none'}")
+
+def start():
+    """Load eager models in the background and start idle unloading (idempotent)"""
+    global _started, _preloaded
+    if _started:
+        return
+
+    if PRELOAD:
+        # Running in the gunicorn master; the background work starts in each worker
+        if not _preloaded:
+            _preloaded = True
+            preload()
+        return
+    _started = True
+
+    threading.Thread(target=load_models, name='model-loader', daemon=True).start()
+
+    if DEFAULT_IDLE_TTL or MODEL_IDLE_TTLS:
+        registry.start_reaper()
+
+def start_worker(num_threads):
+    """
+    Per-worker startup after fork (gunicorn post_fork hook)
+
+    Args:
+        num_threads: Intra-op threads for each runtime in this worker
+    """
+    global WORKER_THREADS, PRELOAD
+    WORKER_THREADS = num_threads
+    limit_threads(num_threads)
+
+    PRELOAD = False
+    start()
+
+def decode_upload(image_file):
+    """Decode an uploaded file from its stream, at reduced size when DECODE_MAX_SIDE is set"""
+    return DecodedImage.from_file(image_file, max_side=DECODE_MAX_SIDE)
+
+def _require(name, message):
+    model = registry.get(name)
+    if model is None:
+        raise ModelUnavailable(message)
+    return model
+
+def readiness():
+    """Readiness payload and status code"""
+    ready = registry.is_ready()
+    status = registry.status()
+    return {
+        'status': 'ready' if ready else 'warming_up',
+        'warmup_seconds': {
+            name: model['warmup_seconds'] for name, model in status.items() if model['warmup_seconds']
+        },
+        'warmup_errors': {
+            name: model['error'] for name, model in status.items() if model['error']
+        }
+    }, 200 if ready else 503
+
+def health():
+    """Health payload"""
+    status = registry.status()
+    return {
+        'status': 'healthy',
+        'models': {name: model['loaded'] for name, model in status.items()},
+        'model_details': status,
+        'result_cache': result_cache.stats() if result_cache is not None else None,
+        'similar_index': similar_index.stats() if similar_index is not None else None,
+        'pid': os.getpid(),
+        'worker_threads': WORKER_THREADS,
+        'process_rss_mb': registry.process_rss_mb()
+    }
+
+def _result_key(kind, model, image, params):
+    """Cache key of one image result; None when the model's results must not be cached"""
+    if result_cache is None or getattr(model, 'model_version', None) is None:
+        return None
+    # The decoded size follows DECODE_MAX_SIDE (and the tiling default), so results
+    # computed at another decode resolution are never served from the disk tier
+    width, height = image.image.size
+    return f"{kind}:{model.model_version}:{params}:{width}x{height}:{image.content_hash}"
+
+def _cached_many(kind, model, images, compute, params=''):
+    """
+    Per-image results through the result cache, computing only the misses
+
+    Args:
+        kind: Result type, part of the key ('classify', 'detect')
+        model: Model instance; its model_version is part of the key
+        images: list of DecodedImage
+        compute: callable taking a list of images and returning one result per image
+        params: string of the inference parameters that change the result
+
+    Returns:
+        list of results, in input order
+    """
+    keys = [_result_key(kind, model, image, params) for image in images]
+    results = [result_cache.get(key) if key is not None else None for key in keys]
+
+    missing = [i for i, result in enumerate(results) if result is None]
+    if missing:
+        computed = compute([images[i] for i in missing])
+        for i, result in zip(missing, computed):
+            results[i] = result
+            # Placeholder results of a missing model are never cached
+            if keys[i] is not None and not getattr(result, 'mock', False):
+                result_cache.set(keys[i], result)
+
+    return results
+
+def _classify(classifier, image):
+    return _cached_many('classify', classifier, [image], lambda images: [classifier.predict(images[0])])[0]
+
+def _detection_params(yolo_detector, conf_threshold):
+    """Detection settings that change the result, for cache keys"""
+    params = f"conf={conf_threshold}"
+    if yolo_detector.tile_size:
+        params += (f":tile={yolo_detector.tile_size}/{yolo_detector.tile_overlap}/{yolo_detector.tile_min_std}"
+                   f"/{yolo_detector.tile_merge_threshold}")
+    return params
+
+def _detect(yolo_detector, image, conf_threshold=DETECTION_CONF_THRESHOLD):
+    return _cached_many(
+        'detect', yolo_detector, [image],
+        lambda images: [yolo_detector.detect(images[0], conf_threshold)],
+        params=_detection_params(yolo_detector, conf_threshold)
+    )[0]
+
+def classify_image(image):
+    """Classify waste in one decoded image"""
+    classifier = _require('classifier', 'Model not loaded')
+
+    # Get prediction (duplicate uploads are answered from the result cache)
+    result = _classify(classifier, image)
+
+    return {
+        'success': True,
+        'predictions': result['predictions'],
+        'top_class': result['top_class'],
+        'confidence': result['confidence']
+    }
+
+def _detection_payload(yolo_detector, detections):
+    return {
+        'detections': detections.to_list(),
+        'count': len(detections),
+        'severity': yolo_detector.analyze_severity(detections)
+    }
+
+def detect_image(image, conf_threshold=DETECTION_CONF_THRESHOLD):
+    """Detect waste objects and analyze severity in one decoded image"""
+    yolo_detector = _require('yolo_detector', 'YOLOv8 model not loaded')
+
+    # Detect waste objects
+    detections = _detect(yolo_detector, image, conf_threshold)
+
+    payload = {'success': True}
+    payload.update(_detection_payload(yolo_detector, detections))
+    return payload
+
+def verify_images(before_image, after_image):
+    """Verify cleanup from decoded before and after images"""
+    siamese_network = _require('siamese_network', 'Siamese Network not loaded')
+
+    # The before-image embedding is cached by content hash
+    verification = siamese_network.verify_cleanup(before_image, after_image)
+
+    return {
+        'success': True,
+        'verification': verification,
+        'message': f"Cleanup {verification['status']} - {verification['cleanup_quality']}% quality"
+    }
+
+def _model_versions(*models):
+    """Versions of the models behind a result; None if any result is a placeholder"""
+    versions = []
+    for model in models:
+        if model is None:
+            versions.append('unavailable')
+        elif getattr(model, 'model_version', None) is None:
+            return None
+        else:
+            versions.append(model.model_version)
+    return tuple(versions)
+
+def analyze_image(image, reuse_distance=None):
+    """
+    Full analysis: classification + detection + severity on one shared decoded image
+
+    Args:
+        image: DecodedImage
+        reuse_distance: Return the stored analysis of a near-duplicate within this
+            many hash bits instead of running the models (default ANALYZE_REUSE_DISTANCE,
+            negative disables)
+    """
+    if reuse_distance is None:
+        reuse_distance = ANALYZE_REUSE_DISTANCE
+
+    results = {}
+    classifier = registry.get('classifier')
+    yolo_detector = registry.get('yolo_detector')
+    versions = _model_versions(classifier, yolo_detector)
+    image_hash = perceptual_hash(image) if similar_index is not None else None
+
+    # Near-duplicate of an image analysed by the same models: skip inference
+    if image_hash is not None and versions is not None and reuse_distance >= 0:
+        for item_id, distance, payload in similar_index.query(image_hash, reuse_distance, limit=5):
+            if payload is not None and payload['versions'] == versions:
+                return {
+                    'success': True,
+                    'analysis': payload['analysis'],
+                    'near_duplicate': {'id': item_id, 'distance': distance}
+                }
+
+    # Classification
+    if classifier is not None:
+        results['classification'] = _classify(classifier, image)
+
+    # Detection and Severity
+    if yolo_detector is not None:
+        results['detection'] = _detection_payload(yolo_detector, _detect(yolo_detector, image))
+
+    if image_hash is not None:
+        payload = {'analysis': results, 'versions': versions} if versions is not None else None
+        similar_index.add(image.content_hash, image_hash, payload)
+
+    return {
+        'success': True,
+        'analysis': results
+    }
+
+def detect_video(video_file, filename=''):
+    """
+    Detect unique waste objects in a video and analyze severity over the whole clip
+
+    The upload is copied to a temporary file in chunks, frames are decoded one
+    at a time and only frames whose content changed are run, in batches; objects
+    are tracked across frames so each is counted once.
+
+    Args:
+        video_file: File-like upload
+        filename: Original filename (its extension helps the demuxer)
+
+    Returns:
+        dict with unique objects, severity and sampling stats
+    """
+    yolo_detector = _require('yolo_detector', 'YOLOv8 model not loaded')
+    tracker = ObjectTracker()
+
+    def run(batch):
+        frames = [frame for _, frame in batch]
+        for (timestamp, _), detections in zip(batch, yolo_detector.detect_batch(frames, DETECTION_CONF_THRESHOLD)):
+            tracker.update(detections, timestamp)
+
+    suffix = os.path.splitext(filename or '')[1] or '.mp4'
+    with tempfile.NamedTemporaryFile(suffix=suffix) as temp:
+        shutil.copyfileobj(getattr(video_file, 'stream', video_file), temp, 1024 * 1024)
+        temp.flush()
+
+        sampler = FrameSampler(
+            temp.name,
+            min_change=VIDEO_MIN_CHANGE,
+            max_frames=VIDEO_MAX_FRAMES,
+            max_side=DECODE_MAX_SIDE or None
+        )
+        batch = []
+        for _, timestamp, frame in sampler:
+            batch.append((timestamp, frame))
+            if len(batch) == BATCH_INFERENCE_SIZE:
+                run(batch)
+                batch = []
+        if batch:
+            run(batch)
+
+    # Objects seen in a single sample only are kept when few frames were sampled
+    min_hits = 2 if sampler.frames_sampled >= 10 else 1
+    detections, timing = tracker.objects(yolo_detector.waste_types, min_hits=min_hits)
+    detections = detections.scaled(sampler.scale)
+
+    objects = detections.to_list()
+    for obj, seen in zip(objects, timing):
+        obj.update(seen)
+
+    return {
+        'success': True,
+        'detections': objects,
+        'count': len(objects),
+        'severity': yolo_detector.analyze_severity(detections),
+        'video': {
+            'fps': round(sampler.fps, 2) if sampler.fps else None,
+            'duration_seconds': round(sampler.duration_seconds, 2) if sampler.fps else None,
+            'analyzed_seconds': round(sampler.frames_read / sampler.fps, 2) if sampler.fps else None,
+            'frames_read': sampler.frames_read,
+            'frames_sampled': sampler.frames_sampled,
+            # VIDEO_MAX_FRAMES was reached before the end of the clip
+            'truncated': bool(sampler.truncated)
+        }
+    }
+
+def parse_similar_options(fields):
+    """
+    Options of a /api/similar request from its form fields
+
+    Raises:
+        ValueError: on a malformed number
+    """
+    options = {}
+    if fields.get('max_distance'):
+        options['max_distance'] = int(fields.get('max_distance'))
+    if fields.get('limit'):
+        options['limit'] = int(fields.get('limit'))
+    if fields.get('id'):
+        options['item_id'] = fields.get('id')
+    return options
+
+def find_similar(image, max_distance=None, limit=10, item_id=None):
+    """
+    Look up near-duplicates of an image in the perceptual-hash index
+
+    Args:
+        image: DecodedImage
+        max_distance: Max differing hash bits (default SIMILAR_MAX_DISTANCE)
+        limit: Max matches returned
+        item_id: Optional id (e.g. a report id) to add the image under after the lookup
+
+    Returns:
+        dict with the image hash and matches, closest first
+    """
+    if similar_index is None:
+        raise ModelUnavailable('Similarity index disabled')
+    if max_distance is None:
+        max_distance = SIMILAR_MAX_DISTANCE
+
+    image_hash = perceptual_hash(image)
+    matches = similar_index.query(image_hash, max_distance, limit)
+    if item_id is not None:
+        similar_index.add(item_id, image_hash)
+
+    return {
+        'success': True,
+        'hash': f"{image_hash:016x}",
+        'matches': [
+            {
+                'id': match_id,
+                'distance': distance,
+                'similarity': round(1 - distance / HASH_BITS, 4),
+                'analysis': payload['analysis'] if payload is not None else None
+            }
+            for match_id, distance, payload in matches
+        ]
+    }
+
+def classify_batch_runner():
+    """Callable classifying a list of decoded images in one forward pass"""
+    classifier = _require('classifier', 'Model not loaded')
+
+    def run_batch(images):
+        return _cached_many('classify', classifier, images, classifier.predict_many)
+
+    return run_batch
+
+def detect_batch_runner():
+    """Callable detecting objects in a list of decoded images in one forward pass"""
+    yolo_detector = _require('yolo_detector', 'YOLOv8 model not loaded')
+
+    def run_batch(images):
+        detections = _cached_many(
+            'detect', yolo_detector, images,
+            lambda misses: yolo_detector.detect_batch(misses, DETECTION_CONF_THRESHOLD),
+            params=_detection_params(yolo_detector, DETECTION_CONF_THRESHOLD)
+        )
+        return [_detection_payload(yolo_detector, result) for result in detections]
+
+    return run_batch
+
+def run_batch_chunk(chunk, start, run_batch):
+    """
+    Decode and run one chunk of batch items
+
+    Args:
+        chunk: list of (filename, read_fn) tuples
+        start: index of the first item in the whole batch
+        run_batch: callable taking a list of DecodedImage, returning result dicts
+
+    Returns:
+        list of result entries in input order; images that fail to decode get
+        an error entry instead of failing the batch
+    """
+    entries = []
+    images = []
+    for offset, (filename, read_fn) in enumerate(chunk):
+        entry = {'index': start + offset, 'filename': filename}
+        try:
+            images.append(DecodedImage.from_bytes(read_fn(), max_side=DECODE_MAX_SIDE))
+            entries.append((entry, True))
+        except Exception as e:
+            entry['error'] = f"Invalid image: {str(e)}"
+            entries.append((entry, False))
+
+    outputs = iter(run_batch(images) if images else [])
+    results = []
+    for entry, decoded in entries:
+        if decoded:
+            entry.update(next(outputs))
+        results.append(entry)
+    return results
+
+def collect_batch_items(uploads, archive_file=None):
+    """
+    Items of a batch request within the per-request limits
+
+    Args:
+        uploads: list of (filename, read_fn) tuples of the uploaded files
+        archive_file: File-like zip archive, or None
+
+    Returns:
+        list of (filename, read_fn) tuples, uploads first
+
+    Raises:
+        UploadLimitExceeded: more than BATCH_MAX_IMAGES images, or an archive over its limits
+    """
+    if len(uploads) > BATCH_MAX_IMAGES:
+        raise UploadLimitExceeded(f"Too many images: {len(uploads)} (limit {BATCH_MAX_IMAGES})")
+
+    items = list(uploads)
+    if archive_file is not None:
+        items.extend(list_archive_images(
+            archive_file,
+            max_entries=ARCHIVE_MAX_ENTRIES,
+            max_images=BATCH_MAX_IMAGES - len(items),
+            max_entry_bytes=ARCHIVE_MAX_IMAGE_BYTES,
+            max_total_bytes=ARCHIVE_MAX_TOTAL_BYTES
+        ))
+    return items
+
+def batch_chunks(items):
+    """Split batch items into (start, chunk) pairs of BATCH_INFERENCE_SIZE"""
+    for start in range(0, len(items), BATCH_INFERENCE_SIZE):
+        yield start, items[start:start + BATCH_INFERENCE_SIZE]
+
+def iter_batch_results(items, run_batch):
+    """Yield one result per batch item, in order, chunk by chunk"""
+    for start, chunk in batch_chunks(items):
+        yield from run_batch_chunk(chunk, start, run_batch)
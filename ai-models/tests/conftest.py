@@ -0,0 +1,11 @@
+"""
+Test setup: the suite runs from ai-models/ and imports modules the way the
+servers (inference.*) and the training scripts (flat imports) do
+"""
+
+import os
+import sys
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+sys.path.insert(0, os.path.join(BASE_DIR, 'training'))
@@ -0,0 +1,56 @@
+"""
+Batch archive listing and its decompression limits
+"""
+
+import io
+import zipfile
+
+import pytest
+
+from inference.image_io import list_archive_images, UploadLimitExceeded
+
+def make_zip(files):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for name, data in files.items():
+            archive.writestr(name, data)
+    buffer.seek(0)
+    return buffer
+
+def test_lists_only_images_in_archive_order():
+    archive = make_zip({
+        'b.jpg': b'one',
+        'notes.txt': b'skip',
+        'dir/a.PNG': b'two',
+        '__MACOSX/._b.jpg': b'fork',
+        'c.webp': b'three'
+    })
+
+    entries = list_archive_images(archive)
+
+    assert [name for name, _ in entries] == ['b.jpg', 'dir/a.PNG', 'c.webp']
+    assert [read() for _, read in entries] == [b'one', b'two', b'three']
+
+def test_zip_bomb_entry_is_rejected_before_inflating():
+    # 64 MB of zeros compresses to a few tens of KB
+    archive = make_zip({'bomb.jpg': bytes(64 * 1024 * 1024)})
+    assert len(archive.getvalue()) < 1024 * 1024
+
+    with pytest.raises(UploadLimitExceeded):
+        list_archive_images(archive, max_entry_bytes=8 * 1024 * 1024)
+
+def test_total_uncompressed_size_is_bounded():
+    archive = make_zip({f'{i}.jpg': bytes(1024 * 1024) for i in range(5)})
+
+    with pytest.raises(UploadLimitExceeded):
+        list_archive_images(archive, max_entry_bytes=2 * 1024 * 1024, max_total_bytes=4 * 1024 * 1024)
+
+def test_entry_and_image_counts_are_bounded():
+    files = {f'{i}.jpg': b'x' for i in range(10)}
+    files.update({f'{i}.txt': b'x' for i in range(10)})
+
+    with pytest.raises(UploadLimitExceeded):
+        list_archive_images(make_zip(files), max_entries=15)
+    with pytest.raises(UploadLimitExceeded):
+        list_archive_images(make_zip(files), max_images=5)
+    assert len(list_archive_images(make_zip(files), max_entries=20, max_images=10)) == 10
@@ -0,0 +1,122 @@
+"""
+MicroBatcher: result routing, batch limits, errors and shutdown
+"""
+
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from inference.batching import MicroBatcher, BatcherClosed
+
+def recording_predict(batch_sizes, delay=0.0):
+    """predict_fn doubling its input and recording batch sizes"""
+    def predict(inputs):
+        batch_sizes.append(len(inputs))
+        if delay:
+            time.sleep(delay)
+        return inputs * 2
+    return predict
+
+def test_results_match_their_inputs_under_concurrency():
+    batch_sizes = []
+    batcher = MicroBatcher(recording_predict(batch_sizes), max_batch_size=4, max_wait_ms=20)
+    try:
+        with ThreadPoolExecutor(max_workers=16) as pool:
+            outputs = list(pool.map(lambda i: batcher.predict(np.full(3, i, dtype=np.float32)), range(64)))
+    finally:
+        batcher.close()
+
+    for i, output in enumerate(outputs):
+        np.testing.assert_array_equal(output, np.full(3, 2 * i))
+    assert sum(batch_sizes) == 64
+    assert max(batch_sizes) <= 4
+    # Concurrent callers actually share forward passes
+    assert max(batch_sizes) > 1
+
+def test_single_caller_is_not_delayed_past_max_wait():
+    batcher = MicroBatcher(recording_predict([]), max_batch_size=8, max_wait_ms=5)
+    try:
+        start = time.perf_counter()
+        batcher.predict(np.zeros(2))
+        assert time.perf_counter() - start < 1.0
+    finally:
+        batcher.close()
+
+def test_predict_error_reaches_every_caller_in_the_batch():
+    def failing(inputs):
+        raise ValueError("boom")
+
+    batcher = MicroBatcher(failing, max_batch_size=4, max_wait_ms=20)
+    try:
+        futures = [batcher.submit(np.zeros(2)) for _ in range(4)]
+        for future in futures:
+            with pytest.raises(ValueError, match="boom"):
+                future.result(timeout=5)
+        # The worker survives a failed batch
+        batcher.predict_fn = recording_predict([])
+        np.testing.assert_array_equal(batcher.predict(np.ones(2)), np.full(2, 2.0))
+    finally:
+        batcher.close()
+
+def test_close_serves_pending_inputs():
+    batcher = MicroBatcher(recording_predict([], delay=0.01), max_batch_size=2, max_wait_ms=1)
+    futures = [batcher.submit(np.full(1, i)) for i in range(10)]
+    batcher.close()
+
+    for i, future in enumerate(futures):
+        assert future.result(timeout=0)[0] == 2 * i
+
+def test_submit_after_close_raises():
+    batcher = MicroBatcher(recording_predict([]))
+    batcher.close()
+    batcher.close()  # idempotent
+
+    with pytest.raises(BatcherClosed):
+        batcher.submit(np.zeros(1))
+
+def test_submits_racing_close_never_hang():
+    for _ in range(20):
+        batcher = MicroBatcher(recording_predict([]), max_batch_size=4, max_wait_ms=1)
+        futures = []
+        start = threading.Event()
+
+        def submit_many():
+            start.wait()
+            for i in range(50):
+                try:
+                    futures.append((i, batcher.submit(np.full(1, i))))
+                except BatcherClosed:
+                    return
+
+        threads = [threading.Thread(target=submit_many) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        start.set()
+        batcher.close()
+        for thread in threads:
+            thread.join()
+
+        # Every accepted input is either served or failed, never left pending
+        for i, future in futures:
+            try:
+                assert future.result(timeout=5)[0] == 2 * i
+            except BatcherClosed:
+                pass
+
+def test_predict_times_out_instead_of_waiting_forever():
+    release = threading.Event()
+
+    def blocked(inputs):
+        release.wait()
+        return inputs
+
+    batcher = MicroBatcher(blocked, max_wait_ms=0, result_timeout=0.05)
+    try:
+        with pytest.raises(TimeoutError):
+            batcher.predict(np.zeros(1))
+    finally:
+        release.set()
+        batcher.close()
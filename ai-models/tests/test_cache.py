@@ -0,0 +1,86 @@
+"""
+LRUCache eviction, TTL and disk tier
+"""
+
+import os
+import time
+
+from inference.cache import LRUCache, file_version
+
+def test_evicts_least_recently_used():
+    cache = LRUCache(max_entries=2)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    assert cache.get('a') == 1  # 'b' is now the oldest
+    cache.set('c', 3)
+
+    assert cache.get('b') is None
+    assert cache.get('a') == 1
+    assert cache.get('c') == 3
+    assert len(cache) == 2
+
+def test_stats_count_hits_and_misses():
+    cache = LRUCache(max_entries=4)
+    cache.set('a', 1)
+    cache.get('a')
+    cache.get('missing')
+    cache.get('missing', default='fallback')
+
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['disk_hits']) == (1, 2, 0)
+    assert stats['hit_rate'] == round(1 / 3, 4)
+
+def test_entries_expire_after_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, 'time', lambda: now[0])
+
+    cache = LRUCache(max_entries=4, ttl_seconds=10)
+    cache.set('a', 1)
+    now[0] += 5
+    assert cache.get('a') == 1
+    now[0] += 6
+    assert cache.get('a') is None
+    assert len(cache) == 0
+
+def test_disk_tier_survives_a_new_instance(tmp_path):
+    first = LRUCache(max_entries=1, persist_dir=str(tmp_path))
+    first.set('a', {'result': [1, 2]})
+    first.set('b', 'second')  # evicts 'a' from memory only
+
+    assert first.get('a') == {'result': [1, 2]}
+    assert first.stats()['disk_hits'] == 1
+
+    second = LRUCache(max_entries=8, persist_dir=str(tmp_path))
+    assert second.get('b') == 'second'
+    assert second.get('a') == {'result': [1, 2]}
+    # Disk hits are promoted to memory
+    assert second.stats()['disk_hits'] == 2
+    assert second.get('a') == {'result': [1, 2]}
+    assert second.stats()['hits'] == 1
+
+def test_expired_disk_entries_are_removed(tmp_path):
+    cache = LRUCache(max_entries=4, ttl_seconds=60, persist_dir=str(tmp_path))
+    cache.set('a', 1)
+    path = cache._disk_path('a')
+    old = time.time() - 120
+    os.utime(path, (old, old))
+
+    fresh = LRUCache(max_entries=4, ttl_seconds=60, persist_dir=str(tmp_path))
+    assert fresh.get('a') is None
+    assert not os.path.exists(path)
+
+def test_corrupt_disk_entry_is_a_miss(tmp_path):
+    cache = LRUCache(max_entries=4, persist_dir=str(tmp_path))
+    cache.set('a', 1)
+    with open(cache._disk_path('a'), 'wb') as f:
+        f.write(b'not a pickle')
+
+    assert LRUCache(max_entries=4, persist_dir=str(tmp_path)).get('a') is None
+
+def test_file_version_changes_with_the_file(tmp_path):
+    path = tmp_path / 'weights.h5'
+    path.write_bytes(b'v1')
+    first = file_version(str(path))
+
+    path.write_bytes(b'v2 longer')
+    assert file_version(str(path)) != first
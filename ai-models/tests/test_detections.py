@@ -0,0 +1,97 @@
+"""
+Columnar Detections and vectorized analyze_severity against the original
+list-of-dicts implementation
+"""
+
+import numpy as np
+import pytest
+
+from inference.detections import Detections
+from inference.yolo_detector import YOLOv8WasteDetector
+
+@pytest.fixture
+def detector(monkeypatch):
+    # No weights and no ultralytics download: only the severity logic is used
+    monkeypatch.setattr(YOLOv8WasteDetector, 'load_model', lambda self: None)
+    return YOLOv8WasteDetector()
+
+def reference_severity(detector, detections, image_area=None):
+    """analyze_severity as it was before Detections, on the API list format"""
+    if not detections:
+        return {'level': 'none', 'score': 0, 'priority': 'low', 'waste_count': 0, 'dominant_type': None}
+
+    waste_counts = {}
+    total_area = 0
+    for det in detections:
+        waste_counts[det['class_name']] = waste_counts.get(det['class_name'], 0) + 1
+        bbox = det['bbox']
+        total_area += (bbox[2] - bbox[0]) * (bbox[3] - bbox[1])
+
+    dominant_type = max(waste_counts.items(), key=lambda x: x[1])[0]
+    score = detector._calculate_severity_score(dominant_type, len(detections), waste_counts)
+    level = detector._get_severity_level(score)
+    return {
+        'level': level,
+        'score': score,
+        'priority': detector._get_priority(level, dominant_type),
+        'waste_count': len(detections),
+        'dominant_type': dominant_type,
+        'waste_distribution': waste_counts,
+        'estimated_coverage': detector._estimate_coverage(total_area, image_area)
+    }
+
+def random_detections(rng, count, class_names):
+    xy = rng.uniform(0, 1500, (count, 2))
+    wh = rng.uniform(5, 300, (count, 2))
+    return Detections(
+        np.concatenate([xy, xy + wh], axis=1),
+        rng.uniform(0.25, 1.0, count),
+        rng.integers(0, len(class_names), count),
+        class_names
+    )
+
+@pytest.mark.parametrize('seed', range(20))
+def test_severity_matches_reference(detector, seed):
+    rng = np.random.default_rng(seed)
+    detections = random_detections(rng, int(rng.integers(0, 40)), detector.waste_types)
+    image_area = 1920 * 1080 if seed % 2 else None
+
+    as_list = detections.to_list()
+    expected = reference_severity(detector, as_list, image_area)
+
+    assert detector.analyze_severity(detections, image_area) == expected
+    # Callers still passing the list format get the same answer
+    assert detector.analyze_severity(as_list, image_area) == expected
+
+def test_empty_detections(detector):
+    expected = {'level': 'none', 'score': 0, 'priority': 'low', 'waste_count': 0, 'dominant_type': None}
+    assert detector.analyze_severity(Detections.empty(detector.waste_types)) == expected
+    assert detector.analyze_severity([]) == expected
+
+def test_to_list_round_trip(detector):
+    detections = random_detections(np.random.default_rng(0), 12, detector.waste_types)
+    as_list = detections.to_list()
+
+    assert set(as_list[0]) == {'bbox', 'confidence', 'class_id', 'class_name'}
+    assert [det['class_name'] for det in as_list] == [detector.waste_types[c] for c in detections.cls]
+    assert Detections.from_list(as_list, detector.waste_types).to_list() == as_list
+
+def test_counts_keep_first_appearance_order():
+    names = {0: 'plastic', 1: 'organic', 2: 'other'}
+    detections = Detections(np.zeros((5, 4)), np.ones(5), [2, 0, 2, 1, 0], names)
+    assert list(detections.counts().items()) == [('other', 2), ('plastic', 2), ('organic', 1)]
+
+def test_unknown_class_ids_are_named_unknown():
+    detections = Detections(np.zeros((3, 4)), np.ones(3), [0, 99, -1], {0: 'plastic'})
+    assert detections.names().tolist() == ['plastic', 'unknown', 'unknown']
+
+def test_select_and_scaled_keep_alignment():
+    names = {0: 'plastic', 1: 'organic'}
+    detections = Detections([[0, 0, 10, 10], [10, 10, 30, 50]], [0.9, 0.5], [0, 1], names, mock=True)
+
+    selected = detections.select(detections.conf > 0.6)
+    assert len(selected) == 1 and selected.mock
+
+    scaled = detections.scaled((2.0, 0.5))
+    np.testing.assert_allclose(scaled.xyxy[1], [20, 5, 60, 25])
+    np.testing.assert_allclose(scaled.areas(), detections.areas())
@@ -0,0 +1,80 @@
+"""
+InferenceExecutor admission control and Retry-After estimate
+"""
+
+import threading
+import time
+
+import pytest
+
+from inference.executor import InferenceExecutor, QueueFull
+
+def test_runs_jobs_and_counts_them():
+    executor = InferenceExecutor(max_workers=2, max_queue=4)
+    try:
+        assert [executor.submit(pow, i, 2).result(timeout=5) for i in range(6)] == [0, 1, 4, 9, 16, 25]
+        stats = executor.stats()
+        assert stats['completed'] == 6
+        assert stats['in_flight'] == 0
+        assert stats['rejected'] == 0
+    finally:
+        executor.shutdown()
+
+def test_rejects_beyond_max_queue_with_retry_after():
+    release = threading.Event()
+    executor = InferenceExecutor(max_workers=1, max_queue=3)
+    try:
+        futures = [executor.submit(release.wait) for _ in range(3)]
+
+        with pytest.raises(QueueFull) as error:
+            executor.submit(release.wait)
+        assert error.value.retry_after >= 1
+        assert executor.stats()['rejected'] == 1
+        assert executor.stats()['in_flight'] == 3
+
+        release.set()
+        for future in futures:
+            future.result(timeout=5)
+
+        # Slots are released once jobs finish
+        assert executor.submit(lambda: 'ok').result(timeout=5) == 'ok'
+    finally:
+        release.set()
+        executor.shutdown()
+
+def test_failed_jobs_release_their_slot():
+    def fail():
+        raise RuntimeError("boom")
+
+    executor = InferenceExecutor(max_workers=1, max_queue=1)
+    try:
+        for _ in range(3):
+            with pytest.raises(RuntimeError):
+                executor.submit(fail).result(timeout=5)
+        assert executor.stats()['in_flight'] == 0
+    finally:
+        executor.shutdown()
+
+def test_retry_after_grows_with_queue_depth_and_job_latency():
+    release = threading.Event()
+
+    def slow_job():
+        release.wait()
+        time.sleep(0.01)
+
+    executor = InferenceExecutor(max_workers=1, max_queue=64)
+    try:
+        assert executor.retry_after() == 1
+
+        # Teach the latency average 2s jobs, then fill the queue
+        executor._avg_seconds = 2.0
+        futures = [executor.submit(slow_job) for _ in range(10)]
+        assert executor.retry_after() == 20
+
+        release.set()
+        for future in futures:
+            future.result(timeout=5)
+        assert executor.retry_after() == 1
+    finally:
+        release.set()
+        executor.shutdown()
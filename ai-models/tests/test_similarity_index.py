@@ -0,0 +1,76 @@
+"""
+Perceptual hashing and the Hamming-distance index
+"""
+
+import io
+
+import numpy as np
+from PIL import Image
+
+from inference.image_io import DecodedImage
+from inference.similarity_index import PerceptualHashIndex, perceptual_hash
+
+def scene(seed, size=(320, 240)):
+    rng = np.random.default_rng(seed)
+    small = rng.integers(0, 255, (12, 16, 3), dtype=np.uint8)
+    return Image.fromarray(small).resize(size, Image.BILINEAR)
+
+def reencoded(image, size=None, quality=60):
+    if size is not None:
+        image = image.resize(size, Image.BILINEAR)
+    buffer = io.BytesIO()
+    image.save(buffer, format='JPEG', quality=quality)
+    return DecodedImage.from_bytes(buffer.getvalue())
+
+def distance(a, b):
+    return bin(a ^ b).count('1')
+
+def test_hash_survives_reencoding_and_resizing():
+    original = scene(0)
+    base = perceptual_hash(DecodedImage(original))
+
+    assert distance(base, perceptual_hash(reencoded(original))) <= 4
+    assert distance(base, perceptual_hash(reencoded(original, size=(160, 120)))) <= 4
+    assert distance(base, perceptual_hash(reencoded(scene(1)))) > 12
+
+def test_query_returns_closest_matches_first():
+    index = PerceptualHashIndex(max_entries=10)
+    index.add('exact', 0b1111)
+    index.add('two-off', 0b1100)
+    index.add('far', 0xFFFF_FFFF_0000_0000)
+
+    matches = index.query(0b1111, max_distance=6)
+    assert [(item_id, dist) for item_id, dist, _ in matches] == [('exact', 0), ('two-off', 2)]
+    assert index.query(0b1111, max_distance=6, limit=1)[0][0] == 'exact'
+    assert index.stats()['lookups_with_match'] == 2
+
+def test_full_index_replaces_oldest_and_updates_existing_ids():
+    index = PerceptualHashIndex(max_entries=3)
+    for i in range(3):
+        index.add(f'id{i}', i, payload={'n': i})
+
+    index.add('id1', 1, payload={'n': 'updated'})
+    assert len(index) == 3
+    assert index.query(1, max_distance=0)[0][2] == {'n': 'updated'}
+
+    index.add('id3', 3)
+    assert len(index) == 3
+    assert index.query(0, max_distance=0) == []  # id0 was the oldest
+    assert [m[0] for m in index.query(3, max_distance=0)] == ['id3']
+
+def test_high_bit_hashes_round_trip():
+    index = PerceptualHashIndex(max_entries=2)
+    value = (1 << 63) | 12345
+    index.add('high', value)
+    assert index.query(value, max_distance=0)[0][:2] == ('high', 0)
+
+def test_persisted_index_keeps_newest_entries(tmp_path):
+    path = str(tmp_path / 'index.pkl')
+    index = PerceptualHashIndex(max_entries=4, persist_path=path, save_interval=3600)
+    for i in range(6):
+        index.add(f'id{i}', i << 8, payload=i)
+    index.save()
+
+    smaller = PerceptualHashIndex(max_entries=2, persist_path=path)
+    assert len(smaller) == 2
+    assert sorted(m[0] for m in smaller.query(0, max_distance=64)) == ['id4', 'id5']
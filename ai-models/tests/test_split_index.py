@@ -0,0 +1,122 @@
+"""
+Content-hash split assignment and the persisted split index
+"""
+
+import hashlib
+
+import pytest
+
+from split_index import SplitIndex, assign_split, content_hash
+
+def make_dataset(root, images_per_class=40, classes=('plastic', 'organic')):
+    paths, labels = [], []
+    for label, name in enumerate(classes):
+        folder = root / name
+        folder.mkdir(parents=True, exist_ok=True)
+        for i in range(images_per_class):
+            path = folder / f'{i}.jpg'
+            path.write_bytes(f'{name}-{i}'.encode())
+            paths.append(str(path))
+            labels.append(label)
+    return paths, labels
+
+def test_assign_split_boundaries():
+    assert assign_split('00000000', 0.2, 0.1) == 'test'
+    assert assign_split('19999999', 0.2, 0.1) == 'test'
+    assert assign_split('1a000000', 0.2, 0.1) == 'val'
+    assert assign_split('4d000000', 0.2, 0.1) == 'train'
+    assert assign_split('ffffffff', 0.2, 0.1) == 'train'
+
+def test_assign_split_fractions():
+    digests = [hashlib.sha1(str(i).encode()).hexdigest() for i in range(20000)]
+    splits = [assign_split(digest, 0.2, 0.1) for digest in digests]
+
+    assert splits.count('test') / len(splits) == pytest.approx(0.1, abs=0.01)
+    assert splits.count('val') / len(splits) == pytest.approx(0.2, abs=0.01)
+
+def test_content_hash_matches_sha1(tmp_path):
+    path = tmp_path / 'image.jpg'
+    path.write_bytes(b'x' * 3000)
+    assert content_hash(str(path), chunk_size=1024) == hashlib.sha1(b'x' * 3000).hexdigest()
+
+def test_index_round_trips_through_csv(tmp_path):
+    paths, labels = make_dataset(tmp_path)
+    index = SplitIndex(str(tmp_path))
+    assert not index.load()
+    assert index.update(paths, labels) == (80, 0)
+    index.save()
+
+    reloaded = SplitIndex(str(tmp_path))
+    assert reloaded.load()
+    assert reloaded.entries == index.entries
+    assert reloaded.splits() == index.splits()
+    assert sum(reloaded.counts().values()) == 80
+    assert all('/' in entry['path'] and not entry['path'].startswith(str(tmp_path)) for entry in reloaded.entries)
+
+def test_existing_images_keep_their_split(tmp_path):
+    paths, labels = make_dataset(tmp_path, images_per_class=30)
+    index = SplitIndex(str(tmp_path))
+    index.update(paths, labels)
+    before = {entry['path']: entry['split'] for entry in index.entries}
+
+    # New images, a removed image and different fractions for new rows only
+    more_paths, more_labels = make_dataset(tmp_path / 'extra', images_per_class=10, classes=('other',))
+    index.validation_split, index.test_split = 0.5, 0.5
+    added, removed = index.update(paths[1:] + more_paths, labels[1:] + [4] * len(more_labels))
+
+    assert (added, removed) == (10, 1)
+    after = {entry['path']: entry['split'] for entry in index.entries}
+    assert all(after[path] == split for path, split in before.items() if path in after)
+    assert index.relative(paths[0]) not in after
+
+def test_duplicates_land_in_the_same_split(tmp_path):
+    (tmp_path / 'plastic').mkdir()
+    (tmp_path / 'other').mkdir()
+    copies = [tmp_path / 'plastic' / 'a.jpg', tmp_path / 'other' / 'copy_of_a.jpg']
+    for path in copies:
+        path.write_bytes(b'same bytes')
+
+    index = SplitIndex(str(tmp_path))
+    index.update([str(path) for path in copies], [0, 4])
+    assert len({entry['split'] for entry in index.entries}) == 1
+    assert len({entry['hash'] for entry in index.entries}) == 1
+
+def test_label_changes_are_applied(tmp_path):
+    paths, labels = make_dataset(tmp_path, images_per_class=5)
+    index = SplitIndex(str(tmp_path))
+    index.update(paths, labels)
+    split = index.entries[0]['split']
+
+    index.update(paths, [3] + labels[1:])
+    assert index.entries[0]['label'] == 3
+    assert index.entries[0]['split'] == split
+
+def test_small_datasets_get_non_empty_splits(tmp_path):
+    # Plain hash bucketing puts none of these six images in val
+    paths, labels = make_dataset(tmp_path, images_per_class=3)
+    index = SplitIndex(str(tmp_path), validation_split=0.05, test_split=0.05)
+    index.update(paths, labels)
+
+    counts = index.counts()
+    assert all(counts[name] >= 1 for name in ('train', 'val', 'test'))
+    assert sum(counts.values()) == 6
+
+    before = [entry['split'] for entry in index.entries]
+    index.update(paths, labels)
+    assert [entry['split'] for entry in index.entries] == before
+
+def test_changed_files_are_rehashed(tmp_path):
+    paths, labels = make_dataset(tmp_path, images_per_class=5)
+    index = SplitIndex(str(tmp_path))
+    index.update(paths, labels)
+    index.save()
+
+    with open(paths[0], 'wb') as f:
+        f.write(b'new content, different size')
+    reloaded = SplitIndex(str(tmp_path))
+    reloaded.load()
+    assert reloaded.update(paths, labels) == (0, 0)
+
+    entry = reloaded.entries[0]
+    assert entry['hash'] == hashlib.sha1(b'new content, different size').hexdigest()
+    assert entry['split'] == assign_split(entry['hash'])
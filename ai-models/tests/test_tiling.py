@@ -0,0 +1,79 @@
+"""
+Tiled detection helpers and class-aware NMS
+"""
+
+import numpy as np
+import pytest
+
+from inference.detector_backends import nms
+from inference.tiling import tile_grid, textured_tiles, shift_boxes
+
+@pytest.mark.parametrize('width,height', [(640, 480), (1280, 720), (4000, 3000), (8064, 6048), (641, 641)])
+def test_tiles_cover_the_image_without_padding(width, height):
+    tile_size, overlap = 640, 0.2
+    tiles = tile_grid(width, height, tile_size, overlap)
+
+    covered = np.zeros((height, width), dtype=bool)
+    for x1, y1, x2, y2 in tiles:
+        assert 0 <= x1 < x2 <= width and 0 <= y1 < y2 <= height
+        # Tiles are full size unless the image itself is smaller
+        assert x2 - x1 == min(tile_size, width) and y2 - y1 == min(tile_size, height)
+        covered[y1:y2, x1:x2] = True
+    assert covered.all()
+
+def test_neighbouring_tiles_overlap():
+    tiles = tile_grid(2000, 640, 640, 0.25)
+    starts = [x1 for x1, _, _, _ in tiles]
+    assert starts[:2] == [0, 480]
+    assert all(b - a <= 480 for a, b in zip(starts, starts[1:]))
+
+def test_small_image_is_one_tile():
+    assert tile_grid(300, 200, 640) == [(0, 0, 300, 200)]
+
+def test_flat_tiles_are_skipped():
+    image = np.full((640, 1280, 3), 128, dtype=np.uint8)
+    image[:, 640:] = np.random.default_rng(0).integers(0, 255, (640, 640, 3), dtype=np.uint8)
+    tiles = [(0, 0, 640, 640), (640, 0, 1280, 640)]
+
+    assert textured_tiles(image, tiles, min_std=6.0).tolist() == [False, True]
+    assert textured_tiles(image, tiles, min_std=0).tolist() == [True, True]
+
+def test_shift_boxes_moves_tile_outputs_to_image_coordinates():
+    outputs = [
+        (np.array([[0, 0, 10, 10]], np.float32), np.array([0.9], np.float32), np.array([1])),
+        (np.array([[5, 5, 15, 15]], np.float32), np.array([0.8], np.float32), np.array([2]))
+    ]
+    xyxy, conf, cls = shift_boxes(outputs, [(0, 0), (100, 200)])
+
+    np.testing.assert_array_equal(xyxy, [[0, 0, 10, 10], [105, 205, 115, 215]])
+    np.testing.assert_array_equal(conf, np.array([0.9, 0.8], np.float32))
+    np.testing.assert_array_equal(cls, [1, 2])
+    assert shift_boxes([], [])[0].shape == (0, 4)
+
+def test_nms_suppresses_overlaps_within_a_class_only():
+    xyxy = np.array([[0, 0, 100, 100], [5, 5, 105, 105], [0, 0, 100, 100], [300, 300, 400, 400]], np.float32)
+    conf = np.array([0.9, 0.8, 0.7, 0.6])
+    cls = np.array([0, 0, 1, 0])
+
+    assert nms(xyxy, conf, cls, 0.5).tolist() == [0, 2, 3]
+
+def test_nms_keeps_classes_apart_at_full_resolution():
+    # On a 108MP frame (12000x9000), a fixed 7680 px per-class offset would
+    # move the class 1 box exactly onto the class 0 box
+    xyxy = np.array([[7780, 7780, 7880, 7880], [100, 100, 200, 200]], np.float32)
+    conf = np.array([0.9, 0.8])
+    cls = np.array([0, 1])
+
+    assert nms(xyxy, conf, cls, 0.5).tolist() == [0, 1]
+
+def test_nms_ios_merges_fragments_inside_a_larger_box():
+    xyxy = np.array([[0, 0, 200, 200], [10, 10, 60, 60]], np.float32)
+    conf = np.array([0.9, 0.6])
+    cls = np.array([3, 3])
+
+    assert nms(xyxy, conf, cls, 0.6).tolist() == [0, 1]
+    assert nms(xyxy, conf, cls, 0.6, metric='ios').tolist() == [0]
+
+def test_nms_of_nothing():
+    empty = nms(np.zeros((0, 4), np.float32), np.zeros(0), np.zeros(0, np.int64), 0.5)
+    assert empty.dtype == np.int64 and len(empty) == 0
@@ -0,0 +1,38 @@
+"""
+FrameSampler sampling limits and clip duration
+"""
+
+import cv2
+import numpy as np
+import pytest
+
+from inference.video import FrameSampler
+
+def write_clip(path, frames=50, fps=10, size=(96, 64)):
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*'MJPG'), fps, size)
+    if not writer.isOpened():
+        pytest.skip("No video encoder available")
+    rng = np.random.default_rng(0)
+    for _ in range(frames):
+        # Every frame differs, so every checked frame is sampled
+        writer.write(rng.integers(0, 255, (size[1], size[0], 3), dtype=np.uint8))
+    writer.release()
+    return str(path)
+
+def test_full_clip_is_not_truncated(tmp_path):
+    sampler = FrameSampler(write_clip(tmp_path / 'clip.avi'), max_frames=100)
+    samples = list(sampler)
+
+    assert not sampler.truncated
+    assert sampler.frames_read == 50
+    assert len(samples) == sampler.frames_sampled == 25  # 5 checks per second at 10 fps
+    assert sampler.duration_seconds == pytest.approx(5.0)
+
+def test_max_frames_truncates_but_keeps_the_clip_duration(tmp_path):
+    sampler = FrameSampler(write_clip(tmp_path / 'clip.avi'), max_frames=5)
+    samples = list(sampler)
+
+    assert len(samples) == 5
+    assert sampler.truncated
+    assert sampler.frames_read < 50
+    assert sampler.duration_seconds == pytest.approx(5.0)
@@ -0,0 +1,196 @@
+"""
+Build pre-resized, sharded TFRecords from the waste_images class folders
+Training then reads raw uint8 pixels instead of walking the tree and decoding
+JPEGs on every run
+
+Rebuilds are incremental: an image is decoded again only when it is new or its
+size / mtime changed, and only shards that lost images are rewritten (their
+surviving records are copied without decoding).
+
+Usage (from ai-models/):
+    python training/build_dataset.py --data-dir datasets/waste_images --output datasets/waste_shards
+    python training/train_model.py --shard-dir datasets/waste_shards
+"""
+
+import tensorflow as tf
+import argparse
+import json
+import re
+import os
+from data_loader import WasteDataLoader, MANIFEST_NAME, RECORD_FEATURES, load_manifest
+from split_index import SplitIndex
+
+SHARD_NAME = 'shard-{:05d}.tfrecord'
+SHARD_RE = re.compile(r'^shard-(\d{5})\.tfrecord$')
+
+def serialize_record(image, label, path):
+    """uint8 HxWx3 array, label index and relative path -> serialized tf.train.Example"""
+    features = {
+        'image': tf.train.Feature(bytes_list=tf.train.BytesList(value=[image.tobytes()])),
+        'label': tf.train.Feature(int64_list=tf.train.Int64List(value=[int(label)])),
+        'path': tf.train.Feature(bytes_list=tf.train.BytesList(value=[path.encode('utf-8')]))
+    }
+    return tf.train.Example(features=tf.train.Features(feature=features)).SerializeToString()
+
+class ShardWriter:
+    """Write records into numbered shards of at most shard_size records"""
+
+    def __init__(self, output_dir, shard_size, first_index):
+        self.output_dir = output_dir
+        self.shard_size = shard_size
+        self.index = first_index
+        self.counts = {}
+        self.current = None
+        self._writer = None
+
+    def write(self, serialized):
+        """Append one record; returns the shard name it went to"""
+        if self._writer is None or self.counts[self.current] >= self.shard_size:
+            self._roll()
+        self._writer.write(serialized)
+        self.counts[self.current] += 1
+        return self.current
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            # Shards only appear under their final name once complete
+            os.replace(self._temp_path(), os.path.join(self.output_dir, self.current))
+            self._writer = None
+
+    def _roll(self):
+        self.close()
+        self.current = SHARD_NAME.format(self.index)
+        self.index += 1
+        self.counts[self.current] = 0
+        self._writer = tf.io.TFRecordWriter(self._temp_path())
+
+    def _temp_path(self):
+        return os.path.join(self.output_dir, self.current + '.tmp')
+
+def file_state(path):
+    """(size, mtime_ns) used to detect changed images"""
+    stat = os.stat(path)
+    return stat.st_size, stat.st_mtime_ns
+
+def build(data_dir, output_dir, image_size=(224, 224), shard_size=1024, index_path=None):
+    """
+    Create or update the shards in output_dir
+
+    The split index is refreshed from the same listing, so training from the
+    shards never has to list data_dir.
+
+    Returns:
+        dict with counts of reused, copied, decoded, skipped and removed images
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    loader = WasteDataLoader(data_dir, image_size)
+    paths, labels = loader.list_files()
+
+    index = SplitIndex(data_dir, index_path)
+    index.load()
+    added, removed = index.update(paths, labels)
+    index.save()
+    print(f"Split index {index.index_path}: {added} added, {removed} removed, {index.counts()}")
+
+    manifest = load_manifest(output_dir)
+    if manifest and (tuple(manifest['image_size']) != tuple(image_size)
+                     or manifest['class_names'] != loader.class_names):
+        print("Image size or classes changed - rebuilding all shards")
+        manifest = None
+    if manifest is None:
+        manifest = {'shards': {}, 'images': {}}
+    old = manifest['images']
+
+    # Relative path -> (absolute path, label, size, mtime), in list_files order
+    current = {}
+    for path, label in zip(paths, labels):
+        size, mtime = file_state(path)
+        current[os.path.relpath(path, data_dir).replace(os.sep, '/')] = (path, label, size, mtime)
+
+    unchanged = {
+        rel for rel, (_, label, size, mtime) in current.items()
+        if rel in old and (old[rel]['label'], old[rel]['size'], old[rel]['mtime']) == (label, size, mtime)
+    }
+    stale_shards = {entry['shard'] for rel, entry in old.items() if rel not in unchanged}
+    carried = {rel for rel in unchanged if old[rel]['shard'] in stale_shards}
+    pending = [rel for rel in current if rel not in unchanged]
+
+    shards = {name: count for name, count in manifest['shards'].items() if name not in stale_shards}
+    placed = {rel: old[rel]['shard'] for rel in unchanged if rel not in carried}
+
+    existing = [int(m.group(1)) for m in map(SHARD_RE.match, os.listdir(output_dir)) if m]
+    writer = ShardWriter(output_dir, shard_size, max(existing, default=-1) + 1)
+
+    stats = {'reused': len(placed), 'copied': 0, 'decoded': 0}
+
+    # Copy the still-valid records out of shards that are being replaced
+    for name in sorted(stale_shards):
+        if not os.path.exists(os.path.join(output_dir, name)):
+            continue
+        for serialized in tf.data.TFRecordDataset(os.path.join(output_dir, name)):
+            rel = tf.io.parse_single_example(serialized, RECORD_FEATURES)['path'].numpy().decode('utf-8')
+            if rel in carried:
+                placed[rel] = writer.write(serialized.numpy())
+                carried.discard(rel)
+                stats['copied'] += 1
+
+    # Anything not found in its old shard is decoded again
+    pending.extend(sorted(carried))
+    if pending:
+        ds = tf.data.Dataset.from_tensor_slices(([current[rel][0] for rel in pending], pending))
+        ds = ds.map(lambda path, rel: (loader.decode_pixels(path), rel),
+                    num_parallel_calls=tf.data.AUTOTUNE, deterministic=False)
+        # Unreadable images are logged and skipped instead of aborting the build
+        ds = ds.ignore_errors(log_warning=True).prefetch(tf.data.AUTOTUNE)
+
+        for done, (image, rel) in enumerate(ds.as_numpy_iterator(), 1):
+            rel = rel.decode('utf-8')
+            placed[rel] = writer.write(serialize_record(image, current[rel][1], rel))
+            stats['decoded'] += 1
+            if done % 1000 == 0:
+                print(f"  decoded {done}/{len(pending)}")
+    writer.close()
+    shards.update(writer.counts)
+
+    manifest = {
+        'image_size': list(image_size),
+        'class_names': loader.class_names,
+        'shards': shards,
+        'images': {
+            rel: {'label': label, 'size': size, 'mtime': mtime, 'shard': placed[rel]}
+            for rel, (_, label, size, mtime) in current.items() if rel in placed
+        }
+    }
+    manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+    with open(manifest_path + '.tmp', 'w') as f:
+        json.dump(manifest, f)
+    os.replace(manifest_path + '.tmp', manifest_path)
+
+    # Replaced shards and leftovers of interrupted builds
+    for name in os.listdir(output_dir):
+        if (SHARD_RE.match(name) and name not in shards) or name.endswith('.tfrecord.tmp'):
+            os.remove(os.path.join(output_dir, name))
+
+    stats.update({
+        'images': len(manifest['images']),
+        'shards': len(shards),
+        'skipped': len(pending) - stats['decoded'],
+        'removed': sum(1 for rel in old if rel not in current)
+    })
+    return stats
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Build pre-resized TFRecord shards for training')
+    parser.add_argument('--data-dir', default='../datasets/waste_images')
+    parser.add_argument('--output', default='../datasets/waste_shards')
+    parser.add_argument('--image-size', type=int, default=224)
+    parser.add_argument('--shard-size', type=int, default=1024, help='Images per shard')
+    parser.add_argument('--index-path', default=None, help='Split index CSV (default: <data-dir>/split_index.csv)')
+    args = parser.parse_args()
+
+    stats = build(args.data_dir, args.output, (args.image_size, args.image_size), args.shard_size,
+                  args.index_path)
+    print(f"{stats['images']} images in {stats['shards']} shards under {args.output}")
+    print(f"  reused {stats['reused']}, copied {stats['copied']}, decoded {stats['decoded']}, "
+          f"skipped {stats['skipped']}, removed {stats['removed']}")
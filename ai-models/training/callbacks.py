@@ -0,0 +1,186 @@
+"""
+Training callbacks shared by the training scripts
+"""
+
+import tensorflow as tf
+from tensorflow import keras
+import json
+import time
+
+# Attributes that make up the state of the stock callbacks between epochs
+CALLBACK_STATE = {
+    'ReduceLROnPlateau': ('wait', 'best', 'cooldown_counter'),
+    'EarlyStopping': ('wait', 'best', 'best_epoch', 'stopped_epoch'),
+    'ModelCheckpoint': ('best',)
+}
+
+class ThroughputCallback(keras.callbacks.Callback):
+    """
+    Report training images/sec per epoch
+
+    The value is also added to the epoch logs as 'images_per_sec', so it ends
+    up in the History and in any CSV / TensorBoard logger that runs after it.
+    """
+
+    def __init__(self, batch_size):
+        super().__init__()
+        self.batch_size = batch_size
+        self._start = None
+        self._end = None
+        self._batches = 0
+
+    def on_epoch_begin(self, epoch, logs=None):
+        self._start = time.perf_counter()
+        self._end = self._start
+        self._batches = 0
+
+    def on_train_batch_end(self, batch, logs=None):
+        # Time up to the last training step, excluding validation
+        self._batches += 1
+        self._end = time.perf_counter()
+
+    def on_epoch_end(self, epoch, logs=None):
+        elapsed = self._end - self._start
+        images_per_sec = self._batches * self.batch_size / elapsed if elapsed > 0 else 0.0
+        if logs is not None:
+            logs['images_per_sec'] = images_per_sec
+        print(f"Epoch {epoch + 1}: {images_per_sec:.1f} images/sec ({self._batches} batches in {elapsed:.1f}s)")
+
+class ResumableCheckpoint(keras.callbacks.Callback):
+    """
+    Resumable training state saved every N steps and at every epoch end
+
+    One tf.train.Checkpoint holds the model, the optimizer (including its
+    learning rate, so ReduceLROnPlateau reductions survive), the position of
+    the next batch (epoch, step) and the state of the other callbacks.
+    CheckpointManager writes the files first and then atomically updates its
+    index, so a preempted save never corrupts the latest checkpoint; the last
+    `keep` checkpoints are kept.
+
+    Place it after the callbacks whose state it saves. EarlyStopping's best
+    weights are not saved; on resume it continues counting patience from the
+    saved best loss.
+    """
+
+    def __init__(self, directory, save_every_steps=200, keep=3, write_directory=None):
+        """
+        Args:
+            directory: Checkpoint folder (read on resume)
+            save_every_steps: Also save every this many training steps (0 = epoch ends only)
+            keep: Number of checkpoints to keep
+            write_directory: Where this process writes (non-chief workers
+                write to a temporary folder); default directory
+        """
+        super().__init__()
+        self.directory = directory
+        self.write_directory = write_directory or directory
+        self.save_every_steps = save_every_steps
+        self.keep = keep
+        self.callbacks = []
+
+        # Position of the next batch to train on
+        self.epoch = 0
+        self.step = 0
+        self.finished = False
+
+        self._callback_state = {}
+        self._checkpoint = None
+        self._manager = None
+        self._step_offset = 0
+        self._steps_since_save = 0
+        self._read_position()
+
+    def _read_position(self):
+        latest = tf.train.latest_checkpoint(self.directory)
+        if latest is None:
+            return
+        reader = tf.train.load_checkpoint(latest)
+        self.epoch = int(reader.get_tensor('epoch/.ATTRIBUTES/VARIABLE_VALUE'))
+        self.step = int(reader.get_tensor('step/.ATTRIBUTES/VARIABLE_VALUE'))
+        state = json.loads(reader.get_tensor('state/.ATTRIBUTES/VARIABLE_VALUE').decode('utf-8'))
+        self.finished = state['finished']
+        self._callback_state = state['callbacks']
+        print(f"Found checkpoint {latest}: epoch {self.epoch + 1}, step {self.step}"
+              f"{' (finished)' if self.finished else ''}")
+
+    def on_train_begin(self, logs=None):
+        if self._checkpoint is None:
+            self._epoch_var = tf.Variable(self.epoch, dtype=tf.int64, trainable=False)
+            self._step_var = tf.Variable(self.step, dtype=tf.int64, trainable=False)
+            self._state_var = tf.Variable('', dtype=tf.string, trainable=False)
+            self._checkpoint = tf.train.Checkpoint(
+                model=self.model,
+                optimizer=self.model.optimizer,
+                epoch=self._epoch_var,
+                step=self._step_var,
+                state=self._state_var
+            )
+            self._manager = tf.train.CheckpointManager(self._checkpoint, self.write_directory, max_to_keep=self.keep)
+
+            latest = tf.train.latest_checkpoint(self.directory)
+            if latest is not None:
+                # Optimizer slots are restored when they are created on the first step
+                self._checkpoint.restore(latest)
+                print(f"Restored model and optimizer from {latest}")
+
+        # Runs after the other callbacks reset themselves in on_train_begin
+        for key, callback in self._tracked_callbacks():
+            for name, value in self._callback_state.get(key, {}).items():
+                setattr(callback, name, value)
+
+        self._step_offset = self.step
+
+    def on_epoch_begin(self, epoch, logs=None):
+        self.epoch = epoch
+
+    def on_train_batch_end(self, batch, logs=None):
+        self.step = self._step_offset + batch + 1
+        self._steps_since_save += 1
+        # The last batch of an epoch is saved by on_epoch_end, after validation
+        last_batch = self.params.get('steps') is not None and batch + 1 >= self.params['steps']
+        if self.save_every_steps and self._steps_since_save >= self.save_every_steps and not last_batch:
+            self.save()
+
+    def on_epoch_end(self, epoch, logs=None):
+        self.epoch = epoch + 1
+        self.step = 0
+        self._step_offset = 0
+        self._callback_state = {
+            key: {name: _plain(getattr(callback, name)) for name in CALLBACK_STATE[type(callback).__name__]
+                  if hasattr(callback, name)}
+            for key, callback in self._tracked_callbacks()
+        }
+        self.save()
+
+    def mark_finished(self):
+        """Record that the phase is complete, so a restart skips it"""
+        self.finished = True
+        self.save()
+
+    def restore_weights(self, model):
+        """Load the model weights of the latest checkpoint (for a finished phase)"""
+        latest = tf.train.latest_checkpoint(self.directory)
+        tf.train.Checkpoint(model=model).restore(latest).expect_partial()
+        print(f"Loaded weights of finished phase from {latest}")
+
+    def save(self):
+        self._epoch_var.assign(self.epoch)
+        self._step_var.assign(self.step)
+        self._state_var.assign(json.dumps({'finished': self.finished, 'callbacks': self._callback_state}))
+        self._manager.save()
+        self._steps_since_save = 0
+
+    def _tracked_callbacks(self):
+        return [
+            (f"{i}:{type(callback).__name__}", callback)
+            for i, callback in enumerate(self.callbacks)
+            if type(callback).__name__ in CALLBACK_STATE
+        ]
+
+def _plain(value):
+    """numpy / tensor scalars -> JSON-serializable Python numbers"""
+    if hasattr(value, 'numpy'):
+        value = value.numpy()
+    if hasattr(value, 'item'):
+        value = value.item()
+    return value
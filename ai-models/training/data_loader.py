@@ -1,16 +1,270 @@
 import tensorflow as tf
 from tensorflow import keras
+import numpy as np
+import hashlib
+import json
+import sys
 import os
+from split_index import SplitIndex
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+# Same image types as serving and the batch archives
+from inference.image_io import IMAGE_EXTENSIONS, DecodedImage
+
+AUTOTUNE = tf.data.AUTOTUNE
+
+# tf.io.decode_image has no WebP decoder; those files are decoded with PIL, as in serving
+PIL_DECODE_PATTERN = r'.*\.webp'
+
+# Written by build_dataset.py next to the TFRecord shards
+MANIFEST_NAME = 'manifest.json'
+
+RECORD_FEATURES = {
+    'image': tf.io.FixedLenFeature([], tf.string),
+    'label': tf.io.FixedLenFeature([], tf.int64),
+    'path': tf.io.FixedLenFeature([], tf.string)
+}
+
+def epoch_batches(ds, batch_size, shuffle_buffer, seed, start_epoch=0, start_step=0):
+    """
+    Endless stream of shuffled training batches with one fixed order per epoch
+    
+    Epoch e is always shuffled with seed + e, so a resumed run rebuilds the
+    stream at start_epoch and skips the start_step batches it already trained
+    on. Pass steps_per_epoch to fit().
+    """
+    return tf.data.Dataset.range(start_epoch, 2**62).flat_map(
+        lambda epoch: ds.shuffle(shuffle_buffer, seed=seed + epoch, reshuffle_each_iteration=False)
+                        .batch(batch_size, drop_remainder=True)
+    ).skip(start_step)
+
+def load_manifest(shard_dir):
+    """Shard manifest written by build_dataset.py, or None if there is none"""
+    path = os.path.join(shard_dir, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
 
 class WasteDataLoader:
     """Load and preprocess waste dataset"""
     
-    def __init__(self, data_dir, image_size=(224, 224)):
+    def __init__(self, data_dir, image_size=(224, 224), cache_dir=None, seed=123, shard_dir=None,
+                 index_path=None, cache_tag=None):
+        """
+        Args:
+            data_dir: Root folder with one sub-folder per class
+            image_size: (height, width) images are resized to
+            cache_dir: Optional folder for the on-disk cache of decoded images
+                (None decodes every epoch; the dataset no longer has to fit in RAM)
+            seed: Seed of the train / validation / test split
+            shard_dir: Optional output folder of build_dataset.py; when set,
+                pre-resized pixels are read from its TFRecord shards and
+                data_dir is not walked
+            index_path: Split index CSV (default: data_dir/split_index.csv)
+            cache_tag: Appended to the cache file names; local multi-worker
+                runs pass the task name so workers sharing cache_dir never
+                write the same cache files
+        """
         self.data_dir = data_dir
         self.image_size = image_size
+        self.cache_dir = cache_dir
+        self.seed = seed
+        self.shard_dir = shard_dir
+        self.index_path = index_path
+        self.cache_tag = cache_tag
+        self.manifest = None
         self.class_names = ['plastic', 'organic', 'electronic', 'hazardous', 'other']
+        self.split_sizes = {}
+        self.splits = {}
+    
+    def list_files(self):
+        """
+        Image paths and label indices, listed once
+        
+        Labels follow self.class_names (the order used by the predictor),
+        not the alphabetical folder order.
+        
+        Returns:
+            (paths, labels) lists
+        """
+        paths, labels = [], []
+        for label, class_name in enumerate(self.class_names):
+            class_dir = os.path.join(self.data_dir, class_name)
+            if not os.path.isdir(class_dir):
+                continue
+            for root, _, filenames in sorted(os.walk(class_dir)):
+                for filename in sorted(filenames):
+                    if filename.lower().endswith(IMAGE_EXTENSIONS):
+                        paths.append(os.path.join(root, filename))
+                        labels.append(label)
+        
+        if not paths:
+            raise ValueError(f"No images found in {self.data_dir}")
+        return paths, labels
+    
+    def load_split_index(self, validation_split=0.2, test_split=0.1, refresh=False):
+        """
+        Persisted split index, created on first use
+        
+        Later runs read the index instead of listing data_dir. refresh=True
+        lists the folders again and appends new images (existing images keep
+        their split); the fractions only apply to images being added.
+        
+        Returns:
+            SplitIndex
+        """
+        index = SplitIndex(self.data_dir, self.index_path, validation_split, test_split)
+        if index.load() and not refresh:
+            return index
+        
+        added, removed = index.update(*self.list_files())
+        index.save()
+        print(f"Split index {index.index_path}: {added} added, {removed} removed, {index.counts()}")
+        return index
+    
+    def decode_pixels(self, path):
+        """Read, decode and resize one image to uint8 (compact for caches and shards)"""
+        data = tf.io.read_file(path)
+        image = tf.cond(
+            tf.strings.regex_full_match(tf.strings.lower(path), PIL_DECODE_PATTERN),
+            lambda: tf.numpy_function(lambda raw: DecodedImage.from_bytes(raw).rgb_array(), [data], tf.uint8),
+            lambda: tf.io.decode_image(data, channels=3, expand_animations=False)
+        )
+        image.set_shape([None, None, 3])
+        image = tf.image.resize(image, self.image_size, antialias=True)
+        return tf.cast(tf.clip_by_value(tf.round(image), 0, 255), tf.uint8)
+    
+    def decode_image(self, path, label):
+        """Decoded uint8 image and one-hot label"""
+        return self.decode_pixels(path), tf.one_hot(label, len(self.class_names))
+    
+    def parse_record(self, serialized):
+        """Shard record -> (uint8 image, label index, relative path)"""
+        example = tf.io.parse_single_example(serialized, RECORD_FEATURES)
+        image = tf.reshape(tf.io.decode_raw(example['image'], tf.uint8), (*self.image_size, 3))
+        return image, example['label'], example['path']
+    
+    def build_augmenter(self):
+        """Augmentation run on batches in the input pipeline (formerly part of the model graph)"""
+        return keras.Sequential([
+            keras.layers.RandomFlip("horizontal"),
+            keras.layers.RandomRotation(0.1),
+            keras.layers.RandomZoom(0.1)
+        ], name='augmentation')
+    
+    def build_dataset(self, paths, labels, batch_size=32, training=False, augment=True,
+                      shuffle_buffer=1000, cache_name=None, start_epoch=0, start_step=0):
+        """
+        tf.data pipeline: parallel decode -> optional file cache -> shuffle ->
+        batch -> augment -> normalize -> prefetch
+        
+        Args:
+            paths: Image paths
+            labels: Label indices
+            batch_size: Images per batch
+            training: Shuffle and augment
+            augment: Apply augmentation when training
+            shuffle_buffer: Shuffle buffer size in images
+            cache_name: Name of the cache file under cache_dir
+            start_epoch: Training only - epoch the stream starts at (resume)
+            start_step: Training only - batches of start_epoch to skip (resume)
+        
+        Returns:
+            tf.data.Dataset of (float32 images in [0, 1], one-hot labels);
+            endless when training (see epoch_batches)
+        """
+        ds = tf.data.Dataset.from_tensor_slices((
+            tf.constant(list(paths), dtype=tf.string),
+            tf.constant(list(labels), dtype=tf.int64)
+        ))
+        
+        if training:
+            # Shuffle file names first so the first (uncached) epoch is shuffled as well
+            ds = ds.shuffle(max(len(paths), 1), seed=self.seed, reshuffle_each_iteration=False)
+        
+        # Deterministic order keeps resumed runs on the exact same batches
+        ds = ds.map(self.decode_image, num_parallel_calls=AUTOTUNE)
+        
+        if self.cache_dir and cache_name:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            ds = ds.cache(os.path.join(self.cache_dir, self._cache_prefix(cache_name, paths)))
+        
+        return self._batch(ds, batch_size, training, augment, shuffle_buffer, start_epoch, start_step)
     
-    def load_data(self, batch_size=32, validation_split=0.2, test_split=0.1):
+    def build_shard_dataset(self, paths, batch_size=32, training=False, augment=True, shuffle_buffer=1000,
+                            start_epoch=0, start_step=0):
+        """
+        Same pipeline as build_dataset, read from the TFRecord shards
+        
+        Shards are read in parallel and records outside the split are dropped,
+        so no JPEG is decoded and data_dir is never listed.
+        
+        Args:
+            paths: Relative image paths (manifest keys) of the split
+        """
+        if self.manifest is None:
+            self.load_shard_manifest()
+        files = [os.path.join(self.shard_dir, name) for name in sorted(self.manifest['shards'])]
+        in_split = tf.lookup.StaticHashTable(
+            tf.lookup.KeyValueTensorInitializer(
+                tf.constant(list(paths), dtype=tf.string),
+                tf.ones(len(paths), dtype=tf.int64)
+            ),
+            default_value=0
+        )
+        num_classes = len(self.class_names)
+        
+        ds = tf.data.Dataset.from_tensor_slices(files)
+        if training:
+            ds = ds.shuffle(len(files), seed=self.seed, reshuffle_each_iteration=False)
+        ds = ds.interleave(tf.data.TFRecordDataset, cycle_length=min(len(files), 8),
+                           num_parallel_calls=AUTOTUNE)
+        ds = ds.map(self.parse_record, num_parallel_calls=AUTOTUNE)
+        ds = ds.filter(lambda image, label, path: in_split.lookup(path) > 0)
+        ds = ds.map(lambda image, label, path: (image, tf.one_hot(label, num_classes)))
+        
+        return self._batch(ds, batch_size, training, augment, shuffle_buffer, start_epoch, start_step)
+    
+    def _batch(self, ds, batch_size, training, augment, shuffle_buffer, start_epoch=0, start_step=0):
+        """Shared tail of the pipelines: shuffle -> batch -> augment -> normalize -> prefetch"""
+        if training:
+            ds = epoch_batches(ds, batch_size, shuffle_buffer, self.seed, start_epoch, start_step)
+        else:
+            ds = ds.batch(batch_size)
+        
+        if training and augment:
+            augmenter = self.build_augmenter()
+            ds = ds.map(lambda x, y: (augmenter(tf.cast(x, tf.float32), training=True), y),
+                        num_parallel_calls=AUTOTUNE)
+        
+        ds = ds.map(lambda x, y: (tf.cast(x, tf.float32) / 255.0, y), num_parallel_calls=AUTOTUNE)
+        
+        return ds.prefetch(AUTOTUNE)
+    
+    def _cache_prefix(self, name, paths):
+        """Cache file prefix that changes whenever the file list or image size changes"""
+        digest = hashlib.sha1()
+        digest.update(repr(self.image_size).encode('utf-8'))
+        for path in paths:
+            digest.update(path.encode('utf-8'))
+        prefix = f"{name}_{digest.hexdigest()[:12]}"
+        return f"{prefix}_{self.cache_tag}" if self.cache_tag else prefix
+    
+    def load_shard_manifest(self):
+        """Read and check the manifest written by build_dataset.py"""
+        self.manifest = load_manifest(self.shard_dir)
+        if self.manifest is None:
+            raise ValueError(f"No {MANIFEST_NAME} in {self.shard_dir} - run training/build_dataset.py first")
+        if tuple(self.manifest['image_size']) != tuple(self.image_size):
+            raise ValueError(f"Shards hold {self.manifest['image_size']} images, loader expects {list(self.image_size)}")
+        if self.manifest['class_names'] != self.class_names:
+            raise ValueError(f"Shards were built for classes {self.manifest['class_names']}")
+        return self.manifest
+    
+    def load_data(self, batch_size=32, validation_split=0.2, test_split=0.1, augment=True, refresh_index=False):
         """
         Load dataset from directory structure:
         data_dir/
@@ -21,48 +275,59 @@ class WasteDataLoader:
                 img1.jpg
                 img2.jpg
             ...
-        """
         
-        # Training dataset
-        train_ds = keras.preprocessing.image_dataset_from_directory(
-            self.data_dir,
-            validation_split=validation_split + test_split,
-            subset="training",
-            seed=123,
-            image_size=self.image_size,
-            batch_size=batch_size,
-            label_mode='categorical'
-        )
+        The split comes from the persisted split index (see split_index.py),
+        so it is stable across runs (sizes follow the requested fractions
+        approximately) and the directory is only listed when the index is
+        created or refreshed. Images are decoded in parallel and, with
+        cache_dir set, cached to disk instead of RAM; with shard_dir set,
+        pixels are read from the TFRecord shards instead.
         
-        # Validation + Test dataset
-        val_test_ds = keras.preprocessing.image_dataset_from_directory(
-            self.data_dir,
-            validation_split=validation_split + test_split,
-            subset="validation",
-            seed=123,
-            image_size=self.image_size,
-            batch_size=batch_size,
-            label_mode='categorical'
-        )
+        The training dataset is endless (one fixed shuffle order per epoch, see
+        epoch_batches); pass steps_per_epoch to fit().
+        """
+        splits = self.load_splits(validation_split, test_split, refresh_index)
         
-        # Split validation and test
-        val_batches = int(len(val_test_ds) * (validation_split / (validation_split + test_split)))
-        val_ds = val_test_ds.take(val_batches)
-        test_ds = val_test_ds.skip(val_batches)
+        train_ds = self.make_dataset(*splits['train'], batch_size=batch_size, training=True,
+                                     augment=augment, cache_name='train')
+        val_ds = self.make_dataset(*splits['val'], batch_size=batch_size, cache_name='val')
+        test_ds = self.make_dataset(*splits['test'], batch_size=batch_size, cache_name='test')
         
-        # Normalize pixel values
-        normalization_layer = keras.layers.Rescaling(1./255)
-        train_ds = train_ds.map(lambda x, y: (normalization_layer(x), y))
-        val_ds = val_ds.map(lambda x, y: (normalization_layer(x), y))
-        test_ds = test_ds.map(lambda x, y: (normalization_layer(x), y))
+        return train_ds, val_ds, test_ds
+    
+    def load_splits(self, validation_split=0.2, test_split=0.1, refresh_index=False):
+        """
+        (paths, labels) per split from the split index, ready for make_dataset
         
-        # Performance optimization
-        AUTOTUNE = tf.data.AUTOTUNE
-        train_ds = train_ds.cache().shuffle(1000).prefetch(buffer_size=AUTOTUNE)
-        val_ds = val_ds.cache().prefetch(buffer_size=AUTOTUNE)
-        test_ds = test_ds.cache().prefetch(buffer_size=AUTOTUNE)
+        Paths are absolute when reading data_dir and relative (manifest keys)
+        when reading shards. Sets self.splits and self.split_sizes.
+        """
+        splits = self.load_split_index(validation_split, test_split, refresh_index).splits()
         
-        return train_ds, val_ds, test_ds
+        if self.shard_dir:
+            # Images the shard build could not decode are left out
+            images = self.load_shard_manifest()['images']
+            for name, (paths, labels) in splits.items():
+                keep = [i for i, path in enumerate(paths) if path in images]
+                splits[name] = ([paths[i] for i in keep], [labels[i] for i in keep])
+        else:
+            splits = {
+                name: ([os.path.join(self.data_dir, path) for path in paths], labels)
+                for name, (paths, labels) in splits.items()
+            }
+        
+        self.splits = splits
+        self.split_sizes = {name: len(split[0]) for name, split in splits.items()}
+        return splits
+    
+    def make_dataset(self, paths, labels, batch_size=32, training=False, augment=True, cache_name=None,
+                     start_epoch=0, start_step=0):
+        """build_shard_dataset with shard_dir set, build_dataset otherwise"""
+        if self.shard_dir:
+            return self.build_shard_dataset(paths, batch_size=batch_size, training=training, augment=augment,
+                                            start_epoch=start_epoch, start_step=start_step)
+        return self.build_dataset(paths, labels, batch_size=batch_size, training=training, augment=augment,
+                                  cache_name=cache_name, start_epoch=start_epoch, start_step=start_step)
     
     def load_single_image(self, image_path):
         """Load and preprocess a single image"""
@@ -84,3 +349,4 @@ if __name__ == "__main__":
     print("Dataset loaded successfully!")
     print(f"Number of classes: {len(loader.class_names)}")
     print(f"Class names: {loader.class_names}")
+    print(f"Split sizes: {loader.split_sizes}")
@@ -0,0 +1,149 @@
+"""
+tf.distribute helpers for ModelTrainer
+Strategy selection, local multi-worker launch (one process per worker on this
+machine, each with its share of the CPU cores) and chief-only file writes
+"""
+
+import tensorflow as tf
+import subprocess
+import tempfile
+import socket
+import json
+import sys
+import os
+
+STRATEGIES = ('default', 'mirrored', 'multi_worker')
+
+def free_ports(count):
+    """Ports that are free on localhost right now"""
+    sockets = []
+    try:
+        for _ in range(count):
+            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            sock.bind(('localhost', 0))
+            sockets.append(sock)
+        return [sock.getsockname()[1] for sock in sockets]
+    finally:
+        for sock in sockets:
+            sock.close()
+
+def worker_env(cluster, index, threads):
+    """
+    Environment of one local worker process
+
+    Args:
+        cluster: list of 'host:port' worker addresses
+        index: Task index of this worker
+        threads: CPU threads this worker may use
+    """
+    env = dict(os.environ)
+    env['TF_CONFIG'] = json.dumps({
+        'cluster': {'worker': cluster},
+        'task': {'type': 'worker', 'index': index}
+    })
+    # Split the cores between workers instead of every worker using all of them
+    env['TF_NUM_INTRAOP_THREADS'] = str(threads)
+    env['TF_NUM_INTEROP_THREADS'] = '1' if threads < 4 else '2'
+    env['OMP_NUM_THREADS'] = str(threads)
+    return env
+
+def launch_local_workers(num_workers, argv, log_dir=None):
+    """
+    Run argv once per worker on localhost with TF_CONFIG set and wait
+
+    Worker 0 (the chief) prints to this terminal, the others log to
+    log_dir/worker_<i>.log.
+
+    Returns:
+        Highest worker exit code
+    """
+    cluster = [f'localhost:{port}' for port in free_ports(num_workers)]
+    threads = max(1, (os.cpu_count() or 1) // num_workers)
+    log_dir = log_dir or tempfile.mkdtemp(prefix='workers_')
+    print(f"Launching {num_workers} local workers ({threads} threads each), logs in {log_dir}")
+
+    processes = []
+    logs = []
+    for index in range(num_workers):
+        if index == 0:
+            stdout = None
+        else:
+            stdout = open(os.path.join(log_dir, f'worker_{index}.log'), 'w')
+            logs.append(stdout)
+        processes.append(subprocess.Popen(
+            [sys.executable] + list(argv),
+            env=worker_env(cluster, index, threads),
+            stdout=stdout,
+            stderr=subprocess.STDOUT if stdout else None
+        ))
+
+    try:
+        return max(process.wait() for process in processes)
+    finally:
+        for process in processes:
+            if process.poll() is None:
+                process.kill()
+        for log in logs:
+            log.close()
+
+def make_strategy(name='default', cpu_replicas=1):
+    """
+    Create a tf.distribute strategy
+
+    Must run before any other TensorFlow op (MultiWorkerMirroredStrategy and
+    logical CPU devices can only be set up at program start).
+
+    Args:
+        name: 'default', 'mirrored' (all local GPUs, or cpu_replicas CPU
+            replicas without GPUs) or 'multi_worker' (cluster from TF_CONFIG)
+        cpu_replicas: Logical CPU devices for 'mirrored' on a CPU-only machine
+    """
+    if name not in STRATEGIES:
+        raise ValueError(f"Unknown strategy: {name}")
+
+    if name == 'multi_worker':
+        return tf.distribute.MultiWorkerMirroredStrategy()
+
+    if name == 'mirrored':
+        if not tf.config.list_physical_devices('GPU') and cpu_replicas > 1:
+            cpu = tf.config.list_physical_devices('CPU')[0]
+            tf.config.set_logical_device_configuration(
+                cpu, [tf.config.LogicalDeviceConfiguration() for _ in range(cpu_replicas)]
+            )
+            devices = [device.name for device in tf.config.list_logical_devices('CPU')]
+            return tf.distribute.MirroredStrategy(devices)
+        return tf.distribute.MirroredStrategy()
+
+    return tf.distribute.get_strategy()
+
+def is_chief(strategy):
+    """True unless this process is a non-chief worker of a multi-worker cluster"""
+    resolver = getattr(strategy, 'cluster_resolver', None)
+    if resolver is None or not resolver.task_type:
+        return True
+    return resolver.task_type == 'chief' or (resolver.task_type == 'worker' and resolver.task_id == 0)
+
+def task_name(strategy):
+    """
+    '<task type>_<task index>' of this process in a multi-worker cluster, None
+    otherwise; keeps per-worker files (e.g. the tf.data cache) apart
+    """
+    resolver = getattr(strategy, 'cluster_resolver', None)
+    if resolver is None or not resolver.task_type:
+        return None
+    return f"{resolver.task_type}_{resolver.task_id or 0}"
+
+def write_path(path, strategy):
+    """
+    Path a worker should save to: the real path on the chief, a temporary
+    copy elsewhere (every worker has to take part in saving)
+    """
+    if is_chief(strategy):
+        return path
+    return os.path.join(tempfile.mkdtemp(prefix='worker_save_'), os.path.basename(path))
+
+def shard_by_data(dataset):
+    """Shard a dataset between workers by element (works for any file layout)"""
+    options = tf.data.Options()
+    options.experimental_distribute.auto_shard_policy = tf.data.experimental.AutoShardPolicy.DATA
+    return dataset.with_options(options)
@@ -0,0 +1,238 @@
+"""
+Quantized TFLite export for the waste classifier and Siamese feature extractor
+Calibrates on a sample of datasets/waste_images and reports accuracy drift
+
+Usage (from ai-models/):
+    python training/export_quantized.py --model classifier --mode int8
+    python training/export_quantized.py --model siamese --mode fp16
+"""
+
+import tensorflow as tf
+import numpy as np
+from PIL import Image
+import argparse
+import json
+import time
+import sys
+import os
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+from model import WasteDetectionModel
+from split_index import SplitIndex
+from inference.siamese_network import SiameseNetwork, head_weights_path
+from inference.tflite_model import TFLiteModel
+from inference.image_io import IMAGE_EXTENSIONS
+
+CLASS_NAMES = ['plastic', 'organic', 'electronic', 'hazardous', 'other']
+
+def load_sample_images(data_dir, image_size, num_samples, seed=123, files=None):
+    """
+    Load a class-balanced random sample of images
+
+    Args:
+        files: Optional (relative path, label) pairs to sample from, e.g. one
+            split of the split index; default lists every class folder
+
+    Returns:
+        images: float32 array (N, height, width, 3) scaled to [0, 1]
+        labels: int array (N,) of class indices
+    """
+    rng = np.random.default_rng(seed)
+
+    per_class = {}
+    if files is not None:
+        for path, label in sorted(files):
+            per_class.setdefault(label, []).append(os.path.join(data_dir, path))
+        for class_files in per_class.values():
+            rng.shuffle(class_files)
+    else:
+        for label, class_name in enumerate(CLASS_NAMES):
+            class_dir = os.path.join(data_dir, class_name)
+            if not os.path.isdir(class_dir):
+                continue
+            class_files = sorted(
+                os.path.join(class_dir, f) for f in os.listdir(class_dir)
+                if f.lower().endswith(IMAGE_EXTENSIONS)
+            )
+            rng.shuffle(class_files)
+            per_class[label] = class_files
+
+    if not per_class:
+        raise ValueError(f"No class folders found in {data_dir}")
+
+    # Round-robin across classes so every class is represented
+    selected = []
+    while len(selected) < num_samples and any(per_class.values()):
+        for label, files in per_class.items():
+            if files and len(selected) < num_samples:
+                selected.append((files.pop(), label))
+
+    images = np.zeros((len(selected),) + tuple(image_size) + (3,), dtype=np.float32)
+    labels = np.zeros(len(selected), dtype=np.int64)
+    for i, (path, label) in enumerate(selected):
+        with Image.open(path) as img:
+            images[i] = np.asarray(img.convert('RGB').resize(image_size), dtype=np.float32) / 255.0
+        labels[i] = label
+
+    return images, labels
+
+def export_tflite(keras_model, output_path, mode='int8', calibration_images=None):
+    """
+    Convert a Keras model to TFLite
+
+    Args:
+        mode: 'int8' (full integer weights and activations, needs calibration images),
+              'fp16' (half-precision weights) or 'dynamic' (int8 weights only)
+    """
+    converter = tf.lite.TFLiteConverter.from_keras_model(keras_model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+
+    if mode == 'int8':
+        if calibration_images is None or len(calibration_images) == 0:
+            raise ValueError("INT8 export needs calibration images")
+
+        def representative_dataset():
+            for image in calibration_images:
+                yield [image[np.newaxis].astype(np.float32)]
+
+        converter.representative_dataset = representative_dataset
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+    elif mode == 'fp16':
+        converter.target_spec.supported_types = [tf.float16]
+    elif mode != 'dynamic':
+        raise ValueError(f"Unknown quantization mode: {mode}")
+
+    tflite_model = converter.convert()
+
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    with open(output_path, 'wb') as f:
+        f.write(tflite_model)
+
+    print(f"Exported {mode} model to {output_path} ({len(tflite_model) / 2**20:.1f} MB)")
+
+def _mean_latency_ms(fn, images):
+    start = time.perf_counter()
+    for image in images:
+        fn(image[np.newaxis])
+    return (time.perf_counter() - start) * 1000 / len(images)
+
+def classifier_drift(keras_model, tflite_path, images, labels):
+    """Compare float and quantized classifier predictions on held-out images"""
+    quantized = TFLiteModel(tflite_path)
+
+    float_probs = keras_model.predict(images, verbose=0)
+    quant_probs = np.concatenate([quantized(image[np.newaxis]) for image in images])
+
+    float_top = float_probs.argmax(axis=1)
+    quant_top = quant_probs.argmax(axis=1)
+    abs_diff = np.abs(float_probs - quant_probs)
+
+    return {
+        'samples': int(len(images)),
+        'float_accuracy': float((float_top == labels).mean()),
+        'quantized_accuracy': float((quant_top == labels).mean()),
+        'top1_agreement': float((float_top == quant_top).mean()),
+        'mean_abs_prob_diff': float(abs_diff.mean()),
+        'max_abs_prob_diff': float(abs_diff.max()),
+        'float_latency_ms': _mean_latency_ms(lambda x: keras_model(x, training=False), images),
+        'quantized_latency_ms': _mean_latency_ms(quantized, images),
+        'quantized_size_mb': os.path.getsize(tflite_path) / 2**20
+    }
+
+def siamese_drift(feature_extractor, comparison_head, tflite_path, images):
+    """Compare float and quantized embeddings and the resulting pair scores"""
+    quantized = TFLiteModel(tflite_path)
+
+    float_emb = feature_extractor.predict(images, verbose=0)
+    quant_emb = np.concatenate([quantized(image[np.newaxis]) for image in images])
+
+    norms = np.linalg.norm(float_emb, axis=1) * np.linalg.norm(quant_emb, axis=1)
+    cosine = (float_emb * quant_emb).sum(axis=1) / np.maximum(norms, 1e-12)
+
+    # Score neighbouring images as before/after pairs through the float head
+    float_scores = comparison_head.predict([float_emb[:-1], float_emb[1:]], verbose=0)[:, 0]
+    quant_scores = comparison_head.predict([quant_emb[:-1], quant_emb[1:]], verbose=0)[:, 0]
+
+    return {
+        'samples': int(len(images)),
+        'mean_embedding_cosine': float(cosine.mean()),
+        'min_embedding_cosine': float(cosine.min()),
+        'mean_abs_score_diff': float(np.abs(float_scores - quant_scores).mean()),
+        'max_abs_score_diff': float(np.abs(float_scores - quant_scores).max()),
+        'decision_agreement': float(((float_scores > 0.5) == (quant_scores > 0.5)).mean()),
+        'float_latency_ms': _mean_latency_ms(lambda x: feature_extractor(x, training=False), images),
+        'quantized_latency_ms': _mean_latency_ms(quantized, images),
+        'quantized_size_mb': os.path.getsize(tflite_path) / 2**20
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Export quantized TFLite models and report accuracy drift')
+    parser.add_argument('--model', choices=['classifier', 'siamese'], default='classifier')
+    parser.add_argument('--mode', choices=['int8', 'fp16', 'dynamic'], default='int8')
+    parser.add_argument('--model-path', help='Float Keras model (.h5)')
+    parser.add_argument('--output', help='Output .tflite path')
+    parser.add_argument('--data-dir', default=os.path.join(BASE_DIR, 'datasets', 'waste_images'))
+    parser.add_argument('--calibration-samples', type=int, default=200)
+    parser.add_argument('--eval-samples', type=int, default=300)
+    parser.add_argument('--index-path', help='Split index CSV (default: <data-dir>/split_index.csv if present)')
+    args = parser.parse_args()
+
+    pretrained_dir = os.path.join(BASE_DIR, 'pretrained')
+    if args.model == 'classifier':
+        model_path = args.model_path or os.path.join(pretrained_dir, 'waste_classifier.h5')
+        output = args.output or os.path.join(pretrained_dir, f'waste_classifier_{args.mode}.tflite')
+        keras_model = WasteDetectionModel().load_model(model_path)
+    else:
+        model_path = args.model_path or os.path.join(pretrained_dir, 'siamese_network.h5')
+        output = args.output or os.path.join(pretrained_dir, f'siamese_feature_extractor_{args.mode}.tflite')
+        siamese = SiameseNetwork(model_path=model_path, compiled=False)
+        keras_model = siamese.feature_extractor
+
+    image_size = tuple(keras_model.input_shape[1:3])
+
+    # Calibration and evaluation images never overlap
+    index = SplitIndex(args.data_dir, args.index_path)
+    if index.load():
+        # Calibrate on training images, measure drift on the held-out test split
+        splits = index.splits()
+        calibration_images, _ = load_sample_images(
+            args.data_dir, image_size, args.calibration_samples, files=list(zip(*splits['train']))
+        )
+        eval_images, eval_labels = load_sample_images(
+            args.data_dir, image_size, args.eval_samples, files=list(zip(*splits['test']))
+        )
+    else:
+        images, labels = load_sample_images(
+            args.data_dir, image_size, args.calibration_samples + args.eval_samples
+        )
+        calibration_images = images[:args.calibration_samples]
+        eval_images, eval_labels = images[args.calibration_samples:], labels[args.calibration_samples:]
+    print(f"Loaded {len(calibration_images)} calibration and {len(eval_images)} evaluation images")
+
+    export_tflite(keras_model, output, mode=args.mode, calibration_images=calibration_images)
+
+    if args.model == 'siamese':
+        # Serving loads only these weights next to the artifact, not the full Keras model
+        siamese.comparison_head.save_weights(head_weights_path(output))
+        print(f"Comparison head weights saved to {head_weights_path(output)}")
+
+    if len(eval_images) < 2:
+        print("Not enough evaluation images for a drift report")
+        sys.exit(0)
+
+    if args.model == 'classifier':
+        report = classifier_drift(keras_model, output, eval_images, eval_labels)
+    else:
+        report = siamese_drift(siamese.feature_extractor, siamese.comparison_head, output, eval_images)
+    report.update({'model': args.model, 'mode': args.mode, 'source': model_path, 'artifact': output})
+
+    report_path = os.path.splitext(output)[0] + '.drift.json'
+    with open(report_path, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    print("\nAccuracy drift (float vs quantized):")
+    for key, value in report.items():
+        print(f"  {key}: {value:.4f}" if isinstance(value, float) else f"  {key}: {value}")
+    print(f"Report saved to {report_path}")
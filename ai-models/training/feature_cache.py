@@ -0,0 +1,130 @@
+"""
+On-disk cache of pooled backbone features for transfer learning
+The frozen base runs once over each split and the head then trains on the
+cached float16 vectors, instead of re-running the backbone every epoch
+"""
+
+import tensorflow as tf
+import numpy as np
+import hashlib
+import time
+import os
+from data_loader import epoch_batches
+
+class FeatureCache:
+    """
+    Precomputed feature_extractor outputs, one .npy pair per split
+
+    Files are keyed by the base model, image size, file list and number of
+    augmented copies, so a changed split or model computes fresh features.
+    """
+
+    def __init__(self, cache_dir, feature_extractor, base_model_name, image_size):
+        """
+        Args:
+            cache_dir: Folder for the .npy files
+            feature_extractor: Keras model images -> pooled features
+            base_model_name: Name of the frozen base (part of the cache key)
+            image_size: (height, width) of the input images (part of the cache key)
+        """
+        self.cache_dir = cache_dir
+        self.feature_extractor = feature_extractor
+        self.base_model_name = base_model_name
+        self.image_size = image_size
+
+    def _prefix(self, split, paths, labels, copies):
+        digest = hashlib.sha1()
+        digest.update(f"{self.base_model_name}|{tuple(self.image_size)}|{copies}".encode('utf-8'))
+        for path, label in zip(paths, labels):
+            digest.update(f"{path}|{label}".encode('utf-8'))
+        return os.path.join(self.cache_dir, f"{split}_{self.base_model_name}_{digest.hexdigest()[:12]}")
+
+    def load_or_compute(self, split, dataset, paths, labels, copies=0, augmenter=None):
+        """
+        Cached features of one split, computed on first use
+
+        Args:
+            split: Split name ('train', 'val', ...)
+            dataset: Unshuffled, unaugmented batches of (images, one-hot labels)
+            paths: Image paths of the split (cache key and row count)
+            labels: Label indices of the split (cache key)
+            copies: Extra passes through augmenter appended after the clean pass,
+                so head training still sees augmented views
+            augmenter: Keras augmentation model (needed when copies > 0)
+
+        Returns:
+            (features (N, dim) float16 memory-mapped array, labels (N,) int array)
+        """
+        prefix = self._prefix(split, paths, labels, copies)
+        features_path = prefix + '.features.npy'
+        labels_path = prefix + '.labels.npy'
+
+        if os.path.exists(features_path) and os.path.exists(labels_path):
+            print(f"Using cached {split} features {features_path}")
+            return np.load(features_path, mmap_mode='r'), np.load(labels_path)
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        total = len(paths) * (1 + copies)
+        feature_dim = self.feature_extractor.output_shape[-1]
+        temp_path = prefix + '.tmp.npy'
+        features = np.lib.format.open_memmap(temp_path, mode='w+', dtype=np.float16, shape=(total, feature_dim))
+        feature_labels = np.zeros(total, dtype=np.int64)
+
+        start = time.perf_counter()
+        offset = 0
+        for copy in range(1 + copies):
+            passes = dataset
+            if copy:
+                passes = dataset.map(lambda x, y: (augmenter(x, training=True), y),
+                                     num_parallel_calls=tf.data.AUTOTUNE)
+            for images, onehot in passes:
+                batch = self.feature_extractor.predict_on_batch(images)
+                features[offset:offset + len(batch)] = batch
+                feature_labels[offset:offset + len(batch)] = np.argmax(onehot, axis=-1)
+                offset += len(batch)
+
+        if offset != total:
+            del features
+            os.remove(temp_path)
+            raise ValueError(f"Expected {total} {split} images, the dataset produced {offset}")
+
+        features.flush()
+        del features
+        os.replace(temp_path, features_path)
+        np.save(labels_path, feature_labels)
+
+        elapsed = time.perf_counter() - start
+        size_mb = os.path.getsize(features_path) / 2**20
+        print(f"Computed {total} {split} features in {elapsed:.1f}s ({total / elapsed:.1f} images/sec, {size_mb:.1f} MB)")
+        return np.load(features_path, mmap_mode='r'), feature_labels
+
+def feature_dataset(features, labels, num_classes, batch_size=256, training=False, seed=123,
+                    start_epoch=0, start_step=0):
+    """
+    tf.data pipeline of (float32 features, one-hot labels) batches for head training
+
+    Only row indices go through tf.data (shuffled over the whole split, 8
+    bytes per row); each batch gathers its rows from the memory-mapped
+    features, so the feature matrix is never loaded into memory or embedded
+    in the graph. Endless when training (see data_loader.epoch_batches);
+    start_epoch and start_step resume the stream.
+    """
+    labels = np.asarray(labels, dtype=np.int64)
+    feature_dim = features.shape[-1]
+
+    def gather(indices):
+        return np.asarray(features[indices], dtype=np.float32), labels[indices]
+
+    def load(indices):
+        x, y = tf.numpy_function(gather, [indices], (tf.float32, tf.int64))
+        x.set_shape([None, feature_dim])
+        y.set_shape([None])
+        return x, tf.one_hot(y, num_classes)
+
+    ds = tf.data.Dataset.range(len(labels))
+    if training:
+        ds = epoch_batches(ds, batch_size, len(labels), seed, start_epoch, start_step)
+    else:
+        ds = ds.batch(batch_size)
+    ds = ds.map(load, num_parallel_calls=tf.data.AUTOTUNE)
+    return ds.prefetch(tf.data.AUTOTUNE)
@@ -16,16 +16,24 @@ class WasteDetectionModel:
         self.model = None
         self.class_names = ['plastic', 'organic', 'electronic', 'hazardous', 'other']
     
-    def build_model(self):
-        """Build CNN model architecture"""
+    def build_model(self, augment=True):
+        """
+        Build CNN model architecture
+        
+        Args:
+            augment: Include augmentation layers in the graph; pass False when
+                the input pipeline augments (WasteDataLoader.load_data)
+        """
         
         # Input layer
         inputs = keras.Input(shape=self.input_shape)
+        x = inputs
         
         # Data augmentation
-        x = layers.RandomFlip("horizontal")(inputs)
-        x = layers.RandomRotation(0.1)(x)
-        x = layers.RandomZoom(0.1)(x)
+        if augment:
+            x = layers.RandomFlip("horizontal")(x)
+            x = layers.RandomRotation(0.1)(x)
+            x = layers.RandomZoom(0.1)(x)
         
         # Convolutional blocks
         x = layers.Conv2D(32, 3, activation='relu', padding='same')(x)
@@ -51,24 +59,42 @@ class WasteDetectionModel:
         x = layers.Dense(256, activation='relu')(x)
         x = layers.Dropout(0.3)(x)
         
-        # Output layer
-        outputs = layers.Dense(self.num_classes, activation='softmax')(x)
+        # Output layer (float32 softmax also under a mixed-precision policy)
+        outputs = layers.Dense(self.num_classes, activation='softmax', dtype='float32')(x)
         
         # Create model
         self.model = keras.Model(inputs, outputs)
         
         return self.model
     
-    def compile_model(self, learning_rate=0.001):
-        """Compile the model"""
-        self.model.compile(
+    def compile_model(self, learning_rate=0.001, model=None):
+        """Compile the model (or another model such as self.head)"""
+        (model or self.model).compile(
             optimizer=keras.optimizers.Adam(learning_rate=learning_rate),
             loss='categorical_crossentropy',
             metrics=['accuracy', 'top_k_categorical_accuracy']
         )
     
     def get_transfer_learning_model(self, base_model_name='MobileNetV2'):
-        """Build model using transfer learning"""
+        """
+        Build model using transfer learning
+        
+        The model is feature_extractor (frozen base + pooling) followed by
+        head, so the head can also be trained on its own on precomputed
+        features (see feature_cache.py) and the weights carry over.
+        """
+        self.build_feature_extractor(base_model_name)
+        self.build_head(self.feature_extractor.output_shape[-1])
+        
+        inputs = keras.Input(shape=self.input_shape)
+        outputs = self.head(self.feature_extractor(inputs))
+        
+        self.model = keras.Model(inputs, outputs)
+        
+        return self.model
+    
+    def build_feature_extractor(self, base_model_name='MobileNetV2'):
+        """Frozen pre-trained base followed by global average pooling"""
         
         # Load pre-trained base model
         if base_model_name == 'MobileNetV2':
@@ -88,18 +114,42 @@ class WasteDetectionModel:
         
         # Freeze base model layers
         base_model.trainable = False
+        self.base_model = base_model
+        self.base_model_name = base_model_name
         
-        # Build classification head
         inputs = keras.Input(shape=self.input_shape)
         x = base_model(inputs, training=False)
         x = layers.GlobalAveragePooling2D()(x)
-        x = layers.Dense(256, activation='relu')(x)
+        
+        self.feature_extractor = keras.Model(inputs, x, name='feature_extractor')
+        return self.feature_extractor
+    
+    def build_head(self, feature_dim):
+        """Classification head on pooled base features"""
+        inputs = keras.Input(shape=(feature_dim,))
+        x = layers.Dense(256, activation='relu')(inputs)
         x = layers.Dropout(0.5)(x)
-        outputs = layers.Dense(self.num_classes, activation='softmax')(x)
+        outputs = layers.Dense(self.num_classes, activation='softmax', dtype='float32')(x)
         
-        self.model = keras.Model(inputs, outputs)
+        self.head = keras.Model(inputs, outputs, name='head')
+        return self.head
+    
+    def unfreeze_top(self, num_layers):
+        """
+        Make the top num_layers layers of the base trainable for fine-tuning
         
-        return self.model
+        BatchNormalization layers stay frozen and the base keeps running in
+        inference mode (training=False), so their statistics are not disturbed.
+        """
+        self.base_model.trainable = True
+        for layer in self.base_model.layers[:-num_layers]:
+            layer.trainable = False
+        for layer in self.base_model.layers:
+            if isinstance(layer, layers.BatchNormalization):
+                layer.trainable = False
+        
+        trainable = sum(1 for layer in self.base_model.layers if layer.trainable)
+        print(f"Fine-tuning {trainable} of {len(self.base_model.layers)} base layers")
     
     def save_model(self, filepath):
         """Save trained model"""
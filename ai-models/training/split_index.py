@@ -0,0 +1,193 @@
+"""
+Persisted train / validation / test split of the waste_images dataset
+One CSV row per image (path, label, split, hash), written once and reused by
+training, evaluation and calibration so every job sees the same split without
+listing the dataset again
+
+The split of an image is a function of its content hash only, so appending
+images never moves existing ones, and byte-identical copies always land in the
+same split (no train / test leakage through duplicates). Hash bucketing only
+approximates the requested fractions; on small datasets a requested split
+that comes out empty receives one image moved from 'train'.
+"""
+
+import hashlib
+import csv
+import os
+
+SPLITS = ('train', 'val', 'test')
+INDEX_NAME = 'split_index.csv'
+FIELDS = ('path', 'label', 'split', 'hash', 'size', 'mtime_ns')
+
+def content_hash(path, chunk_size=1 << 20):
+    """SHA-1 hex digest of a file, read in chunks"""
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def hash_position(digest):
+    """Position of a hex digest in [0, 1)"""
+    return int(digest[:8], 16) / 0x100000000
+
+def assign_split(digest, validation_split=0.2, test_split=0.1):
+    """
+    Map a hex digest to 'train', 'val' or 'test'
+
+    Each split receives its fraction of the hash space, so split sizes match
+    the fractions only approximately (closely for large datasets).
+    """
+    position = hash_position(digest)
+    if position < test_split:
+        return 'test'
+    if position < test_split + validation_split:
+        return 'val'
+    return 'train'
+
+class SplitIndex:
+    """
+    Split index of one dataset folder
+
+    Paths are stored relative to data_dir with '/' separators. The fractions
+    are only used when new images are appended; existing rows keep their split.
+    """
+
+    def __init__(self, data_dir, index_path=None, validation_split=0.2, test_split=0.1):
+        """
+        Args:
+            data_dir: Root folder with one sub-folder per class
+            index_path: CSV path (default: data_dir/split_index.csv)
+            validation_split: Fraction of new images assigned to 'val'
+            test_split: Fraction of new images assigned to 'test'
+        """
+        self.data_dir = data_dir
+        self.index_path = index_path or os.path.join(data_dir, INDEX_NAME)
+        self.validation_split = validation_split
+        self.test_split = test_split
+        self.entries = []
+
+    def load(self):
+        """Read the index file; returns False if there is none"""
+        if not os.path.exists(self.index_path):
+            return False
+        with open(self.index_path, newline='') as f:
+            self.entries = [
+                {
+                    'path': row['path'], 'label': int(row['label']), 'split': row['split'], 'hash': row['hash'],
+                    # Missing in older index files; those rows are re-hashed by the next update
+                    'size': int(row['size']) if row.get('size') else None,
+                    'mtime_ns': int(row['mtime_ns']) if row.get('mtime_ns') else None
+                }
+                for row in csv.DictReader(f)
+            ]
+        return True
+
+    def save(self):
+        """
+        Write the index atomically
+
+        The temporary file is per process, so workers that build the same
+        index at once (local multi-worker runs) each replace it whole.
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(self.index_path)), exist_ok=True)
+        temp_path = f"{self.index_path}.{os.getpid()}.tmp"
+        with open(temp_path, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=FIELDS)
+            writer.writeheader()
+            writer.writerows(self.entries)
+        os.replace(temp_path, self.index_path)
+
+    def relative(self, path):
+        return os.path.relpath(path, self.data_dir).replace(os.sep, '/')
+
+    def update(self, paths, labels):
+        """
+        Sync the index with a file listing
+
+        New images are hashed and appended, images that no longer exist are
+        dropped and changed labels are updated. Existing rows keep their split
+        unless the file changed (different size or modification time) and its
+        content hash with it; the split then follows the new hash. A requested
+        split left empty gets one new image moved from 'train'.
+
+        Args:
+            paths: Absolute image paths (e.g. from WasteDataLoader.list_files)
+            labels: Label indices
+
+        Returns:
+            (added, removed) counts
+        """
+        listed = {self.relative(path): (path, label) for path, label in zip(paths, labels)}
+
+        kept = [entry for entry in self.entries if entry['path'] in listed]
+        removed = len(self.entries) - len(kept)
+        known = set()
+        for entry in kept:
+            path, entry['label'] = listed[entry['path']]
+            stat = os.stat(path)
+            if (entry['size'], entry['mtime_ns']) != (stat.st_size, stat.st_mtime_ns):
+                digest = content_hash(path)
+                if digest != entry['hash']:
+                    entry['hash'] = digest
+                    entry['split'] = assign_split(digest, self.validation_split, self.test_split)
+                entry['size'], entry['mtime_ns'] = stat.st_size, stat.st_mtime_ns
+            known.add(entry['path'])
+
+        new = []
+        for rel, (path, label) in listed.items():
+            if rel in known:
+                continue
+            stat = os.stat(path)
+            digest = content_hash(path)
+            new.append({
+                'path': rel,
+                'label': label,
+                'split': assign_split(digest, self.validation_split, self.test_split),
+                'hash': digest,
+                'size': stat.st_size,
+                'mtime_ns': stat.st_mtime_ns
+            })
+
+        self.entries = kept + new
+        self._fill_empty_splits(new)
+        return len(new), removed
+
+    def _fill_empty_splits(self, new):
+        """
+        Move one new training image (with its duplicates) into each requested
+        split that is still empty, keeping at least one training image
+
+        The image whose hash lies closest to the val / test range is moved, so
+        the choice is deterministic. Only hashes first seen in this update are
+        candidates; rows already in the index never move.
+        """
+        for name, fraction in (('val', self.validation_split), ('test', self.test_split)):
+            if fraction <= 0 or any(entry['split'] == name for entry in self.entries):
+                continue
+            old_hashes = {entry['hash'] for entry in self.entries[:len(self.entries) - len(new)]}
+            train_hashes = {entry['hash'] for entry in self.entries if entry['split'] == 'train'}
+            candidates = sorted(
+                {entry['hash'] for entry in new if entry['split'] == 'train'} - old_hashes,
+                key=hash_position
+            )
+            if not candidates or len(train_hashes) < 2:
+                continue
+            for entry in self.entries:
+                if entry['hash'] == candidates[0]:
+                    entry['split'] = name
+
+    def splits(self):
+        """
+        Returns:
+            dict of split name -> (relative paths, labels), in index order
+        """
+        result = {name: ([], []) for name in SPLITS}
+        for entry in self.entries:
+            paths, labels = result[entry['split']]
+            paths.append(entry['path'])
+            labels.append(entry['label'])
+        return result
+
+    def counts(self):
+        return {name: sum(1 for entry in self.entries if entry['split'] == name) for name in SPLITS}
@@ -1,51 +1,175 @@
 import tensorflow as tf
 from tensorflow import keras
 import numpy as np
+import argparse
+import sys
 import os
 from model import WasteDetectionModel
 from data_loader import WasteDataLoader
+from callbacks import ThroughputCallback, ResumableCheckpoint
+from feature_cache import FeatureCache, feature_dataset
+from distributed import STRATEGIES, make_strategy, launch_local_workers, is_chief, write_path, shard_by_data, task_name
 import matplotlib.pyplot as plt
 
 class ModelTrainer:
     """Train waste detection model"""
     
-    def __init__(self, data_dir, batch_size=32, epochs=50):
+    def __init__(self, data_dir, batch_size=32, epochs=50, cache_dir=None, mixed_precision=None,
+                 shard_dir=None, index_path=None, refresh_index=False, feature_cache_dir=None,
+                 augment_copies=0, fine_tune_layers=0, fine_tune_epochs=10, strategy='default',
+                 cpu_replicas=1, learning_rate=0.001, scale_learning_rate=True, checkpoint_dir='checkpoints/resume',
+                 checkpoint_every=200, keep_checkpoints=3):
+        """
+        Args:
+            data_dir: Root folder with one sub-folder per class
+            batch_size: Images per batch and replica (the global batch is
+                batch_size x number of replicas)
+            epochs: Max training epochs
+            cache_dir: Optional folder for the on-disk cache of decoded images
+            mixed_precision: None, 'mixed_float16' (GPU) or 'mixed_bfloat16' (recent CPUs / TPU)
+            shard_dir: Optional TFRecord shards from build_dataset.py (read instead of data_dir)
+            index_path: Split index CSV (default: data_dir/split_index.csv)
+            refresh_index: List data_dir again and add new images to the split index
+            feature_cache_dir: Folder for precomputed base features (train(precompute_features=True))
+            augment_copies: Augmented passes cached per training image besides the clean one
+            fine_tune_layers: Unfreeze this many top base layers after head training (0 = skip)
+            fine_tune_epochs: Max epochs of the fine-tuning phase
+            strategy: 'default', 'mirrored' or 'multi_worker' (see distributed.py)
+            cpu_replicas: CPU replicas of the mirrored strategy on a machine without GPUs
+            learning_rate: Learning rate of a single replica
+            scale_learning_rate: Multiply the learning rate by the number of replicas
+            checkpoint_dir: Resumable checkpoints, one sub-folder per training
+                phase (shared by all workers)
+            checkpoint_every: Save a resumable checkpoint every this many steps
+            keep_checkpoints: Resumable checkpoints kept per phase
+        """
         self.data_dir = data_dir
         self.batch_size = batch_size
         self.epochs = epochs
+        self.cache_dir = cache_dir
+        self.mixed_precision = mixed_precision
+        self.shard_dir = shard_dir
+        self.index_path = index_path
+        self.refresh_index = refresh_index
+        self.feature_cache_dir = feature_cache_dir or os.path.join(os.path.dirname(os.path.abspath(data_dir)), '.features')
+        self.augment_copies = augment_copies
+        self.fine_tune_layers = fine_tune_layers
+        self.fine_tune_epochs = fine_tune_epochs
+        self.head_batch_size = 256
+        self.fine_tune_history = None
+        self.learning_rate = learning_rate
+        self.scale_learning_rate = scale_learning_rate
+        self.checkpoint_dir = checkpoint_dir
+        self.checkpoint_every = checkpoint_every
+        self.keep_checkpoints = keep_checkpoints
         self.model_wrapper = WasteDetectionModel()
         self.history = None
+        
+        # Created first: multi-worker setup has to happen before any other op
+        self.strategy_name = strategy
+        self.strategy = make_strategy(strategy, cpu_replicas)
+        self.num_replicas = self.strategy.num_replicas_in_sync
+        self.global_batch_size = batch_size * self.num_replicas
+        if self.num_replicas > 1:
+            print(f"{strategy} strategy: {self.num_replicas} replicas, global batch {self.global_batch_size}")
+    
+    def scaled_learning_rate(self, learning_rate=None):
+        """Linear scaling rule: the learning rate grows with the global batch"""
+        learning_rate = learning_rate or self.learning_rate
+        return learning_rate * self.num_replicas if self.scale_learning_rate else learning_rate
     
     def prepare_data(self):
         """Load and prepare training data"""
         print("Loading dataset...")
         
-        loader = WasteDataLoader(self.data_dir)
+        loader = WasteDataLoader(self.data_dir, cache_dir=self.cache_dir, shard_dir=self.shard_dir,
+                                 index_path=self.index_path, cache_tag=task_name(self.strategy))
+        self.loader = loader
         self.train_ds, self.val_ds, self.test_ds = loader.load_data(
-            batch_size=self.batch_size,
+            batch_size=self.global_batch_size,
             validation_split=0.2,
-            test_split=0.1
+            test_split=0.1,
+            refresh_index=self.refresh_index
         )
         
-        print(f"Training samples: {len(self.train_ds) * self.batch_size}")
-        print(f"Validation samples: {len(self.val_ds) * self.batch_size}")
-        print(f"Test samples: {len(self.test_ds) * self.batch_size}")
+        if self.strategy_name == 'multi_worker':
+            self.train_ds, self.val_ds, self.test_ds = (
+                shard_by_data(ds) for ds in (self.train_ds, self.val_ds, self.test_ds)
+            )
+        
+        self.steps_per_epoch = loader.split_sizes['train'] // self.global_batch_size
+        if not self.steps_per_epoch:
+            raise ValueError(f"Fewer training images than one batch of {self.global_batch_size}")
+        
+        print(f"Training samples: {loader.split_sizes['train']}")
+        print(f"Validation samples: {loader.split_sizes['val']}")
+        print(f"Test samples: {loader.split_sizes['test']}")
     
-    def train(self, use_transfer_learning=True):
-        """Train the model"""
+    def training_dataset(self, start_epoch=0, start_step=0):
+        """Endless training batches starting at (start_epoch, start_step)"""
+        ds = self.loader.make_dataset(*self.loader.splits['train'], batch_size=self.global_batch_size,
+                                      training=True, cache_name='train',
+                                      start_epoch=start_epoch, start_step=start_step)
+        return shard_by_data(ds) if self.strategy_name == 'multi_worker' else ds
+    
+    def train(self, use_transfer_learning=True, precompute_features=False):
+        """
+        Train the model
+        
+        Every phase resumes from its latest checkpoint under checkpoint_dir, and
+        phases that already finished are skipped, so re-running after a
+        preemption continues where training stopped.
+        
+        Args:
+            use_transfer_learning: Frozen MobileNetV2 base with a trained head
+            precompute_features: Run the frozen base once per image, cache the
+                pooled features on disk and train only the head on them
+        """
+        
+        # Compute in float16 / bfloat16, keep variables in float32
+        if self.mixed_precision:
+            keras.mixed_precision.set_global_policy(self.mixed_precision)
+            print(f"Mixed precision policy: {self.mixed_precision}")
         
-        # Build model
-        if use_transfer_learning:
-            print("Building model with transfer learning (MobileNetV2)...")
-            model = self.model_wrapper.get_transfer_learning_model('MobileNetV2')
+        if precompute_features and not use_transfer_learning:
+            raise ValueError("Feature precomputation needs the frozen transfer-learning base")
+        if precompute_features and self.strategy_name == 'multi_worker':
+            raise ValueError("Precompute features with a single worker; the head trains in minutes")
+        
+        # Build model (augmentation runs in the input pipeline)
+        with self.strategy.scope():
+            if use_transfer_learning:
+                print("Building model with transfer learning (MobileNetV2)...")
+                model = self.model_wrapper.get_transfer_learning_model('MobileNetV2')
+            else:
+                print("Building model from scratch...")
+                model = self.model_wrapper.build_model(augment=False)
+        
+        if precompute_features:
+            self.history = self.train_head_on_features()
         else:
-            print("Building model from scratch...")
-            model = self.model_wrapper.build_model()
+            with self.strategy.scope():
+                self.model_wrapper.compile_model(learning_rate=self.scaled_learning_rate())
+            
+            # Train model
+            print("Starting training...")
+            self.history = self.fit_resumable(model, 'model', self.training_dataset, self.val_ds,
+                                              self.epochs, self.steps_per_epoch, self.global_batch_size)
         
-        self.model_wrapper.compile_model()
+        if use_transfer_learning and self.fine_tune_layers:
+            self.fine_tune()
+        elif precompute_features:
+            # evaluate() runs the full model, which was not compiled yet
+            with self.strategy.scope():
+                self.model_wrapper.compile_model()
         
-        # Callbacks
-        callbacks = [
+        print("Training completed!")
+        return self.history
+    
+    def build_callbacks(self, name, batch_size):
+        """Callbacks of one training phase; best models go to checkpoints/<name>_epoch_NN.h5"""
+        return [
+            ThroughputCallback(batch_size),
             keras.callbacks.EarlyStopping(
                 monitor='val_loss',
                 patience=10,
@@ -58,23 +182,103 @@ class ModelTrainer:
                 min_lr=1e-7
             ),
             keras.callbacks.ModelCheckpoint(
-                filepath='checkpoints/model_epoch_{epoch:02d}.h5',
+                filepath=f'checkpoints/{name}_epoch_{{epoch:02d}}.h5',
                 save_best_only=True,
                 monitor='val_accuracy'
             )
         ]
+    
+    def fit_resumable(self, model, name, make_train_ds, val_ds, epochs, steps_per_epoch, batch_size):
+        """
+        model.fit with resumable checkpoints under checkpoint_dir/<name>
         
-        # Train model
-        print("Starting training...")
-        self.history = model.fit(
-            self.train_ds,
-            validation_data=self.val_ds,
-            epochs=self.epochs,
-            callbacks=callbacks
-        )
+        A restarted run restores model, optimizer and callback state and
+        continues at the saved (epoch, step): the rest of an interrupted epoch
+        runs as its own short fit, then the remaining epochs follow.
         
-        print("Training completed!")
-        return self.history
+        Args:
+            make_train_ds: fn(start_epoch, start_step) -> endless training dataset
+        
+        Returns:
+            History of this run, or None if the phase had already finished
+        """
+        directory = os.path.join(self.checkpoint_dir, name)
+        checkpoint = ResumableCheckpoint(directory, self.checkpoint_every, self.keep_checkpoints,
+                                         write_directory=write_path(directory, self.strategy))
+        if checkpoint.step >= steps_per_epoch:
+            # Saved after the last batch of its epoch (or the epoch got shorter):
+            # only that epoch's validation is left, so continue with the next one
+            checkpoint.epoch, checkpoint.step = checkpoint.epoch + 1, 0
+        if checkpoint.finished or checkpoint.epoch >= epochs:
+            checkpoint.restore_weights(model)
+            return None
+        
+        history = None
+        while checkpoint.epoch < epochs:
+            start_epoch, start_step = checkpoint.epoch, checkpoint.step
+            callbacks = self.build_callbacks(name, batch_size)
+            checkpoint.callbacks = callbacks
+            
+            run = model.fit(
+                make_train_ds(start_epoch, start_step),
+                validation_data=val_ds,
+                initial_epoch=start_epoch,
+                epochs=start_epoch + 1 if start_step else epochs,
+                steps_per_epoch=steps_per_epoch - start_step,
+                callbacks=callbacks + [checkpoint]
+            )
+            history = merge_history(history, run)
+            if model.stop_training:
+                break
+        
+        checkpoint.mark_finished()
+        return history
+    
+    def train_head_on_features(self):
+        """Train only the classification head on cached base features"""
+        wrapper = self.model_wrapper
+        cache = FeatureCache(self.feature_cache_dir, wrapper.feature_extractor,
+                             wrapper.base_model_name, self.loader.image_size)
+        
+        features = {}
+        for split in ('train', 'val'):
+            paths, labels = self.loader.splits[split]
+            features[split] = cache.load_or_compute(
+                split,
+                self.loader.make_dataset(paths, labels, batch_size=self.global_batch_size),
+                paths,
+                labels,
+                copies=self.augment_copies if split == 'train' else 0,
+                augmenter=self.loader.build_augmenter()
+            )
+        
+        head_batch_size = self.head_batch_size * self.num_replicas
+        steps_per_epoch = max(1, len(features['train'][1]) // head_batch_size)
+        
+        def train_features(start_epoch, start_step):
+            return feature_dataset(*features['train'], wrapper.num_classes, head_batch_size, training=True,
+                                   start_epoch=start_epoch, start_step=start_step)
+        
+        val_features = feature_dataset(*features['val'], wrapper.num_classes, head_batch_size)
+        
+        with self.strategy.scope():
+            wrapper.compile_model(learning_rate=self.scaled_learning_rate(), model=wrapper.head)
+        
+        print("Training head on cached features...")
+        return self.fit_resumable(wrapper.head, 'head', train_features, val_features,
+                                  self.epochs, steps_per_epoch, head_batch_size)
+    
+    def fine_tune(self, learning_rate=1e-5):
+        """Unfreeze the top base layers and train end to end at a low learning rate"""
+        print(f"Fine-tuning the top {self.fine_tune_layers} base layers...")
+        with self.strategy.scope():
+            self.model_wrapper.unfreeze_top(self.fine_tune_layers)
+            self.model_wrapper.compile_model(learning_rate=self.scaled_learning_rate(learning_rate))
+        
+        self.fine_tune_history = self.fit_resumable(self.model_wrapper.model, 'finetune', self.training_dataset,
+                                                    self.val_ds, self.fine_tune_epochs, self.steps_per_epoch,
+                                                    self.global_batch_size)
+        return self.fine_tune_history
     
     def evaluate(self):
         """Evaluate model on test set"""
@@ -119,34 +323,86 @@ class ModelTrainer:
         print("Training history plot saved as 'training_history.png'")
     
     def save_model(self, filepath='../pretrained/waste_classifier.h5'):
-        """Save trained model"""
-        self.model_wrapper.save_model(filepath)
+        """Save trained model (non-chief workers save to a temporary copy)"""
+        self.model_wrapper.save_model(write_path(filepath, self.strategy))
+
+def merge_history(history, run):
+    """Append the per-epoch logs of run to history (either may be None)"""
+    if history is None:
+        return run
+    for key, values in run.history.items():
+        history.history.setdefault(key, []).extend(values)
+    history.epoch.extend(run.epoch)
+    return history
 
 # Main training script
 if __name__ == "__main__":
     # Configuration
-    DATA_DIR = "../datasets/waste_images"
-    BATCH_SIZE = 32
-    EPOCHS = 50
+    parser = argparse.ArgumentParser(description='Train the waste classifier')
+    parser.add_argument('--data-dir', default='../datasets/waste_images')
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--epochs', type=int, default=50)
+    parser.add_argument('--cache-dir', default=None, help='Cache decoded images on disk (e.g. ../datasets/.cache)')
+    parser.add_argument('--shard-dir', default=None, help='Read TFRecord shards built by build_dataset.py')
+    parser.add_argument('--index-path', default=None, help='Split index CSV (default: <data-dir>/split_index.csv)')
+    parser.add_argument('--refresh-index', action='store_true', help='Add new images to the split index')
+    parser.add_argument('--precompute-features', action='store_true',
+                        help='Run the frozen base once, train the head on cached features')
+    parser.add_argument('--feature-cache-dir', default=None, help='Default: <data-dir>/../.features')
+    parser.add_argument('--augment-copies', type=int, default=0, help='Augmented feature passes per training image')
+    parser.add_argument('--fine-tune-layers', type=int, default=0, help='Unfreeze this many top base layers afterwards')
+    parser.add_argument('--fine-tune-epochs', type=int, default=10)
+    parser.add_argument('--strategy', default='default', choices=STRATEGIES)
+    parser.add_argument('--workers', type=int, default=1,
+                        help='With --strategy multi_worker and no TF_CONFIG: launch this many local workers')
+    parser.add_argument('--cpu-replicas', type=int, default=1, help='CPU replicas of --strategy mirrored without GPUs')
+    parser.add_argument('--learning-rate', type=float, default=0.001, help='Per-replica learning rate')
+    parser.add_argument('--no-lr-scaling', action='store_true', help='Do not scale the learning rate with replicas')
+    parser.add_argument('--checkpoint-dir', default='checkpoints/resume', help='Resumable checkpoints (shared by all workers)')
+    parser.add_argument('--checkpoint-every', type=int, default=200, help='Steps between resumable checkpoints')
+    parser.add_argument('--keep-checkpoints', type=int, default=3)
+    parser.add_argument('--mixed-precision', default=None, choices=['mixed_float16', 'mixed_bfloat16'])
+    args = parser.parse_args()
+    
+    # Re-run this script once per local worker, each with its own TF_CONFIG
+    if args.strategy == 'multi_worker' and args.workers > 1 and 'TF_CONFIG' not in os.environ:
+        sys.exit(launch_local_workers(args.workers, sys.argv))
     
     # Create trainer
     trainer = ModelTrainer(
-        data_dir=DATA_DIR,
-        batch_size=BATCH_SIZE,
-        epochs=EPOCHS
+        data_dir=args.data_dir,
+        batch_size=args.batch_size,
+        epochs=args.epochs,
+        cache_dir=args.cache_dir,
+        mixed_precision=args.mixed_precision,
+        shard_dir=args.shard_dir,
+        index_path=args.index_path,
+        refresh_index=args.refresh_index,
+        feature_cache_dir=args.feature_cache_dir,
+        augment_copies=args.augment_copies,
+        fine_tune_layers=args.fine_tune_layers,
+        fine_tune_epochs=args.fine_tune_epochs,
+        strategy=args.strategy,
+        cpu_replicas=args.cpu_replicas,
+        learning_rate=args.learning_rate,
+        scale_learning_rate=not args.no_lr_scaling,
+        checkpoint_dir=args.checkpoint_dir,
+        checkpoint_every=args.checkpoint_every,
+        keep_checkpoints=args.keep_checkpoints
     )
     
     # Prepare data
     trainer.prepare_data()
     
     # Train model
-    trainer.train(use_transfer_learning=True)
+    trainer.train(use_transfer_learning=True, precompute_features=args.precompute_features)
     
     # Evaluate
     trainer.evaluate()
     
     # Plot results
-    trainer.plot_training_history()
+    if is_chief(trainer.strategy):
+        trainer.plot_training_history()
     
     # Save model
     trainer.save_model()
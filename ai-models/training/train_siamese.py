@@ -0,0 +1,425 @@
+"""
+Training pipeline for the Siamese cleanup verifier
+Pairs come from before/after image folders; the frozen MobileNetV2 backbone
+runs once per image (features cached by content hash, with augmented views)
+and each epoch only trains the small projection and comparison head
+
+Dataset layout (pairs matched by file name stem):
+    datasets/cleanups/
+        before/<pair_id>.jpg
+        after/<pair_id>.jpg
+        labels.csv      optional: pair_id,cleaned (1 verified, 0 rejected);
+                        pairs without a row count as verified cleanups
+
+Usage (from ai-models/):
+    python training/train_siamese.py --data-dir datasets/cleanups
+"""
+
+import tensorflow as tf
+from tensorflow import keras
+from tensorflow.keras import layers
+import numpy as np
+import argparse
+import hashlib
+import json
+import math
+import time
+import csv
+import sys
+import os
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+from inference.siamese_network import SiameseNetwork
+from data_loader import WasteDataLoader, IMAGE_EXTENSIONS
+from split_index import content_hash, assign_split
+from callbacks import ThroughputCallback
+
+# Similarity targets of the verifier: 0 = different (cleaned), 1 = same (not cleaned)
+CLEANED = 0
+SAME = 1
+
+def list_pairs(data_dir):
+    """
+    Before/after pairs of a cleanup folder
+
+    Returns:
+        list of (pair_id, before_path, after_path, cleaned) tuples
+    """
+    def by_stem(folder):
+        folder = os.path.join(data_dir, folder)
+        if not os.path.isdir(folder):
+            return {}
+        return {
+            os.path.splitext(name)[0]: os.path.join(folder, name)
+            for name in sorted(os.listdir(folder))
+            if name.lower().endswith(IMAGE_EXTENSIONS)
+        }
+
+    before, after = by_stem('before'), by_stem('after')
+
+    cleaned = {}
+    labels_path = os.path.join(data_dir, 'labels.csv')
+    if os.path.exists(labels_path):
+        with open(labels_path, newline='') as f:
+            for row in csv.DictReader(f):
+                cleaned[row['pair_id']] = row['cleaned'].strip().lower() in ('1', 'true', 'yes')
+
+    return [
+        (pair_id, before[pair_id], after[pair_id], cleaned.get(pair_id, True))
+        for pair_id in sorted(set(before) & set(after))
+    ]
+
+def contrastive_loss(margin=1.0):
+    """Pull embeddings of same-scene pairs together, push cleaned pairs at least margin apart"""
+    def loss(y_true, distance):
+        y_true = tf.cast(y_true, distance.dtype)
+        return tf.reduce_mean(
+            y_true * tf.square(distance) + (1 - y_true) * tf.square(tf.nn.relu(margin - distance))
+        )
+    return loss
+
+class EmbeddingStore:
+    """
+    Backbone features of images keyed by content hash
+
+    Each image is stored as `views` rows: the clean image followed by
+    augmented copies. New images are appended, so a nightly run only embeds
+    the cleanups added since the last run.
+    """
+
+    def __init__(self, cache_dir, backbone, image_size=(224, 224), views=3, name='siamese_mobilenetv2'):
+        self.cache_dir = cache_dir
+        self.backbone = backbone
+        self.image_size = tuple(image_size)
+        self.views = views
+        self.meta = {'backbone': name, 'image_size': list(self.image_size), 'views': views}
+        self.embeddings_path = os.path.join(cache_dir, f'{name}_embeddings.npy')
+        self.keys_path = os.path.join(cache_dir, f'{name}_keys.json')
+        self.embeddings = np.zeros((0, views, backbone.output_shape[-1]), dtype=np.float16)
+        self.keys = []
+        self._load()
+
+    def _load(self):
+        if not (os.path.exists(self.embeddings_path) and os.path.exists(self.keys_path)):
+            return
+        with open(self.keys_path) as f:
+            stored = json.load(f)
+        if stored['meta'] != self.meta:
+            print("Embedding cache was built with other settings - recomputing")
+            return
+        embeddings = np.load(self.embeddings_path)
+        # Keys are written last; an interrupted save leaves extra rows behind
+        count = min(len(stored['keys']), len(embeddings))
+        self.embeddings = embeddings[:count]
+        self.keys = stored['keys'][:count]
+
+    def _save(self):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        temp_path = self.embeddings_path[:-len('.npy')] + '.tmp.npy'
+        np.save(temp_path, self.embeddings)
+        os.replace(temp_path, self.embeddings_path)
+        with open(self.keys_path + '.tmp', 'w') as f:
+            json.dump({'meta': self.meta, 'keys': self.keys}, f)
+        os.replace(self.keys_path + '.tmp', self.keys_path)
+
+    def rows(self, paths, augmenter, batch_size=32):
+        """
+        Row of every path in self.embeddings, embedding images not seen before
+
+        Returns:
+            int array, one row per path
+        """
+        hashes = [content_hash(path) for path in paths]
+        index = {key: row for row, key in enumerate(self.keys)}
+
+        missing = {}
+        for path, key in zip(paths, hashes):
+            if key not in index and key not in missing:
+                missing[key] = path
+
+        if missing:
+            start = time.perf_counter()
+            self.embeddings = np.concatenate([self.embeddings, self._embed(list(missing.values()), augmenter, batch_size)])
+            self.keys.extend(missing)
+            self._save()
+            elapsed = time.perf_counter() - start
+            print(f"Embedded {len(missing)} new images x {self.views} views in {elapsed:.1f}s "
+                  f"({len(self.keys)} cached)")
+            index = {key: row for row, key in enumerate(self.keys)}
+        else:
+            print(f"All {len(set(hashes))} images found in the embedding cache")
+
+        return np.array([index[key] for key in hashes], dtype=np.int64)
+
+    def _embed(self, paths, augmenter, batch_size):
+        decoder = WasteDataLoader(None, self.image_size)
+        ds = tf.data.Dataset.from_tensor_slices(tf.constant(paths, dtype=tf.string))
+        ds = ds.map(decoder.decode_pixels, num_parallel_calls=tf.data.AUTOTUNE)
+        ds = ds.map(lambda image: tf.cast(image, tf.float32) / 255.0).batch(batch_size).prefetch(tf.data.AUTOTUNE)
+
+        out = np.zeros((len(paths), self.views, self.backbone.output_shape[-1]), dtype=np.float16)
+        offset = 0
+        for images in ds:
+            count = len(images)
+            out[offset:offset + count, 0] = self.backbone.predict_on_batch(images)
+            for view in range(1, self.views):
+                out[offset:offset + count, view] = self.backbone.predict_on_batch(augmenter(images, training=True))
+            offset += count
+        return out
+
+class PairSequence(keras.utils.Sequence):
+    """
+    Batches of cached feature pairs, re-sampled every epoch
+
+    Every epoch draws fresh views for each pair (so same-scene pairs compare
+    two different augmented views) and, with a model attached, replaces
+    hard_fraction of the pairs by the pairs the model currently gets most
+    wrong (highest loss): cleaned pairs that still look alike and same-scene
+    pairs that look different.
+    """
+
+    def __init__(self, embeddings, pairs, batch_size=64, hard_fraction=0.0, model=None, seed=123,
+                 random_views=True):
+        """
+        Args:
+            embeddings: (images, views, dim) cached backbone features
+            pairs: int array (N, 3) of before row, after row, target
+            batch_size: Pairs per batch
+            hard_fraction: Share of each epoch filled with mined hard pairs
+            model: Training model used for mining
+            seed: Sampling seed
+            random_views: False uses view 0 vs view 1 (validation)
+        """
+        self.embeddings = embeddings
+        self.pairs = pairs
+        self.batch_size = batch_size
+        self.hard_fraction = hard_fraction
+        self.model = model
+        self.random_views = random_views
+        self.rng = np.random.default_rng(seed)
+        self.on_epoch_end()
+
+    def __len__(self):
+        return math.ceil(len(self.pairs) / self.batch_size)
+
+    def __getitem__(self, index):
+        batch = self.epoch_pairs[index * self.batch_size:(index + 1) * self.batch_size]
+        return self._inputs(batch), self._targets(batch)
+
+    def on_epoch_end(self):
+        self.epoch_pairs = self._with_views(self.pairs)
+        if self.model is not None and self.hard_fraction > 0 and len(self.pairs):
+            num_hard = int(len(self.pairs) * self.hard_fraction)
+            candidates = self._with_views(self.pairs)
+            hardest = candidates[np.argsort(-self._losses(candidates))[:num_hard]]
+            keep = self.rng.permutation(len(self.epoch_pairs))[:len(self.pairs) - num_hard]
+            self.epoch_pairs = np.concatenate([self.epoch_pairs[keep], hardest])
+        self.epoch_pairs = self.epoch_pairs[self.rng.permutation(len(self.epoch_pairs))]
+
+    def _with_views(self, pairs):
+        """(N, 5) array: before row, before view, after row, after view, target"""
+        views = self.embeddings.shape[1]
+        if self.random_views:
+            before_view = self.rng.integers(0, views, len(pairs))
+            after_view = self.rng.integers(0, views, len(pairs))
+            # A same-image pair needs two different views to be a real example
+            if views > 1:
+                same = (pairs[:, 0] == pairs[:, 1]) & (before_view == after_view)
+                after_view[same] = (after_view[same] + self.rng.integers(1, views, same.sum())) % views
+        else:
+            before_view = np.zeros(len(pairs), dtype=np.int64)
+            after_view = np.where(pairs[:, 0] == pairs[:, 1], min(1, views - 1), 0)
+        return np.stack([pairs[:, 0], before_view, pairs[:, 1], after_view, pairs[:, 2]], axis=1)
+
+    def _inputs(self, batch):
+        return {
+            'before_features': self.embeddings[batch[:, 0], batch[:, 1]].astype(np.float32),
+            'after_features': self.embeddings[batch[:, 2], batch[:, 3]].astype(np.float32)
+        }
+
+    def _targets(self, batch):
+        targets = batch[:, 4:5].astype(np.float32)
+        return {'similarity': targets, 'distance': targets}
+
+    def _losses(self, candidates, batch_size=1024):
+        """Per-pair binary cross-entropy of the similarity output"""
+        losses = np.zeros(len(candidates), dtype=np.float32)
+        for start in range(0, len(candidates), batch_size):
+            batch = candidates[start:start + batch_size]
+            similarity = self.model.predict_on_batch(self._inputs(batch))['similarity'][:, 0]
+            similarity = np.clip(similarity, 1e-7, 1 - 1e-7)
+            target = batch[:, 4]
+            losses[start:start + batch_size] = -(target * np.log(similarity) + (1 - target) * np.log(1 - similarity))
+        return losses
+
+class SiameseTrainer:
+    """Train the projection layers and comparison head of SiameseNetwork on cached features"""
+
+    def __init__(self, data_dir, model_path='pretrained/siamese_network.h5', cache_dir=None, views=3,
+                 batch_size=64, epochs=30, loss='binary', margin=1.0, hard_fraction=0.25,
+                 validation_split=0.15, learning_rate=0.001):
+        """
+        Args:
+            data_dir: Cleanup folder with before/ and after/ (see module docstring)
+            model_path: Siamese model to start from (a new one is built if missing)
+            cache_dir: Folder of the backbone embedding cache
+            views: Cached views per image (clean + views - 1 augmented), at least 2
+                so "not cleaned" pairs compare two different views
+            batch_size: Pairs per batch
+            epochs: Max training epochs
+            loss: 'binary' (cross-entropy on the similarity score) or
+                'contrastive' (adds a contrastive loss on the embedding distance)
+            margin: Contrastive margin
+            hard_fraction: Share of each epoch filled with mined hard pairs
+            validation_split: Share of pairs held out, assigned by pair id hash
+            learning_rate: Adam learning rate
+        """
+        if views < 2:
+            raise ValueError(f"views must be at least 2, got {views}")
+
+        self.data_dir = data_dir
+        self.model_path = model_path
+        self.cache_dir = cache_dir or os.path.join(os.path.dirname(os.path.abspath(data_dir)), '.siamese_cache')
+        self.views = views
+        self.batch_size = batch_size
+        self.epochs = epochs
+        self.loss = loss
+        self.margin = margin
+        self.hard_fraction = hard_fraction
+        self.validation_split = validation_split
+        self.learning_rate = learning_rate
+        self.history = None
+
+        # Continue from the current model so nightly runs refine it
+        self.siamese = SiameseNetwork(model_path=model_path, compiled=False)
+        self.backbone, self.projection = self._split_feature_extractor()
+        self.model = self._build_training_model()
+
+    def _split_feature_extractor(self):
+        """
+        Frozen backbone (image -> pooled features) and the trainable layers
+        after it, sharing weights with self.siamese.model
+        """
+        extractor = self.siamese.feature_extractor
+        pool = next(i for i, layer in enumerate(extractor.layers) if isinstance(layer, layers.GlobalAveragePooling2D))
+        backbone = keras.Model(extractor.input, extractor.layers[pool].output, name='backbone')
+
+        inputs = keras.Input(shape=(backbone.output_shape[-1],))
+        x = inputs
+        for layer in extractor.layers[pool + 1:]:
+            x = layer(x)
+        return backbone, keras.Model(inputs, x, name='projection')
+
+    def _build_training_model(self):
+        feature_dim = self.backbone.output_shape[-1]
+        before = keras.Input(shape=(feature_dim,), name='before_features')
+        after = keras.Input(shape=(feature_dim,), name='after_features')
+
+        before_embedding = self.projection(before)
+        after_embedding = self.projection(after)
+        similarity = self.siamese.comparison_head([before_embedding, after_embedding])
+        distance = layers.Lambda(
+            lambda tensors: tf.sqrt(tf.reduce_sum(tf.square(tensors[0] - tensors[1]), axis=-1, keepdims=True) + 1e-9)
+        )([before_embedding, after_embedding])
+
+        model = keras.Model([before, after], {'similarity': similarity, 'distance': distance})
+        model.compile(
+            optimizer=keras.optimizers.Adam(learning_rate=self.learning_rate),
+            loss={'similarity': 'binary_crossentropy', 'distance': contrastive_loss(self.margin)},
+            loss_weights={'similarity': 1.0, 'distance': 1.0 if self.loss == 'contrastive' else 0.0},
+            metrics={'similarity': ['accuracy', keras.metrics.AUC(name='auc')]}
+        )
+        return model
+
+    def prepare_data(self):
+        """List pairs, embed new images and build the pair sequences"""
+        pairs = list_pairs(self.data_dir)
+        if not pairs:
+            raise ValueError(f"No before/after pairs found in {self.data_dir}")
+
+        paths = [path for _, before, after, _ in pairs for path in (before, after)]
+        augmenter = WasteDataLoader(None).build_augmenter()
+        store = EmbeddingStore(self.cache_dir, self.backbone, self.siamese.input_shape[:2], self.views)
+        rows = store.rows(paths, augmenter).reshape(-1, 2)
+
+        splits = {'train': [], 'val': []}
+        for (pair_id, _, _, cleaned), (before_row, after_row) in zip(pairs, rows):
+            # Split by pair id hash: a pair never changes split as new pairs arrive
+            split = assign_split(hashlib.sha1(pair_id.encode('utf-8')).hexdigest(), self.validation_split, 0)
+            # The submitted pair, plus before and after each against another view of itself
+            splits[split].append((before_row, after_row, CLEANED if cleaned else SAME))
+            splits[split].append((before_row, before_row, SAME))
+            splits[split].append((after_row, after_row, SAME))
+
+        print(f"{len(pairs)} pairs ({sum(1 for p in pairs if p[3])} cleaned), "
+              f"{len(splits['train'])} training / {len(splits['val'])} validation examples")
+
+        self.train_seq = PairSequence(store.embeddings, np.array(splits['train'], dtype=np.int64).reshape(-1, 3),
+                                      self.batch_size, self.hard_fraction, self.model)
+        self.val_seq = PairSequence(store.embeddings, np.array(splits['val'], dtype=np.int64).reshape(-1, 3),
+                                    self.batch_size, random_views=False)
+
+    def train(self):
+        """Train on cached features; only the projection and comparison head run"""
+        callbacks = [
+            ThroughputCallback(self.batch_size),
+            keras.callbacks.EarlyStopping(monitor='val_loss', patience=5, restore_best_weights=True),
+            keras.callbacks.ReduceLROnPlateau(monitor='val_loss', factor=0.5, patience=3, min_lr=1e-6)
+        ]
+        if not len(self.val_seq.pairs):
+            callbacks = callbacks[:1]
+
+        self.history = self.model.fit(
+            self.train_seq,
+            validation_data=self.val_seq if len(self.val_seq.pairs) else None,
+            epochs=self.epochs,
+            callbacks=callbacks
+        )
+        return self.history
+
+    def save_model(self, filepath=None):
+        """Save the full Siamese model, replacing the served file atomically"""
+        filepath = filepath or self.model_path
+        os.makedirs(os.path.dirname(os.path.abspath(filepath)), exist_ok=True)
+        temp_path = filepath + '.tmp.h5'
+        self.siamese.model.save(temp_path)
+        os.replace(temp_path, filepath)
+        print(f"Siamese model saved to {filepath}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Train the Siamese cleanup verifier')
+    parser.add_argument('--data-dir', default=os.path.join(BASE_DIR, 'datasets', 'cleanups'))
+    parser.add_argument('--model-path', default=os.path.join(BASE_DIR, 'pretrained', 'siamese_network.h5'),
+                        help='Model to start from (built if missing)')
+    parser.add_argument('--output', help='Where to save (default: --model-path)')
+    parser.add_argument('--cache-dir', default=None, help='Embedding cache (default: <data-dir>/../.siamese_cache)')
+    parser.add_argument('--views', type=int, default=3, help='Cached views per image (clean + augmented)')
+    parser.add_argument('--epochs', type=int, default=30)
+    parser.add_argument('--batch-size', type=int, default=64)
+    parser.add_argument('--loss', choices=['binary', 'contrastive'], default='binary')
+    parser.add_argument('--margin', type=float, default=1.0)
+    parser.add_argument('--hard-fraction', type=float, default=0.25, help='Share of mined hard pairs per epoch')
+    parser.add_argument('--validation-split', type=float, default=0.15)
+    parser.add_argument('--learning-rate', type=float, default=0.001)
+    args = parser.parse_args()
+    if args.views < 2:
+        parser.error('--views must be at least 2 (the clean image plus one augmented view)')
+
+    trainer = SiameseTrainer(
+        data_dir=args.data_dir,
+        model_path=args.model_path,
+        cache_dir=args.cache_dir,
+        views=args.views,
+        batch_size=args.batch_size,
+        epochs=args.epochs,
+        loss=args.loss,
+        margin=args.margin,
+        hard_fraction=args.hard_fraction,
+        validation_split=args.validation_split,
+        learning_rate=args.learning_rate
+    )
+    trainer.prepare_data()
+    trainer.train()
+    trainer.save_model(args.output)
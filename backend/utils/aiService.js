@@ -82,6 +82,54 @@ class AIService {
     }
   }
   
+  /**
+   * Classify many images in one request
+   */
+  async classifyBatch(imageFiles) {
+    try {
+      const formData = new FormData();
+      imageFiles.forEach((imageFile) => formData.append('images', imageFile));
+      
+      const response = await axios.post(
+        `${this.baseURL}/api/classify-batch`,
+        formData,
+        {
+          headers: { 'Content-Type': 'multipart/form-data' },
+          timeout: 300000
+        }
+      );
+      
+      return response.data;
+    } catch (error) {
+      console.error('AI batch classification error:', error.message);
+      throw new Error('AI batch classification failed');
+    }
+  }
+  
+  /**
+   * Detect waste objects in many images in one request
+   */
+  async detectBatch(imageFiles) {
+    try {
+      const formData = new FormData();
+      imageFiles.forEach((imageFile) => formData.append('images', imageFile));
+      
+      const response = await axios.post(
+        `${this.baseURL}/api/detect-batch`,
+        formData,
+        {
+          headers: { 'Content-Type': 'multipart/form-data' },
+          timeout: 300000
+        }
+      );
+      
+      return response.data;
+    } catch (error) {
+      console.error('AI batch detection error:', error.message);
+      throw new Error('AI batch detection failed');
+    }
+  }
+  
   /**
    * Full analysis (classification + detection)
    */